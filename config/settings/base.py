@@ -1,6 +1,7 @@
 from pathlib import Path
 from datetime import timedelta
 import os
+import tempfile
 from dotenv import load_dotenv
 
 # --------------------------
@@ -93,6 +94,46 @@ DATABASES = {
     }
 }
 
+# --------------------------
+# Cache
+# --------------------------
+# Shared by gunicorn workers and background/Celery encoders (e.g. live encode progress),
+# so the default is file-based rather than per-process locmem. Set CACHE_REDIS_URL to use Redis.
+CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL', '')
+# Cached API responses (core/cache.py) live in the 'responses' alias: Redis when available,
+# otherwise RESPONSE_CACHE_BACKEND ('locmem' or 'file'). Their invalidation versions always
+# live in 'default', so a write in one worker invalidates every worker's copy.
+RESPONSE_CACHE_BACKEND = os.environ.get('RESPONSE_CACHE_BACKEND', 'locmem').lower()
+if CACHE_REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_REDIS_URL,
+        },
+        'responses': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_REDIS_URL,
+            'KEY_PREFIX': 'responses',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.path.join(tempfile.gettempdir(), 'elearning_cache'),
+        },
+        'responses': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.path.join(tempfile.gettempdir(), 'elearning_response_cache'),
+        } if RESPONSE_CACHE_BACKEND == 'file' else {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'elearning-responses',
+            'OPTIONS': {'MAX_ENTRIES': 5000},
+        }
+    }
+# Safety net only; entries are normally invalidated by model signals (core/signals.py)
+RESPONSE_CACHE_TIMEOUT = int(os.environ.get('RESPONSE_CACHE_TIMEOUT', 3600))
+
 # --------------------------
 # Password validation
 # --------------------------
@@ -186,3 +227,91 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
+# Longest a lecture encode may run (the encode task's time limit). Redis redelivers an
+# unacknowledged task after visibility_timeout, so that must stay above it, or a long
+# encode would be started a second time while the first is still running.
+VIDEO_ENCODE_MAX_SECONDS = int(os.environ.get('VIDEO_ENCODE_MAX_SECONDS', 6 * 3600))
+CELERY_BROKER_TRANSPORT_OPTIONS = {
+    'visibility_timeout': int(os.environ.get('CELERY_VISIBILITY_TIMEOUT', VIDEO_ENCODE_MAX_SECONDS + 3600)),
+}
+CELERY_BEAT_SCHEDULE = {
+    # Full recompute of the course leaderboards (writes update them incrementally in between)
+    'rebuild-leaderboards': {
+        'task': 'courses.tasks.rebuild_leaderboards_task',
+        'schedule': int(os.environ.get('LEADERBOARD_REBUILD_SECONDS', 3600)),
+    },
+    # Abandoned chunked uploads (without Celery: run cleanup_upload_sessions from cron)
+    'cleanup-upload-sessions': {
+        'task': 'courses.tasks.cleanup_upload_sessions_task',
+        'schedule': 3600,
+    },
+}
+
+# --------------------------
+# Search
+# --------------------------
+# 'auto': SQLite FTS5 / MySQL FULLTEXT index (courses/search.py), 'basic': icontains matching
+SEARCH_BACKEND = os.environ.get('SEARCH_BACKEND', 'auto')
+
+# --------------------------
+# Catalog
+# --------------------------
+# Upper edges of the home page price facet buckets (plus "free" and an open-ended top bucket)
+CATALOG_PRICE_BUCKETS = [int(edge) for edge in os.environ.get('CATALOG_PRICE_BUCKETS', '500,1000,2000').split(',')]
+
+# --------------------------
+# Lecture progress
+# --------------------------
+# Playback heartbeats are buffered per process and written in bulk every N seconds,
+# or once this many (enrollment, lecture) positions are waiting
+PROGRESS_FLUSH_SECONDS = float(os.environ.get('PROGRESS_FLUSH_SECONDS', 10))
+PROGRESS_BUFFER_MAX = int(os.environ.get('PROGRESS_BUFFER_MAX', 1000))
+PROGRESS_HEARTBEAT_MAX_UPDATES = int(os.environ.get('PROGRESS_HEARTBEAT_MAX_UPDATES', 100))
+# A position that fails this many flushes in a row is dropped instead of retried forever
+PROGRESS_FLUSH_MAX_ATTEMPTS = int(os.environ.get('PROGRESS_FLUSH_MAX_ATTEMPTS', 5))
+
+# --------------------------
+# Leaderboards
+# --------------------------
+# Top rated ranks by a Bayesian average: every course gets this many votes of the
+# platform-wide mean rating, so a handful of 5-star reviews cannot top the board
+LEADERBOARD_PRIOR_REVIEWS = int(os.environ.get('LEADERBOARD_PRIOR_REVIEWS', 5))
+# Trending counts enrollments of the last N days
+LEADERBOARD_TRENDING_DAYS = int(os.environ.get('LEADERBOARD_TRENDING_DAYS', 7))
+
+# --------------------------
+# Video processing
+# --------------------------
+# Decode each upload once and write all renditions from one ffmpeg split filter graph
+VIDEO_SINGLE_PASS_ENCODE = os.environ.get('VIDEO_SINGLE_PASS_ENCODE', 'True').lower() in ('true', '1', 'yes')
+# 'mp4': encode MP4 renditions, then remux them to HLS
+# 'hls': encode HLS variants directly; MP4 downloads are remuxed lazily on first request
+VIDEO_PIPELINE_MODE = os.environ.get('VIDEO_PIPELINE_MODE', 'mp4').lower()
+# Lectures at least this long (seconds) are split at keyframes into VIDEO_CHUNK_SECONDS
+# chunks and encoded on VIDEO_ENCODE_WORKERS parallel ffmpeg processes (default: CPU count)
+VIDEO_CHUNKED_MIN_DURATION = int(os.environ.get('VIDEO_CHUNKED_MIN_DURATION', 1200))
+VIDEO_CHUNK_SECONDS = int(os.environ.get('VIDEO_CHUNK_SECONDS', 300))
+VIDEO_ENCODE_WORKERS = int(os.environ.get('VIDEO_ENCODE_WORKERS', 0)) or None
+# Per-lecture processing lease (seconds); renewed while an encode runs, so a crashed
+# worker blocks the lecture for at most this long
+VIDEO_ENCODE_LEASE_SECONDS = int(os.environ.get('VIDEO_ENCODE_LEASE_SECONDS', 300))
+# Minimum seconds between encode progress updates published to the cache
+VIDEO_PROGRESS_INTERVAL = float(os.environ.get('VIDEO_PROGRESS_INTERVAL', 2))
+# Local encode queue (used when Celery is not installed): encodes running at once across
+# all processes (default: half the CPUs), and the backlog at which new uploads get HTTP 429
+VIDEO_MAX_CONCURRENT_ENCODES = int(os.environ.get('VIDEO_MAX_CONCURRENT_ENCODES', 0)) or None
+VIDEO_QUEUE_MAX_PENDING = int(os.environ.get('VIDEO_QUEUE_MAX_PENDING', 50))
+# A job whose process died this many times (crash, OOM kill) is marked failed instead of re-queued
+VIDEO_QUEUE_MAX_ATTEMPTS = int(os.environ.get('VIDEO_QUEUE_MAX_ATTEMPTS', 3))
+# Run the local queue's encode threads inside gunicorn web workers too. Off by default: web
+# workers are recycled after max_requests and would orphan their ffmpeg processes. Run
+# `python manage.py run_video_queue` as its own service instead.
+VIDEO_QUEUE_IN_WEB_WORKERS = os.environ.get('VIDEO_QUEUE_IN_WEB_WORKERS', 'False').lower() in ('true', '1', 'yes')
+# Uploads up to this size are queued ahead of bulk imports
+VIDEO_SHORT_UPLOAD_BYTES = int(os.environ.get('VIDEO_SHORT_UPLOAD_BYTES', 200 * 1024 * 1024))
+# Chunked upload sessions: recommended / maximum bytes per PUT, and the largest accepted video
+VIDEO_UPLOAD_CHUNK_BYTES = int(os.environ.get('VIDEO_UPLOAD_CHUNK_BYTES', 8 * 1024 * 1024))
+VIDEO_UPLOAD_CHUNK_MAX_BYTES = int(os.environ.get('VIDEO_UPLOAD_CHUNK_MAX_BYTES', 64 * 1024 * 1024))
+VIDEO_UPLOAD_MAX_BYTES = int(os.environ.get('VIDEO_UPLOAD_MAX_BYTES', 10 * 1024 * 1024 * 1024))
+# Upload sessions with no new chunk for this long are deleted with their partial file
+VIDEO_UPLOAD_SESSION_TTL_HOURS = int(os.environ.get('VIDEO_UPLOAD_SESSION_TTL_HOURS', 24))
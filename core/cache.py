@@ -0,0 +1,100 @@
+"""
+Response cache for public, user-independent GET endpoints.
+
+    @api_view(['GET'])
+    @permission_classes([AllowAny])
+    @cache_response('catalog')
+    def home_page_courses(request): ...
+
+Entries are keyed by the view, host, URL kwargs, the normalized query string
+and the current version of each namespace. bump_namespaces() (called from
+core/signals.py on model writes) moves a namespace to a new version, so
+every older entry is simply never read again and ages out. Versions are
+random tokens rather than counters: if the 'default' cache evicts a version,
+the replacement can never equal an old one and revive stale entries. A bump
+made inside a transaction waits for the commit: bumped earlier, a concurrent
+read could store the pre-commit data under the new version.
+Only 200 responses are stored.
+"""
+import functools
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.db import transaction
+from django.http import HttpRequest
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+VERSION_KEY_PREFIX = 'respcache:ns:'
+
+
+def get_response_cache():
+    return caches['responses'] if 'responses' in settings.CACHES else cache
+
+
+def new_version():
+    """A version token that has never been used before."""
+    return uuid.uuid4().hex
+
+
+def namespace_versions(namespaces):
+    keys = [f'{VERSION_KEY_PREFIX}{namespace}' for namespace in namespaces]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            version = new_version()
+            cache.add(key, version, None)
+            versions[key] = cache.get(key, version)
+    return [versions[key] for key in keys]
+
+
+def bump_namespaces(*namespaces):
+    """Move `namespaces` to new versions once the current transaction commits (at once outside one)."""
+    def bump():
+        for namespace in namespaces:
+            cache.set(f'{VERSION_KEY_PREFIX}{namespace}', new_version(), None)
+    if namespaces:
+        transaction.on_commit(bump, robust=True)
+
+
+def _cache_key(view, request, namespaces, kwargs):
+    params = sorted(
+        (key, value) for key, values in request.query_params.lists() for value in values if value != ''
+    )
+    raw = repr((
+        f'{view.__module__}.{view.__qualname__}',
+        request.scheme, request.get_host(),
+        sorted((key, str(value).lower()) for key, value in kwargs.items()),
+        params,
+        namespace_versions(namespaces),
+    ))
+    return f'respcache:{hashlib.sha256(raw.encode()).hexdigest()}'
+
+
+def cache_response(*namespaces, timeout=None):
+    """Cache a view's 200 responses until one of `namespaces` is bumped (or `timeout` passes)."""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            request = next(arg for arg in args if isinstance(arg, (Request, HttpRequest)))
+            if request.method != 'GET':
+                return view(*args, **kwargs)
+
+            response_cache = get_response_cache()
+            key = _cache_key(view, request, namespaces, kwargs)
+            data = response_cache.get(key)
+            if data is not None:
+                return Response(data, headers={'X-Cache': 'HIT'})
+
+            response = view(*args, **kwargs)
+            if response.status_code == 200:
+                response_cache.set(
+                    key, response.data,
+                    timeout if timeout is not None else getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 3600)
+                )
+                response['X-Cache'] = 'MISS'
+            return response
+        return wrapper
+    return decorator
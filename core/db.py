@@ -0,0 +1,20 @@
+"""
+Vendor-neutral database helpers.
+"""
+from django.db import connections, router
+
+
+def upsert_options(model, unique_fields, update_fields):
+    """
+    bulk_create() keyword arguments that insert rows or, on a clash with
+    `unique_fields`, update `update_fields`.
+
+    MySQL's ON DUPLICATE KEY UPDATE takes no conflict target (Django raises
+    NotSupportedError when unique_fields is passed there) and fires on any
+    unique key, so `unique_fields` must be the model's only unique constraint
+    besides the primary key.
+    """
+    options = {'update_conflicts': True, 'update_fields': update_fields}
+    if connections[router.db_for_write(model)].features.supports_update_conflicts_with_target:
+        options['unique_fields'] = unique_fields
+    return options
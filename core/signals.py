@@ -0,0 +1,49 @@
+"""
+Invalidate cached public responses (core/cache.py) when the data behind them changes.
+
+catalog       home page, top rated, rating statistics
+sliders       featured sliders
+app_versions  latest app version per platform
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from categories.models import Category
+from courses.models import Course, Enrollment, Review
+from users.models import CustomUser
+from .cache import bump_namespaces
+from .models import AppVersion, SliderImage
+
+# Instructor fields shown on catalog cards
+INSTRUCTOR_DISPLAY_FIELDS = {'first_name', 'last_name', 'username', 'profile_image', 'role'}
+
+
+@receiver([post_save, post_delete], sender=Course)
+@receiver([post_save, post_delete], sender=Category)
+def invalidate_course_listings(sender, **kwargs):
+    bump_namespaces('catalog', 'sliders')
+
+
+@receiver([post_save, post_delete], sender=Review)
+@receiver([post_save, post_delete], sender=Enrollment)
+def invalidate_course_statistics(sender, **kwargs):
+    bump_namespaces('catalog')
+
+
+@receiver(post_save, sender=CustomUser)
+def invalidate_instructor_cards(sender, instance, update_fields=None, **kwargs):
+    if instance.role != 'instructor':
+        return
+    if update_fields is not None and not INSTRUCTOR_DISPLAY_FIELDS & set(update_fields):
+        return
+    bump_namespaces('catalog')
+
+
+@receiver([post_save, post_delete], sender=SliderImage)
+def invalidate_sliders(sender, **kwargs):
+    bump_namespaces('sliders')
+
+
+@receiver([post_save, post_delete], sender=AppVersion)
+def invalidate_app_versions(sender, **kwargs):
+    bump_namespaces('app_versions')
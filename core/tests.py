@@ -1,3 +1,54 @@
-from django.test import TestCase
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from categories.models import Category
+from courses.models import Course
+from users.models import CustomUser
+from .cache import bump_namespaces, namespace_versions
+
+TEST_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'core-tests'},
+    'responses': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'core-tests-responses'},
+}
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ResponseCacheTests(TestCase):
+
+    def setUp(self):
+        for alias in TEST_CACHES:
+            caches[alias].clear()
+        self.instructor = CustomUser.objects.create(email='i@example.com', username='instructor', role='instructor')
+        self.category = Category.objects.create(name='Music')
+
+    def add_course(self, title):
+        return Course.objects.create(
+            instructor=self.instructor, category=self.category, title=title, description='d',
+            original_price=10, thumbnail='thumbnails/course.jpg', is_published=True
+        )
+
+    def test_bump_waits_for_commit(self):
+        before = namespace_versions(['catalog'])
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            bump_namespaces('catalog')
+            self.assertEqual(namespace_versions(['catalog']), before)
+        for callback in callbacks:
+            callback()
+
+        self.assertNotEqual(namespace_versions(['catalog']), before)
+
+    def test_catalog_write_refreshes_cached_listing(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.add_course('Guitar')
+        client = APIClient()
+        self.assertEqual(len(client.get('/api/courses/home/').data['data']['courses']), 1)
+
+        # Served from cache: a raw update fires no signal
+        Course.objects.update(title='Renamed')
+        self.assertEqual(client.get('/api/courses/home/').data['data']['courses'][0]['title'], 'Guitar')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.add_course('Piano')
+        self.assertEqual(len(client.get('/api/courses/home/').data['data']['courses']), 2)
@@ -7,6 +7,7 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from django.db import models
 from django.utils import timezone
+from .cache import cache_response
 from .models import SliderImage, AppVersion
 from .serializers import SliderImageSerializer, AppVersionSerializer
 
@@ -35,6 +36,7 @@ class SliderImageViewSet(viewsets.ReadOnlyModelViewSet):
         )
 
     @action(detail=False, methods=['get'])
+    @cache_response('sliders', timeout=60) # Short timeout: sliders also go live / expire by the clock
     def featured(self, request):
         """Homepage ke liye sirf 5 featured sliders"""
         queryset = self.get_queryset()[:5] 
@@ -58,6 +60,7 @@ class AppVersionViewSet(viewsets.ReadOnlyModelViewSet):
         return queryset
 
     @action(detail=False, methods=['get'], url_path=r'latest/(?P<platform>[^/.]+)')
+    @cache_response('app_versions')
     def get_latest_version(self, request, platform=None):
         """Flutter app startup par ise call karegi"""
         version = AppVersion.objects.filter(platform=platform.lower()).first()
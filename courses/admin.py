@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Course, Section, Lecture, Resource, Enrollment, Progress, Review
+from .models import Course, Section, Lecture, VideoProcessingJob, Resource, Enrollment, Progress, Review
 from django import forms
 from django.contrib import messages
 
@@ -41,14 +41,15 @@ class LectureAdmin(admin.ModelAdmin):
     # 1. list_display mein add karo taaki bahar list mein dikhe
     list_display = ['title', 'section', 'order', 'is_preview', 'processing_status']
     list_filter = ['is_preview', 'processing_status', 'section__course']
-    readonly_fields = ['processing_status', 'duration', 'file_size', 'created_at']
+    readonly_fields = ['processing_status', 'duration', 'file_size', 'video_metadata', 'created_at']
 
     fieldsets = (
         # 2. Yahan 'is_preview' ko 'order' ke baad add karo
         ('Basic Info', {'fields': ('section', 'title', 'description', 'order', 'is_preview')}),
-        ('Video Upload', {'fields': ('video_file', 'processing_status', 'duration', 'file_size')}),
+        ('Video Upload', {'fields': ('video_file', 'processing_status', 'duration', 'file_size', 'video_metadata')}),
         ('Processed Versions (Read Only)', {
-            'fields': ('video_1080p', 'video_720p', 'video_480p', 'video_360p', 'hls_playlist'),
+            'fields': ('video_1080p', 'video_720p', 'video_480p', 'video_360p', 'hls_playlist',
+                       'poster_image', 'thumbnail_sprite', 'thumbnail_vtt'),
             'classes': ('collapse',)
         }),
     )
@@ -56,21 +57,25 @@ class LectureAdmin(admin.ModelAdmin):
     def save_model(self, request, obj, form, change):
         if 'video_file' in form.changed_data or not change:
             obj.processing_status = 'pending'
+            # Hashed by the processor from the stored file
+            obj.content_hash = ''
 
         super().save_model(request, obj, form, change)
 
         if obj.video_file and obj.processing_status == 'pending':
             from django.db import transaction
-            import threading
-            from .video_utils import process_lecture_video_universal
-            
-            def trigger_task():
-                # Direct background thread processing (Bypass Celery)
-                thread = threading.Thread(target=process_lecture_video_universal, args=(obj.id,), daemon=True)
-                thread.start()
-                    
-            transaction.on_commit(trigger_task)
-            messages.success(request, f'Video saved successfully. Processing started for "{obj.title}" in background.')
+            from .tasks import enqueue_lecture_processing, lecture_processing_priority
+
+            priority = lecture_processing_priority(obj, reencode=change)
+            transaction.on_commit(lambda: enqueue_lecture_processing(obj.id, priority))
+            messages.success(request, f'Video saved successfully. Processing queued for "{obj.title}".')
+
+
+@admin.register(VideoProcessingJob)
+class VideoProcessingJobAdmin(admin.ModelAdmin):
+    list_display = ['lecture', 'status', 'priority', 'attempts', 'worker', 'created_at', 'finished_at']
+    list_filter = ['status', 'priority']
+    readonly_fields = ['attempts', 'worker', 'created_at', 'started_at', 'heartbeat_at', 'finished_at']
 
 
 @admin.register(Resource)
@@ -0,0 +1,151 @@
+"""
+Precomputed course curriculum for the course detail page.
+
+The sections/lectures/resources tree is serialized once into
+CourseCurriculum.sections with site-relative URLs and without anything
+that depends on the caller. Writes to Section/Lecture/Resource bump the
+row's version (courses/signals.py); the next read rebuilds it. At request
+time render_curriculum only makes URLs absolute, locks lectures the caller
+may not watch and adds live encode progress.
+"""
+from django.db.models import F
+from django.utils import timezone
+
+from .models import CourseCurriculum, Section
+
+# Keys of a lecture's video_urls holding a single URL
+VIDEO_URL_KEYS = ('hls_url', 'primary_url', 'poster_url', 'thumbnails_vtt_url', 'sprite_url')
+
+
+def lecture_video_urls(lecture):
+    """Playback info of a lecture as seen by someone with access, with site-relative URLs."""
+    poster_url = lecture.poster_image.url if lecture.poster_image else None
+
+    if lecture.processing_status != 'completed':
+        return {
+            'status': lecture.processing_status,
+            'stream_type': None,
+            'primary_url': None,
+            'poster_url': poster_url
+        }
+
+    video_data = {
+        'status': 'ready',
+        'stream_type': 'mp4',
+        'hls_url': None,
+        'primary_url': None,
+        'qualities': {},
+        'available_qualities': [],
+        'poster_url': poster_url,
+        # WebVTT cues point at tiles of the sprite sheets (#xywh=...), resolved relative to the track
+        'thumbnails_vtt_url': lecture.thumbnail_vtt.url if lecture.thumbnail_vtt else None,
+        'sprite_url': lecture.thumbnail_sprite.url if lecture.thumbnail_sprite else None
+    }
+
+    if lecture.hls_playlist:
+        video_data['hls_url'] = lecture.hls_playlist.url
+        video_data['primary_url'] = video_data['hls_url']
+        video_data['stream_type'] = 'hls'
+        planned = (lecture.video_metadata or {}).get('renditions')
+        video_data['available_qualities'] = list(reversed(planned)) if planned else ['1080p', '720p', '480p', '360p']
+
+    quality_map = {
+        '1080p': lecture.video_1080p,
+        '720p': lecture.video_720p,
+        '480p': lecture.video_480p,
+        '360p': lecture.video_360p,
+    }
+
+    for quality, field in quality_map.items():
+        if field:
+            video_data['qualities'][quality] = field.url
+            if quality not in video_data['available_qualities']:
+                video_data['available_qualities'].append(quality)
+            if not video_data['primary_url']:
+                video_data['primary_url'] = field.url
+
+    if not video_data['primary_url'] and lecture.video_file:
+        video_data['primary_url'] = lecture.video_file.url
+        video_data['qualities']['original'] = lecture.video_file.url
+        if 'original' not in video_data['available_qualities']:
+            video_data['available_qualities'].append('original')
+
+    return video_data
+
+
+def localize_video_urls(video_data, lecture_id, base_url, has_access):
+    """Per-request part of video_urls: absolute URLs, enrollment lock and live encode progress."""
+    poster_url = video_data.get('poster_url')
+    poster_url = f"{base_url}{poster_url}" if poster_url else None
+
+    if not has_access:
+        return {
+            'status': 'locked',
+            'stream_type': None,
+            'primary_url': None,
+            'poster_url': poster_url,
+            'message': 'Please enroll in the course to access this lecture.'
+        }
+
+    video_data = dict(video_data)
+    for key in VIDEO_URL_KEYS:
+        if video_data.get(key):
+            video_data[key] = f"{base_url}{video_data[key]}"
+    if 'qualities' in video_data:
+        video_data['qualities'] = {quality: f"{base_url}{url}" for quality, url in video_data['qualities'].items()}
+    if video_data['status'] == 'processing':
+        from .video_utils import get_encode_progress
+        video_data['progress'] = get_encode_progress(lecture_id)
+    return video_data
+
+
+def invalidate_curriculum(course_ids=None, **filters):
+    """Mark the stored curriculum of courses (by id, or by Section filters) out of date."""
+    curricula = CourseCurriculum.objects.all()
+    if course_ids is not None:
+        course_ids = [course_id for course_id in course_ids if course_id]
+        if not course_ids:
+            return
+        curricula = curricula.filter(course_id__in=course_ids)
+    if filters:
+        curricula = curricula.filter(course__sections__in=Section.objects.filter(**filters))
+    curricula.update(version=F('version') + 1)
+
+
+def build_curriculum(course_id, version):
+    """Serialize a course's sections; stored only if no write happened since `version` was read."""
+    from .serializers import CurriculumSectionSerializer
+
+    sections = Section.objects.filter(course_id=course_id).prefetch_related('lectures__resources')
+    data = CurriculumSectionSerializer(sections, many=True).data
+    CourseCurriculum.objects.filter(course_id=course_id, version=version).update(
+        sections=data, built_version=version, built_at=timezone.now()
+    )
+    return data
+
+
+def get_curriculum(course):
+    """Stored sections of a course (uses course.curriculum if select_related), rebuilt when stale."""
+    try:
+        curriculum = course.curriculum
+    except CourseCurriculum.DoesNotExist:
+        curriculum, _ = CourseCurriculum.objects.get_or_create(course_id=course.pk)
+    if curriculum.is_stale:
+        return build_curriculum(course.pk, curriculum.version)
+    return curriculum.sections
+
+
+def render_curriculum(sections, request, has_access):
+    """Overlay the caller's view on stored sections (modified in place)."""
+    base_url = request.build_absolute_uri('/').rstrip('/') if request else ''
+    for section in sections:
+        for lecture in section['lectures']:
+            if lecture['video_file'] and request:
+                lecture['video_file'] = request.build_absolute_uri(lecture['video_file'])
+            for resource in lecture['resources']:
+                if resource['file'] and request:
+                    resource['file'] = request.build_absolute_uri(resource['file'])
+            lecture['video_urls'] = localize_video_urls(
+                lecture['video_urls'], lecture['id'], base_url, has_access or lecture['is_preview']
+            )
+    return sections
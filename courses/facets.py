@@ -0,0 +1,130 @@
+"""
+Home page catalog filters and facet counts.
+
+catalog_filters turns the query string into one Q per facet (category,
+level, price, rating); every Q is an equality/range test on an indexed
+column or on the annotations home_page_courses adds (sort_price,
+sort_rating). facet_counts runs a single GROUP BY over the unfiltered
+catalog, with one boolean column per active filter, and rolls the groups up
+in Python. Each facet's counts apply every filter except its own, so a
+filter UI can show how many courses selecting another value would give.
+"""
+from collections import defaultdict
+
+from django.conf import settings
+from django.db.models import BooleanField, Case, CharField, Count, F, FloatField, Q, Value, When
+from django.db.models.functions import Floor
+
+from categories.models import Category
+from .models import Course
+
+FACETS = ('category', 'level', 'price', 'rating')
+# Cumulative rating facet: "4.5 & up", "4.0 & up", ...
+RATING_THRESHOLDS = (4.5, 4.0, 3.5, 3.0)
+
+
+def _values(param):
+    return [value.strip() for value in (param or '').split(',') if value.strip()]
+
+
+def catalog_filters(params):
+    """{facet: Q} for the filters present in `params` (category, level, price_min/max, min_rating)."""
+    filters = {}
+
+    categories = _values(params.get('category'))
+    if categories:
+        ids = [int(value) for value in categories if value.isdigit()]
+        names = Q()
+        for value in categories:
+            if not value.isdigit():
+                names |= Q(name__iexact=value)
+        q = Q(category_id__in=ids)
+        if names:
+            q |= Q(category_id__in=Category.objects.filter(names).values('pk'))
+        filters['category'] = q
+
+    levels = {value.lower() for value in _values(params.get('level'))}
+    if levels:
+        filters['level'] = Q(level__in=[level for level, _ in Course.LEVEL_CHOICES if level.lower() in levels])
+
+    price = Q()
+    try:
+        if params.get('price_min'):
+            price &= Q(sort_price__gte=float(params.get('price_min')))
+        if params.get('price_max'):
+            price &= Q(sort_price__lte=float(params.get('price_max')))
+    except (ValueError, TypeError):
+        price = Q()
+    if price:
+        filters['price'] = price
+
+    try:
+        if params.get('min_rating'):
+            filters['rating'] = Q(sort_rating__gte=float(params.get('min_rating')))
+    except (ValueError, TypeError):
+        pass
+    return filters
+
+
+def price_buckets():
+    """[(key, min, max)] from CATALOG_PRICE_BUCKETS; max None for the open-ended top bucket."""
+    edges = getattr(settings, 'CATALOG_PRICE_BUCKETS', [500, 1000, 2000])
+    buckets, lower = [('free', 0, 0)], 0
+    for edge in edges:
+        buckets.append((f'{lower}-{edge}', lower, edge))
+        lower = edge
+    buckets.append((f'{lower}+', lower, None))
+    return buckets
+
+
+def _price_bucket_expression(buckets):
+    whens = [When(sort_price__lte=0, then=Value('free'))]
+    whens += [When(sort_price__lt=upper, then=Value(key)) for key, _, upper in buckets[1:-1]]
+    return Case(*whens, default=Value(buckets[-1][0]), output_field=CharField())
+
+
+def facet_counts(courses, filters):
+    """Counts per category, level, price bucket and rating threshold in one grouped query."""
+    buckets = price_buckets()
+    flags = {
+        f'in_{facet}': Case(When(q, then=Value(True)), default=Value(False), output_field=BooleanField())
+        for facet, q in filters.items()
+    }
+    rows = courses.order_by().annotate(
+        price_bucket=_price_bucket_expression(buckets),
+        rating_bucket=Floor(F('sort_rating') * 2, output_field=FloatField()) / 2,
+        **flags
+    ).values('category_id', 'category__name', 'level', 'price_bucket', 'rating_bucket', *flags).annotate(
+        count=Count('id')
+    )
+
+    counts = {facet: defaultdict(int) for facet in FACETS}
+    for row in rows:
+        matches = {facet: row.get(f'in_{facet}', True) for facet in FACETS}
+        keys = {
+            'category': (row['category_id'], row['category__name']),
+            'level': row['level'],
+            'price': row['price_bucket'],
+            'rating': row['rating_bucket'],
+        }
+        for facet in FACETS:
+            if all(matches[other] for other in FACETS if other != facet):
+                counts[facet][keys[facet]] += row['count']
+
+    return {
+        'category': sorted(
+            ({'id': category_id, 'name': name, 'count': count}
+             for (category_id, name), count in counts['category'].items()),
+            key=lambda item: (-item['count'], item['name'])
+        ),
+        'level': [{'value': level, 'count': counts['level'][level]} for level, _ in Course.LEVEL_CHOICES],
+        'price': [
+            {'key': key, 'min': lower, 'max': upper, 'count': counts['price'][key]}
+            for key, lower, upper in buckets
+        ],
+        'rating': [
+            {'min_rating': threshold,
+             'count': sum(count for bucket, count in counts['rating'].items() if bucket >= threshold)}
+            for threshold in RATING_THRESHOLDS
+        ],
+    }
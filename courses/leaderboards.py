@@ -0,0 +1,108 @@
+"""
+Materialized course leaderboards.
+
+LeaderboardEntry holds one scored row per (board, published course), with
+the course's category copied in, so a board or a per-category board is an
+index range scan over the highest scores:
+
+top_rated  Bayesian average: (rating_sum + m * C) / (review_count + m), with
+           C the platform-wide mean rating and m LEADERBOARD_PRIOR_REVIEWS
+popular    enrolled students
+trending   enrollments in the last LEADERBOARD_TRENDING_DAYS days
+
+Review, Enrollment and Course writes re-score the affected course after
+commit (courses/signals.py). rebuild_leaderboards recomputes every row; it
+runs periodically (Celery beat, or the rebuild_leaderboards command from
+cron) so the trending window slides and C follows the platform.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from core.cache import bump_namespaces
+from core.db import upsert_options
+from .models import Course, CourseStats, LeaderboardEntry
+from .stats import stat_expression
+
+BOARDS = [board for board, _ in LeaderboardEntry.BOARD_CHOICES]
+MEAN_RATING_CACHE_KEY = 'courses:leaderboards:mean_rating'
+
+
+def platform_mean_rating():
+    """Average rating over all reviews; cached for an hour or until the next full rebuild."""
+    mean = cache.get(MEAN_RATING_CACHE_KEY)
+    if mean is None:
+        totals = CourseStats.objects.aggregate(rating_sum=Sum('rating_sum'), review_count=Sum('review_count'))
+        if not totals['review_count']:
+            return 0.0
+        mean = totals['rating_sum'] / totals['review_count']
+        cache.set(MEAN_RATING_CACHE_KEY, mean, 3600)
+    return mean
+
+
+def _entries(course_ids=None):
+    """Unsaved LeaderboardEntry rows for published courses (all, or the given ids)."""
+    courses = Course.objects.filter(is_published=True)
+    if course_ids is not None:
+        courses = courses.filter(pk__in=course_ids)
+    prior = getattr(settings, 'LEADERBOARD_PRIOR_REVIEWS', 5)
+    mean = platform_mean_rating()
+    since = timezone.now() - timedelta(days=getattr(settings, 'LEADERBOARD_TRENDING_DAYS', 7))
+
+    rows = courses.annotate(
+        review_count=stat_expression('review_count'),
+        rating_sum=stat_expression('rating_sum'),
+        student_count=stat_expression('student_count'),
+        recent_enrollments=Count('enrollments', filter=Q(enrollments__enrolled_at__gte=since)),
+    ).values_list('pk', 'category_id', 'review_count', 'rating_sum', 'student_count', 'recent_enrollments')
+
+    entries = []
+    for course_id, category_id, review_count, rating_sum, student_count, recent in rows:
+        scores = {'popular': student_count}
+        if review_count:
+            scores['top_rated'] = (rating_sum + prior * mean) / (review_count + prior)
+        if recent:
+            scores['trending'] = recent
+        entries.extend(
+            LeaderboardEntry(board=board, course_id=course_id, category_id=category_id, score=score)
+            for board, score in scores.items()
+        )
+    return entries
+
+
+def refresh_course_rankings(course_ids):
+    """Re-score some courses on every board (drops them from boards they no longer qualify for)."""
+    course_ids = {course_id for course_id in course_ids if course_id}
+    if not course_ids:
+        return
+    entries = _entries(course_ids)
+    with transaction.atomic():
+        stale = LeaderboardEntry.objects.filter(course_id__in=course_ids)
+        for entry in entries:
+            stale = stale.exclude(board=entry.board, course_id=entry.course_id)
+        stale.delete()
+        LeaderboardEntry.objects.bulk_create(
+            entries, **upsert_options(LeaderboardEntry, ['board', 'course'], ['category', 'score', 'updated_at'])
+        )
+    bump_namespaces('catalog')
+
+
+def schedule_course_rankings(course_ids):
+    """Re-score after the current transaction commits (a cascade delete may still remove the course)."""
+    course_ids = set(course_ids)
+    transaction.on_commit(lambda: refresh_course_rankings(course_ids), robust=True)
+
+
+def rebuild_leaderboards():
+    """Recompute every board from CourseStats and enrollments. Returns the number of rows written."""
+    cache.delete(MEAN_RATING_CACHE_KEY)
+    entries = _entries()
+    with transaction.atomic():
+        LeaderboardEntry.objects.all().delete()
+        LeaderboardEntry.objects.bulk_create(entries, batch_size=500)
+    bump_namespaces('catalog')
+    return len(entries)
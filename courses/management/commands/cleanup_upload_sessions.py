@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from courses.uploads import cleanup_upload_sessions
+
+
+class Command(BaseCommand):
+    help = 'Delete abandoned chunked upload sessions and their partial files (run periodically without Celery beat).'
+
+    def handle(self, *args, **options):
+        sessions, files = cleanup_upload_sessions()
+        self.stdout.write(self.style.SUCCESS(f'Removed {sessions} upload sessions and {files} partial files.'))
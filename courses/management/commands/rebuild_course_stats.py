@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from courses.stats import rebuild_course_stats
+
+
+class Command(BaseCommand):
+    help = 'Recompute the denormalized CourseStats counters from enrollments, reviews and lectures.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('course_ids', nargs='*', type=int, help='Only rebuild these courses (default: all).')
+
+    def handle(self, *args, **options):
+        count = rebuild_course_stats(options['course_ids'] or None)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt stats for {count} courses.'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from courses.leaderboards import rebuild_leaderboards
+
+
+class Command(BaseCommand):
+    help = 'Recompute the top-rated, popular and trending course leaderboards (run periodically without Celery beat).'
+
+    def handle(self, *args, **options):
+        count = rebuild_leaderboards()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt leaderboards: {count} entries.'))
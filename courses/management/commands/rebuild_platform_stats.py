@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from courses.stats import rebuild_platform_stats
+
+
+class Command(BaseCommand):
+    help = 'Recompute the site-wide PlatformStats counters and rating histogram from courses, enrollments and reviews.'
+
+    def handle(self, *args, **options):
+        stats = rebuild_platform_stats()
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt platform stats: {stats.course_count} courses, {stats.student_count} enrollments, '
+            f'{stats.review_count} reviews.'
+        ))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from courses.search import backend_for
+
+
+class Command(BaseCommand):
+    help = 'Create (if needed) and repopulate the course / instructor / category full-text search index.'
+
+    def handle(self, *args, **options):
+        backend = backend_for(connection)
+        backend.create_tables(connection)
+        with transaction.atomic():
+            count = backend.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Indexed {count} documents with the {backend.name} backend.'))
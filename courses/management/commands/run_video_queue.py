@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from courses import tasks
+from courses.video_queue import LocalVideoQueue
+
+
+class Command(BaseCommand):
+    help = 'Run the local video encode queue in the foreground (deployments without Celery).'
+
+    def handle(self, *args, **options):
+        queue = tasks.process_lecture_video_task
+        if not isinstance(queue, LocalVideoQueue):
+            raise CommandError('Celery is installed: run a Celery worker to process lecture videos instead.')
+
+        queue.start()
+        self.stdout.write(self.style.SUCCESS(
+            f'Video queue running with {queue.concurrency} workers ({queue.pending_count()} pending jobs).'
+        ))
+        while True:
+            time.sleep(60)
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.5 on 2026-10-16 22:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0003_alter_review_options_alter_lecture_unique_together_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lecture',
+            name='video_metadata',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
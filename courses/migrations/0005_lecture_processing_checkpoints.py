@@ -0,0 +1,18 @@
+# Generated by Django 5.1.5 on 2026-10-16 22:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0004_lecture_video_metadata'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lecture',
+            name='processing_checkpoints',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
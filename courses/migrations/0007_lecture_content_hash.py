@@ -0,0 +1,18 @@
+# Generated by Django 5.1.5 on 2026-10-16 22:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0006_videoprocessingjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lecture',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.5 on 2026-10-16 22:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0008_lectureuploadsession'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lecture',
+            name='poster_image',
+            field=models.FileField(blank=True, null=True, upload_to='lecture_videos/previews/'),
+        ),
+        migrations.AddField(
+            model_name='lecture',
+            name='thumbnail_sprite',
+            field=models.FileField(blank=True, null=True, upload_to='lecture_videos/previews/'),
+        ),
+        migrations.AddField(
+            model_name='lecture',
+            name='thumbnail_vtt',
+            field=models.FileField(blank=True, null=True, upload_to='lecture_videos/previews/'),
+        ),
+    ]
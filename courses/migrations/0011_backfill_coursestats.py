@@ -0,0 +1,50 @@
+from django.db import migrations
+from django.db.models import Count, Q, Sum
+
+
+def backfill_course_stats(apps, schema_editor):
+    Course = apps.get_model('courses', 'Course')
+    CourseStats = apps.get_model('courses', 'CourseStats')
+    Enrollment = apps.get_model('courses', 'Enrollment')
+    Review = apps.get_model('courses', 'Review')
+    Lecture = apps.get_model('courses', 'Lecture')
+
+    students = dict(Enrollment.objects.values('course_id').annotate(n=Count('id')).values_list('course_id', 'n'))
+    reviews = {
+        row['course_id']: row for row in Review.objects.values('course_id').annotate(
+            review_count=Count('id'),
+            rating_sum=Sum('rating'),
+            **{f'rating_{i}': Count('id', filter=Q(rating=i)) for i in range(1, 6)}
+        )
+    }
+    lectures = {
+        row['section__course_id']: row for row in Lecture.objects.values('section__course_id').annotate(
+            lecture_count=Count('id'), total_duration=Sum('duration')
+        )
+    }
+
+    rows = []
+    for course_id in Course.objects.values_list('pk', flat=True):
+        review_row = reviews.get(course_id, {})
+        lecture_row = lectures.get(course_id, {})
+        rows.append(CourseStats(
+            course_id=course_id,
+            student_count=students.get(course_id, 0),
+            review_count=review_row.get('review_count', 0),
+            rating_sum=review_row.get('rating_sum') or 0,
+            lecture_count=lecture_row.get('lecture_count', 0),
+            total_duration=lecture_row.get('total_duration') or 0,
+            **{f'rating_{i}': review_row.get(f'rating_{i}', 0) for i in range(1, 6)}
+        ))
+    CourseStats.objects.bulk_create(rows, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0010_coursestats'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_course_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+import logging
+
+from django.db import DatabaseError, migrations
+
+from courses.search import backend_for
+
+logger = logging.getLogger(__name__)
+
+
+def create_search_index(apps, schema_editor):
+    backend = backend_for(schema_editor.connection)
+    try:
+        backend.create_tables(schema_editor.connection)
+    except DatabaseError:
+        # e.g. SQLite built without FTS5: search keeps using icontains matching
+        logger.warning("Could not create search index tables for %s", schema_editor.connection.vendor)
+        return
+    backend.rebuild({
+        'course': apps.get_model('courses', 'Course').objects.all(),
+        'instructor': apps.get_model('users', 'CustomUser').objects.filter(role='instructor'),
+        'category': apps.get_model('categories', 'Category').objects.all(),
+    })
+
+
+def drop_search_index(apps, schema_editor):
+    backend_for(schema_editor.connection).drop_tables(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0011_backfill_coursestats'),
+        ('users', '0001_initial'),
+        ('categories', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
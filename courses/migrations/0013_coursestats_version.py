@@ -0,0 +1,24 @@
+# Generated by Django 5.1.5 on 2026-10-16 22:50
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0012_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='coursestats',
+            name='last_modified',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='coursestats',
+            name='version',
+            field=models.IntegerField(default=1),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.1.5 on 2026-10-16 22:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0013_coursestats_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseCurriculum',
+            fields=[
+                ('course', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='curriculum', serialize=False, to='courses.course')),
+                ('sections', models.JSONField(blank=True, default=list)),
+                ('version', models.IntegerField(default=1)),
+                ('built_version', models.IntegerField(default=0)),
+                ('built_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Course curricula',
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+from django.db import migrations
+
+
+def create_course_curricula(apps, schema_editor):
+    Course = apps.get_model('courses', 'Course')
+    CourseCurriculum = apps.get_model('courses', 'CourseCurriculum')
+
+    # Stale rows (built_version 0); each is built on the course's next detail read
+    CourseCurriculum.objects.bulk_create(
+        [CourseCurriculum(course_id=course_id) for course_id in Course.objects.values_list('pk', flat=True)],
+        batch_size=500,
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0014_coursecurriculum'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_course_curricula, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.1.5 on 2026-10-16 22:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('categories', '0001_initial'),
+        ('courses', '0015_backfill_course_curriculum'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('board', models.CharField(choices=[('top_rated', 'Top rated'), ('popular', 'Popular'), ('trending', 'Trending')], max_length=20)),
+                ('score', models.FloatField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard_entries', to='categories.category')),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard_entries', to='courses.course')),
+            ],
+            options={
+                'verbose_name_plural': 'Leaderboard entries',
+                'ordering': ['board', '-score', 'course_id'],
+                'indexes': [models.Index(fields=['board', '-score', 'course'], name='courses_lea_board_c9e0f0_idx'), models.Index(fields=['board', 'category', '-score', 'course'], name='courses_lea_board_7cf68d_idx')],
+                'unique_together': {('board', 'course')},
+            },
+        ),
+    ]
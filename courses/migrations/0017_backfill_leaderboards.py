@@ -0,0 +1,51 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import migrations
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+
+def backfill_leaderboards(apps, schema_editor):
+    Course = apps.get_model('courses', 'Course')
+    CourseStats = apps.get_model('courses', 'CourseStats')
+    LeaderboardEntry = apps.get_model('courses', 'LeaderboardEntry')
+
+    prior = getattr(settings, 'LEADERBOARD_PRIOR_REVIEWS', 5)
+    totals = CourseStats.objects.aggregate(rating_sum=Sum('rating_sum'), review_count=Sum('review_count'))
+    mean = totals['rating_sum'] / totals['review_count'] if totals['review_count'] else 0.0
+    since = timezone.now() - timedelta(days=getattr(settings, 'LEADERBOARD_TRENDING_DAYS', 7))
+    stats = {
+        row['course_id']: row for row in
+        CourseStats.objects.values('course_id', 'review_count', 'rating_sum', 'student_count')
+    }
+    recent = dict(
+        Course.objects.filter(is_published=True).annotate(
+            n=Count('enrollments', filter=Q(enrollments__enrolled_at__gte=since))
+        ).values_list('pk', 'n')
+    )
+
+    rows = []
+    for course_id, category_id in Course.objects.filter(is_published=True).values_list('pk', 'category_id'):
+        row = stats.get(course_id, {})
+        scores = {'popular': row.get('student_count', 0)}
+        if row.get('review_count'):
+            scores['top_rated'] = (row['rating_sum'] + prior * mean) / (row['review_count'] + prior)
+        if recent.get(course_id):
+            scores['trending'] = recent[course_id]
+        rows.extend(
+            LeaderboardEntry(board=board, course_id=course_id, category_id=category_id, score=score)
+            for board, score in scores.items()
+        )
+    LeaderboardEntry.objects.bulk_create(rows, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0016_leaderboardentry'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_leaderboards, migrations.RunPython.noop),
+    ]
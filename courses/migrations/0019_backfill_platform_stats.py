@@ -0,0 +1,34 @@
+from django.db import migrations
+from django.db.models import Count, Q, Sum
+
+
+def backfill_platform_stats(apps, schema_editor):
+    Course = apps.get_model('courses', 'Course')
+    Enrollment = apps.get_model('courses', 'Enrollment')
+    Review = apps.get_model('courses', 'Review')
+    PlatformStats = apps.get_model('courses', 'PlatformStats')
+
+    reviews = Review.objects.aggregate(
+        review_count=Count('id'),
+        rating_sum=Sum('rating'),
+        **{f'rating_{i}': Count('id', filter=Q(rating=i)) for i in range(1, 6)}
+    )
+    reviews['rating_sum'] = reviews['rating_sum'] or 0
+    published = Course.objects.filter(is_published=True)
+    PlatformStats.objects.update_or_create(pk=1, defaults=dict(
+        course_count=published.count(),
+        reviewed_course_count=published.filter(reviews__isnull=False).distinct().count(),
+        student_count=Enrollment.objects.count(),
+        **reviews
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0018_platformstats'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_platform_stats, migrations.RunPython.noop),
+    ]
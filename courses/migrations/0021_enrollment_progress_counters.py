@@ -0,0 +1,23 @@
+# Generated by Django 5.1.5 on 2026-10-16 23:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0020_course_catalog_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='enrollment',
+            name='completed_lectures',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='enrollment',
+            name='total_lectures',
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,31 @@
+from django.db import migrations
+from django.db.models import Count, Q
+
+
+def backfill_enrollment_progress(apps, schema_editor):
+    Enrollment = apps.get_model('courses', 'Enrollment')
+    Lecture = apps.get_model('courses', 'Lecture')
+
+    totals = dict(
+        Lecture.objects.values('section__course_id').annotate(n=Count('id')).values_list('section__course_id', 'n')
+    )
+    enrollments = Enrollment.objects.annotate(
+        completed_count=Count('progress', filter=Q(progress__completed=True))
+    )
+    rows = []
+    for enrollment in enrollments.iterator():
+        enrollment.completed_lectures = enrollment.completed_count
+        enrollment.total_lectures = totals.get(enrollment.course_id, 0)
+        rows.append(enrollment)
+    Enrollment.objects.bulk_update(rows, ['completed_lectures', 'total_lectures'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0021_enrollment_progress_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_enrollment_progress, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,50 @@
+from collections import defaultdict
+
+from django.db import migrations
+from django.db.models import F
+
+
+def backfill_completion_bitmaps(apps, schema_editor):
+    CourseStats = apps.get_model('courses', 'CourseStats')
+    Enrollment = apps.get_model('courses', 'Enrollment')
+    Lecture = apps.get_model('courses', 'Lecture')
+    Progress = apps.get_model('courses', 'Progress')
+
+    # Slots in curriculum order, 0..n-1 per course
+    slots = defaultdict(int)
+    lectures = []
+    for lecture in Lecture.objects.select_related('section').order_by(
+        'section__course_id', 'section__order', 'section_id', 'order', 'id'
+    ).iterator():
+        lecture.bit_index = slots[lecture.section.course_id]
+        slots[lecture.section.course_id] += 1
+        lectures.append(lecture)
+    Lecture.objects.bulk_update(lectures, ['bit_index'], batch_size=500)
+    for course_id, count in slots.items():
+        CourseStats.objects.filter(course_id=course_id).update(lecture_slots=count)
+
+    bitmaps = defaultdict(bytearray)
+    completed = Progress.objects.filter(
+        completed=True, lecture__bit_index__isnull=False, lecture__section__course_id=F('enrollment__course_id')
+    ).values_list('enrollment_id', 'lecture__bit_index')
+    for enrollment_id, bit_index in completed.iterator():
+        bitmap = bitmaps[enrollment_id]
+        if bit_index // 8 >= len(bitmap):
+            bitmap.extend(bytes(bit_index // 8 + 1 - len(bitmap)))
+        bitmap[bit_index // 8] |= 1 << (bit_index % 8)
+    rows = []
+    for enrollment in Enrollment.objects.filter(pk__in=list(bitmaps)).iterator():
+        enrollment.completion_bitmap = bytes(bitmaps[enrollment.pk])
+        rows.append(enrollment)
+    Enrollment.objects.bulk_update(rows, ['completion_bitmap'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0023_completion_bitmap'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_completion_bitmaps, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.5 on 2026-10-16 23:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0024_backfill_completion_bitmap'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lecture',
+            name='processing_lease',
+            field=models.CharField(blank=True, editable=False, max_length=32),
+        ),
+        migrations.AddField(
+            model_name='lecture',
+            name='processing_lease_until',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.5 on 2026-10-16 23:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0025_lecture_processing_lease'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='videoprocessingjob',
+            name='slot',
+            field=models.PositiveSmallIntegerField(blank=True, null=True, unique=True),
+        ),
+    ]
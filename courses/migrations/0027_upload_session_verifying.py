@@ -0,0 +1,18 @@
+# Generated by Django 5.1.5 on 2026-10-16 23:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0026_videoprocessingjob_slot'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='lectureuploadsession',
+            name='status',
+            field=models.CharField(choices=[('uploading', 'Uploading'), ('verifying', 'Verifying'), ('completed', 'Completed'), ('failed', 'Failed')], default='uploading', max_length=20),
+        ),
+    ]
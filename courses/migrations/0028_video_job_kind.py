@@ -0,0 +1,23 @@
+# Generated by Django 5.1.5 on 2026-10-16 23:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0027_upload_session_verifying'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='videoprocessingjob',
+            name='kind',
+            field=models.CharField(choices=[('encode', 'Encode'), ('mp4', 'MP4 download')], default='encode', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='videoprocessingjob',
+            name='quality',
+            field=models.CharField(blank=True, max_length=10),
+        ),
+    ]
@@ -35,6 +35,12 @@ class Course(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Catalog listing, category / level facets
+            models.Index(fields=['is_published', '-created_at']),
+            models.Index(fields=['is_published', 'category']),
+            models.Index(fields=['is_published', 'level']),
+        ]
 
     def save(self, *args, **kwargs):
         if not self.slug:
@@ -88,12 +94,21 @@ class Lecture(models.Model):
     video_720p = models.FileField(upload_to='lecture_videos/720p/', null=True, blank=True)
     video_1080p = models.FileField(upload_to='lecture_videos/1080p/', null=True, blank=True)
     hls_playlist = models.FileField(upload_to='lecture_videos/hls/', null=True, blank=True)
+    poster_image = models.FileField(upload_to='lecture_videos/previews/', null=True, blank=True)
+    thumbnail_sprite = models.FileField(upload_to='lecture_videos/previews/', null=True, blank=True) # First sprite sheet
+    thumbnail_vtt = models.FileField(upload_to='lecture_videos/previews/', null=True, blank=True) # WebVTT seek thumbnails
     
     # Metadata
     processing_status = models.CharField(max_length=20, choices=PROCESSING_CHOICES, default='pending')
     duration = models.PositiveIntegerField(default=0) # Seconds
     file_size = models.BigIntegerField(default=0)
+    video_metadata = models.JSONField(default=dict, blank=True) # ffprobe stream info + planned renditions
+    processing_checkpoints = models.JSONField(default=dict, blank=True) # Finished renditions, reused on retry
+    content_hash = models.CharField(max_length=64, blank=True, db_index=True) # SHA-256 of video_file, for dedup
     is_preview = models.BooleanField(default=False)
+    bit_index = models.PositiveIntegerField(null=True, blank=True, editable=False) # Slot in Enrollment.completion_bitmap, unique per course
+    processing_lease = models.CharField(max_length=32, blank=True, editable=False) # Token of the worker encoding the lecture
+    processing_lease_until = models.DateTimeField(null=True, blank=True, editable=False) # Renewed while it runs
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True, null=True)
@@ -104,6 +119,69 @@ class Lecture(models.Model):
     def __str__(self):
         return self.title
 
+# --- 3b. VIDEO PROCESSING JOB (local encode queue when Celery is not installed) ---
+class VideoProcessingJob(models.Model):
+    KIND_CHOICES = [
+        ('encode', 'Encode'),
+        ('mp4', 'MP4 download'), # Remux one HLS variant to MP4
+    ]
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+
+    lecture = models.ForeignKey(Lecture, related_name='processing_jobs', on_delete=models.CASCADE)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES, default='encode')
+    quality = models.CharField(max_length=10, blank=True) # Rendition of an 'mp4' job
+    priority = models.PositiveSmallIntegerField(default=6) # Lower runs first
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveIntegerField(default=0)
+    worker = models.CharField(max_length=255, blank=True) # host:pid of the process running it
+    slot = models.PositiveSmallIntegerField(null=True, blank=True, unique=True) # Concurrency slot held while running
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['priority', 'created_at']
+        indexes = [models.Index(fields=['status', 'priority', 'created_at'])]
+
+    def __str__(self):
+        return f"{self.lecture_id} ({self.status}, priority {self.priority})"
+
+# --- 3c. LECTURE UPLOAD SESSION (chunked, resumable video uploads) ---
+class LectureUploadSession(models.Model):
+    STATUS_CHOICES = [
+        ('uploading', 'Uploading'),
+        ('verifying', 'Verifying'), # Checksum check queued with the lecture's processing
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    lecture = models.ForeignKey(Lecture, related_name='upload_sessions', on_delete=models.CASCADE)
+    uploaded_by = models.ForeignKey(CustomUser, related_name='lecture_upload_sessions', on_delete=models.CASCADE)
+    filename = models.CharField(max_length=255)
+    total_size = models.BigIntegerField()
+    received_bytes = models.BigIntegerField(default=0) # Resume offset
+    checksum = models.CharField(max_length=64) # Expected SHA-256 of the assembled file
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='uploading')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.filename} ({self.received_bytes}/{self.total_size})"
+
+    @property
+    def relative_path(self):
+        return f'lecture_videos/uploads/{self.id}.part'
+
 # --- 4. RESOURCE MODEL ---
 class Resource(models.Model):
     lecture = models.ForeignKey(Lecture, related_name='resources', on_delete=models.CASCADE)
@@ -126,16 +204,18 @@ class Enrollment(models.Model):
     completed_at = models.DateTimeField(null=True, blank=True)
     # null=True, blank=True lagaya hai taaki migration error na aaye
     last_accessed = models.DateTimeField(auto_now=True, null=True, blank=True)
+    # Counters kept by courses/signals.py (Progress completion changes, Lecture add/delete)
+    completed_lectures = models.IntegerField(default=0)
+    total_lectures = models.IntegerField(default=0) # Lectures in the course
+    completion_bitmap = models.BinaryField(default=b'', blank=True) # Bit Lecture.bit_index set = lecture completed
 
     class Meta:
         unique_together = ['user', 'course']
 
     @property
     def progress_percentage(self):
-        total = self.course.total_lectures_count
-        if total == 0: return 0.0
-        completed = self.progress.filter(completed=True).count()
-        return round((completed / total) * 100, 1)
+        if self.total_lectures <= 0: return 0.0
+        return round((min(self.completed_lectures, self.total_lectures) / self.total_lectures) * 100, 1)
 
     def __str__(self):
         return f"{self.user.email} - {self.course.title}"
@@ -161,4 +241,108 @@ class Review(models.Model):
     updated_at = models.DateTimeField(auto_now=True, null=True)
 
     class Meta:
-        unique_together = ['course', 'student']
\ No newline at end of file
+        unique_together = ['course', 'student']
+# --- 8. COURSE STATS (denormalized counters, kept current by courses/signals.py) ---
+class CourseStats(models.Model):
+    course = models.OneToOneField(Course, related_name='stats', on_delete=models.CASCADE, primary_key=True)
+    student_count = models.IntegerField(default=0)
+    review_count = models.IntegerField(default=0)
+    rating_sum = models.IntegerField(default=0)
+    rating_1 = models.IntegerField(default=0)
+    rating_2 = models.IntegerField(default=0)
+    rating_3 = models.IntegerField(default=0)
+    rating_4 = models.IntegerField(default=0)
+    rating_5 = models.IntegerField(default=0)
+    lecture_count = models.IntegerField(default=0)
+    total_duration = models.IntegerField(default=0) # Seconds, all lectures
+    lecture_slots = models.IntegerField(default=0) # Lecture.bit_index values handed out, never reused
+    # Bumped on any change to the course tree; ETag / Last-Modified of the course detail
+    version = models.IntegerField(default=1)
+    last_modified = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = 'Course stats'
+
+    def __str__(self):
+        return f"Stats for course {self.course_id}"
+
+    @property
+    def average_rating(self):
+        return round(self.rating_sum / self.review_count, 1) if self.review_count else 0.0
+
+    @property
+    def rating_distribution(self):
+        return {f'{i}_star': getattr(self, f'rating_{i}') for i in range(1, 6)}
+
+# --- 9. COURSE CURRICULUM (serialized sections/lectures/resources, rebuilt after changes) ---
+class CourseCurriculum(models.Model):
+    course = models.OneToOneField(Course, related_name='curriculum', on_delete=models.CASCADE, primary_key=True)
+    sections = models.JSONField(default=list, blank=True) # Site-relative URLs, no per-user fields
+    version = models.IntegerField(default=1) # Bumped by courses/signals.py on Section/Lecture/Resource writes
+    built_version = models.IntegerField(default=0) # Version the stored sections were built from
+    built_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name_plural = 'Course curricula'
+
+    def __str__(self):
+        return f"Curriculum for course {self.course_id}"
+
+    @property
+    def is_stale(self):
+        return self.built_version != self.version
+
+# --- 10. LEADERBOARD ENTRY (materialized course rankings, see courses/leaderboards.py) ---
+class LeaderboardEntry(models.Model):
+    BOARD_CHOICES = [
+        ('top_rated', 'Top rated'),
+        ('popular', 'Popular'),
+        ('trending', 'Trending'),
+    ]
+
+    board = models.CharField(max_length=20, choices=BOARD_CHOICES)
+    course = models.ForeignKey(Course, related_name='leaderboard_entries', on_delete=models.CASCADE)
+    category = models.ForeignKey(Category, related_name='leaderboard_entries', on_delete=models.CASCADE) # Copy of course.category, for per-category boards
+    score = models.FloatField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['board', '-score', 'course_id']
+        unique_together = ['board', 'course']
+        indexes = [
+            models.Index(fields=['board', '-score', 'course']),
+            models.Index(fields=['board', 'category', '-score', 'course']),
+        ]
+        verbose_name_plural = 'Leaderboard entries'
+
+    def __str__(self):
+        return f"{self.board}: {self.course_id} ({self.score:.3f})"
+
+# --- 11. PLATFORM STATS (single row of site-wide counters, kept current by courses/signals.py) ---
+class PlatformStats(models.Model):
+    course_count = models.IntegerField(default=0) # Published courses
+    reviewed_course_count = models.IntegerField(default=0) # Published courses with at least one review
+    student_count = models.IntegerField(default=0) # Enrollments
+    review_count = models.IntegerField(default=0)
+    rating_sum = models.IntegerField(default=0)
+    rating_1 = models.IntegerField(default=0)
+    rating_2 = models.IntegerField(default=0)
+    rating_3 = models.IntegerField(default=0)
+    rating_4 = models.IntegerField(default=0)
+    rating_5 = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = 'Platform stats'
+
+    def __str__(self):
+        return "Platform stats"
+
+    @property
+    def average_rating(self):
+        return round(self.rating_sum / self.review_count, 1) if self.review_count else 0.0
+
+    @property
+    def rating_distribution(self):
+        return {f'{i}_star': getattr(self, f'rating_{i}') for i in range(1, 6)}
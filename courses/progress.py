@@ -0,0 +1,301 @@
+"""
+Lecture progress writes, and the per-course progress report.
+
+Playback heartbeats only move `last_position`, so they go into a
+per-process write-behind buffer (ProgressBuffer) that keeps the latest
+position per (enrollment, lecture) and writes them all with one bulk upsert
+every PROGRESS_FLUSH_SECONDS, or as soon as PROGRESS_BUFFER_MAX entries are
+waiting. A crash loses at most one interval of positions, and a position
+that fails PROGRESS_FLUSH_MAX_ATTEMPTS flushes is dropped. Completion
+changes are written immediately through record_progress.
+
+Enrollment.completed_lectures / total_lectures are counters adjusted with
+F() expressions on Progress completion changes and Lecture add/delete
+(courses/signals.py), and Enrollment.completed is reconciled from them in
+the same write, so reads never recount.
+
+Enrollment.completion_bitmap answers "which lectures are done" without
+loading Progress rows: bit Lecture.bit_index (least significant bit first
+within each byte) is set while the lecture's Progress row is completed. A
+lecture's bit_index is handed out from CourseStats.lecture_slots when it is
+created in (or moved to) a course and never reused, so reordering lectures
+never rewrites bitmaps and a stale bit can never light up another lecture.
+
+Progress and Enrollment writes (signals, and the buffer flush) call
+invalidate_resume so the per-user continue-learning cache (courses/resume.py)
+is rebuilt on the next read.
+
+progress_report only reads: completion state is already reconciled on the
+write path, so opening the course player never writes.
+"""
+import atexit
+import logging
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from core.cache import bump_namespaces
+from core.db import upsert_options
+from .models import Enrollment, Lecture, Progress, Section
+
+logger = logging.getLogger(__name__)
+
+
+def resume_namespace(user_id):
+    """core.cache namespace of a user's continue-learning data."""
+    return f'resume:{user_id}'
+
+
+def invalidate_resume(user_ids):
+    """Drop the cached continue-learning data of these users."""
+    bump_namespaces(*{resume_namespace(user_id) for user_id in user_ids if user_id})
+
+
+def reconcile_completion(enrollments):
+    """Set completed / completed_at on `enrollments` (a queryset) from their counters."""
+    enrollments.filter(
+        completed=False, total_lectures__gt=0, completed_lectures__gte=F('total_lectures')
+    ).update(completed=True, completed_at=timezone.now())
+    enrollments.filter(completed=True).filter(
+        Q(total_lectures__lte=0) | Q(completed_lectures__lt=F('total_lectures'))
+    ).update(completed=False, completed_at=None)
+
+
+def completion_bit(bitmap, bit_index):
+    """Whether the lecture with `bit_index` is marked completed in `bitmap`."""
+    if bit_index is None or bit_index // 8 >= len(bitmap or b''):
+        return False
+    return bool(bitmap[bit_index // 8] >> (bit_index % 8) & 1)
+
+
+def set_completion_bit(bitmap, bit_index, completed):
+    """A copy of `bitmap` with the lecture's bit set or cleared (trailing zero bytes dropped)."""
+    bitmap = bytearray(bitmap or b'')
+    byte, mask = bit_index // 8, 1 << (bit_index % 8)
+    if byte >= len(bitmap):
+        bitmap.extend(bytes(byte + 1 - len(bitmap)))
+    if completed:
+        bitmap[byte] |= mask
+    else:
+        bitmap[byte] &= ~mask & 0xFF
+    return bytes(bitmap.rstrip(b'\0'))
+
+
+def completed_lecture_ids(bitmap, lectures):
+    """Ids of `lectures` (objects with id and bit_index) completed according to `bitmap`."""
+    return {lecture.id for lecture in lectures if completion_bit(bitmap, lecture.bit_index)}
+
+
+def mark_lecture_completion(enrollment_id, lecture_id, completed):
+    """A Progress row of the enrollment became completed or stopped being completed."""
+    # A lecture moved to another course has a slot there, not in this enrollment's bitmap
+    bit_index = Lecture.objects.filter(pk=lecture_id, section__course__enrollments=enrollment_id).values_list(
+        'bit_index', flat=True
+    ).first()
+    enrollments = Enrollment.objects.filter(pk=enrollment_id)
+    with transaction.atomic():
+        # Lock the row: the bitmap is rewritten whole, unlike the F() counter
+        bitmap = enrollments.select_for_update().values_list('completion_bitmap', flat=True).first()
+        if bitmap is None:
+            return
+        updates = {'completed_lectures': F('completed_lectures') + (1 if completed else -1)}
+        if bit_index is not None:
+            updates['completion_bitmap'] = set_completion_bit(bytes(bitmap), bit_index, completed)
+        enrollments.update(**updates)
+        reconcile_completion(enrollments)
+
+
+def adjust_total_lectures(course_id, delta):
+    """A lecture was added to (+1) or removed from (-1) the course."""
+    enrollments = Enrollment.objects.filter(course_id=course_id)
+    if course_id and enrollments.update(total_lectures=F('total_lectures') + delta):
+        reconcile_completion(enrollments)
+
+
+def sync_enrollment_completion(enrollment):
+    """Reload the enrollment's counters, bitmap and completion state (kept by the signals) and touch last_accessed."""
+    enrollment.refresh_from_db(fields=['completed_lectures', 'total_lectures', 'completion_bitmap', 'completed', 'completed_at'])
+    enrollment.save(update_fields=['last_accessed'])
+
+
+def _percentage(done, total):
+    return round((done / total * 100), 1) if total > 0 else 0
+
+
+def progress_report(enrollment):
+    """
+    Per-section and overall completion and watched duration for the
+    course_progress endpoint: two queries (sections with their lectures,
+    and the enrollment's Progress rows), aggregated in one pass.
+    """
+    progress = {
+        lecture_id: (last_position, updated_at)
+        for lecture_id, last_position, updated_at in Progress.objects.filter(enrollment=enrollment).values_list(
+            'lecture_id', 'last_position', 'updated_at'
+        )
+    }
+    # LEFT JOIN: a section without lectures comes back once with lecture fields None
+    rows = Section.objects.filter(course_id=enrollment.course_id).order_by(
+        'order', 'id', 'lectures__order', 'lectures__id'
+    ).values_list('id', 'title', 'lectures__id', 'lectures__title', 'lectures__duration', 'lectures__bit_index')
+
+    sections = {}
+    for section_id, section_title, lecture_id, title, duration, bit_index in rows:
+        section = sections.get(section_id)
+        if section is None:
+            section = sections[section_id] = {
+                'id': section_id, 'title': section_title, 'lectures': [],
+                'completed_lectures': 0, 'total_lectures': 0, 'total_duration': 0, 'watched_duration': 0,
+            }
+        if lecture_id is None:
+            continue
+        last_position, updated_at = progress.get(lecture_id, (0, None))
+        completed = completion_bit(enrollment.completion_bitmap, bit_index)
+        section['lectures'].append({
+            'id': lecture_id,
+            'title': title,
+            'duration': duration,
+            'completed': completed,
+            'last_position': last_position,
+            'updated_at': updated_at.isoformat() if updated_at else None
+        })
+        section['total_lectures'] += 1
+        section['total_duration'] += duration
+        if completed:
+            section['completed_lectures'] += 1
+            section['watched_duration'] += duration
+        elif lecture_id in progress:
+            section['watched_duration'] += min(last_position / 60, duration)
+
+    sections = list(sections.values())
+    total_lectures = sum(section['total_lectures'] for section in sections)
+    completed_lectures = sum(section['completed_lectures'] for section in sections)
+    return {
+        'course_id': enrollment.course_id,
+        'progress_percentage': min(_percentage(completed_lectures, total_lectures), 100.0),
+        'total_lectures': total_lectures,
+        'completed_lectures': completed_lectures,
+        'total_duration': sum(section['total_duration'] for section in sections),
+        'watched_duration': round(sum(section['watched_duration'] for section in sections), 1),
+        'sections': [{
+            'id': section['id'],
+            'title': section['title'],
+            'lectures': section['lectures'],
+            'completed_lectures': section['completed_lectures'],
+            'total_lectures': section['total_lectures'],
+            'progress_percentage': _percentage(section['completed_lectures'], section['total_lectures']),
+            'total_duration': section['total_duration'],
+            'watched_duration': round(section['watched_duration'], 1)
+        } for section in sections]
+    }
+
+
+def record_progress(enrollment, lecture_id, completed, last_position):
+    """Write one lecture's progress now (completion events); supersedes any buffered position."""
+    progress_buffer.discard(enrollment.pk, lecture_id)
+    with transaction.atomic():
+        progress, _ = Progress.objects.update_or_create(
+            enrollment=enrollment, lecture_id=lecture_id,
+            defaults={'completed': completed, 'last_position': last_position}
+        )
+        sync_enrollment_completion(enrollment)
+    return progress
+
+
+class ProgressBuffer:
+    """Coalesces playback positions per (enrollment, lecture) and flushes them in bulk."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._pending = {}  # (enrollment_id, lecture_id) -> last_position
+        self._failures = {}  # (enrollment_id, lecture_id) -> failed flushes so far
+        self._started = False
+
+    @property
+    def interval(self):
+        return getattr(settings, 'PROGRESS_FLUSH_SECONDS', 10)
+
+    def add(self, enrollment_id, lecture_id, last_position):
+        with self._lock:
+            self._pending[(enrollment_id, lecture_id)] = last_position
+            full = len(self._pending) >= getattr(settings, 'PROGRESS_BUFFER_MAX', 1000)
+        self.start()
+        if full:
+            self._wakeup.set()
+
+    def discard(self, enrollment_id, lecture_id):
+        with self._lock:
+            self._pending.pop((enrollment_id, lecture_id), None)
+            self._failures.pop((enrollment_id, lecture_id), None)
+
+    def flush(self):
+        """Write everything buffered; returns the number of Progress rows upserted."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+        try:
+            now = timezone.now()
+            rows = [
+                Progress(enrollment_id=enrollment_id, lecture_id=lecture_id, last_position=last_position)
+                for (enrollment_id, lecture_id), last_position in pending.items()
+            ]
+            with transaction.atomic():
+                # New rows start not completed; existing rows only get a new position
+                Progress.objects.bulk_create(
+                    rows, batch_size=500,
+                    **upsert_options(Progress, ['enrollment', 'lecture'], ['last_position', 'updated_at'])
+                )
+                enrollments = Enrollment.objects.filter(pk__in={key[0] for key in pending})
+                enrollments.update(last_accessed=now)
+            invalidate_resume(enrollments.values_list('user_id', flat=True))
+        except Exception:
+            self._requeue(pending)
+            return 0
+        with self._lock:
+            for key in pending:
+                self._failures.pop(key, None)
+        return len(rows)
+
+    def _requeue(self, pending):
+        """Keep positions from a failed flush for the next one, up to PROGRESS_FLUSH_MAX_ATTEMPTS tries."""
+        max_attempts = getattr(settings, 'PROGRESS_FLUSH_MAX_ATTEMPTS', 5)
+        dropped = 0
+        with self._lock:
+            for key, last_position in pending.items():
+                failures = self._failures.get(key, 0) + 1
+                if failures >= max_attempts:
+                    self._failures.pop(key, None)
+                    dropped += 1
+                    continue
+                self._failures[key] = failures
+                self._pending.setdefault(key, last_position)
+        logger.exception(
+            "Progress flush failed; %s positions kept for the next attempt, %s dropped",
+            len(pending) - dropped, dropped
+        )
+
+    def start(self):
+        """Start this process's flusher thread (idempotent)."""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        threading.Thread(target=self._run, name='progress-flusher', daemon=True).start()
+        atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            finally:
+                close_old_connections()
+
+
+progress_buffer = ProgressBuffer()
@@ -0,0 +1,109 @@
+"""
+Continue-learning (resume) data for a user's in-progress enrollments.
+
+build_resume covers every enrollment at once in three queries: the
+enrollments, with their most recent unfinished Progress row picked by a
+subquery; the lectures of those courses in curriculum order; and those
+Progress rows. The next lecture is the first one whose bit is clear in
+Enrollment.completion_bitmap. Lecture totals come from the enrollment
+counters.
+
+resume_for_user caches the result per user and host under the core.cache
+namespace resume:<user id>, bumped on Progress and Enrollment writes
+(invalidate_resume). An entry also records the CourseStats version stamp of
+each course it was built from and is only served while they all match, so
+curriculum, title or instructor edits show up without touching every
+enrolled learner's cache.
+"""
+import hashlib
+from collections import defaultdict
+
+from django.conf import settings
+from django.db.models import OuterRef, Subquery
+
+from core.cache import get_response_cache, namespace_versions
+from .models import CourseStats, Lecture, Progress
+from .progress import completion_bit, resume_namespace
+from .serializers import EnrollmentSerializer
+from .stats import stat_expression
+
+
+def _duration_display(seconds):
+    return f"{seconds // 60}:{seconds % 60:02d}"
+
+
+def build_resume(enrollments, request):
+    """(data, {course_id: version}) for `enrollments` (a queryset, in display order)."""
+    last_watched = Progress.objects.filter(enrollment=OuterRef('pk'), completed=False).order_by('-updated_at', '-pk')
+    enrollments = list(enrollments.annotate(
+        last_progress_id=Subquery(last_watched.values('pk')[:1]),
+        course_version=stat_expression('version', prefix='course__stats__'),
+    ))
+    if not enrollments:
+        return [], {}
+
+    lectures = defaultdict(list)
+    for course_id, *lecture in Lecture.objects.filter(
+        section__course_id__in={enrollment.course_id for enrollment in enrollments}
+    ).order_by('section__course_id', 'section__order', 'section_id', 'order', 'id').values_list(
+        'section__course_id', 'id', 'title', 'duration', 'bit_index'
+    ):
+        lectures[course_id].append(lecture)
+
+    progress = {
+        row['pk']: row for row in Progress.objects.filter(
+            pk__in=[enrollment.last_progress_id for enrollment in enrollments if enrollment.last_progress_id]
+        ).values('pk', 'lecture_id', 'lecture__title', 'last_position', 'completed')
+    }
+
+    data = []
+    for enrollment in enrollments:
+        next_lecture = next(
+            (lecture for lecture in lectures[enrollment.course_id]
+             if not completion_bit(enrollment.completion_bitmap, lecture[3])),
+            None
+        )
+        last_progress = progress.get(enrollment.last_progress_id)
+
+        enrollment_data = EnrollmentSerializer(enrollment, context={'request': request}).data
+        enrollment_data['continue_learning'] = {
+            'next_lecture': {
+                'id': next_lecture[0],
+                'title': next_lecture[1],
+                'duration': next_lecture[2],
+                'duration_display': _duration_display(next_lecture[2]),
+            } if next_lecture else None,
+            'last_watched_lecture': {
+                'id': last_progress['lecture_id'],
+                'title': last_progress['lecture__title'],
+                'last_position': last_progress['last_position'],
+                'completed': last_progress['completed'],
+            } if last_progress else None,
+            'total_completed_lectures': enrollment.completed_lectures,
+            'total_lectures': enrollment.total_lectures,
+        }
+        data.append(enrollment_data)
+    return data, {enrollment.course_id: enrollment.course_version for enrollment in enrollments}
+
+
+def _cache_key(request):
+    user_id = request.user.pk
+    raw = repr((user_id, request.scheme, request.get_host(), namespace_versions([resume_namespace(user_id)])))
+    return f'resume:{hashlib.sha256(raw.encode()).hexdigest()}'
+
+
+def resume_for_user(request, enrollments):
+    """build_resume for the requesting user's `enrollments`, served from cache while still current."""
+    response_cache = get_response_cache()
+    key = _cache_key(request)
+    entry = response_cache.get(key)
+    if entry is not None:
+        versions = dict(CourseStats.objects.filter(course_id__in=entry['courses']).values_list('course_id', 'version'))
+        if all(versions.get(course_id, 0) == version for course_id, version in entry['courses'].items()):
+            return entry['data']
+
+    data, courses = build_resume(enrollments, request)
+    response_cache.set(
+        key, {'data': data, 'courses': courses}, getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 3600)
+    )
+    return data
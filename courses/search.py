@@ -0,0 +1,426 @@
+"""
+Full-text search over courses, instructors and categories.
+
+One interface, three backends picked from the database vendor:
+
+* SQLite (dev): FTS5 virtual tables ranked with bm25()
+* MySQL (prod): InnoDB FULLTEXT indexes, MATCH ... AGAINST in boolean mode
+* anything else / tables missing: the original icontains matching
+
+The index is a set of plain tables next to the app's own, kept current by
+courses/signals.py and rebuilt with `manage.py rebuild_search_index`.
+Every backend narrows a queryset and annotates it with `search_score`
+(higher is better), so callers order and paginate as usual. The index
+backends do both in SQL: the match is a subquery on the index table and the
+score a correlated subquery reading the vendor's relevance for each row, so
+every match is ranked and counted, however many there are.
+"""
+import abc
+import logging
+import re
+
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Case, FloatField, IntegerField, Q, Value, When
+from django.db.models.expressions import RawSQL
+
+logger = logging.getLogger(__name__)
+
+# Indexed documents: table, (column -> BM25 weight), and the model fields each column is built from
+DOCUMENTS = {
+    'course': {
+        'table': 'courses_search_course',
+        'columns': {'title': 10.0, 'instructor': 5.0, 'category': 4.0, 'body': 1.0},
+        'fields': {
+            'title': ['title'],
+            'instructor': ['instructor__first_name', 'instructor__last_name',
+                           'instructor__username', 'instructor__headline'],
+            'category': ['category__name', 'category__description'],
+            'body': ['description', 'learning_objectives', 'requirements', 'target_audience'],
+        },
+    },
+    'instructor': {
+        'table': 'courses_search_instructor',
+        'columns': {'name': 10.0, 'username': 8.0, 'headline': 3.0, 'expertise': 3.0, 'bio': 1.0},
+        'fields': {
+            'name': ['first_name', 'last_name'],
+            'username': ['username'],
+            'headline': ['headline'],
+            'expertise': ['expertise'],
+            'bio': ['bio'],
+        },
+    },
+    'category': {
+        'table': 'courses_search_category',
+        'columns': {'name': 10.0, 'description': 2.0},
+        'fields': {
+            'name': ['name'],
+            'description': ['description'],
+        },
+    },
+}
+
+# Fields whose change requires reindexing (used to skip unrelated saves)
+INSTRUCTOR_INDEXED_FIELDS = {'first_name', 'last_name', 'username', 'headline', 'expertise', 'bio', 'role'}
+
+
+def search_tokens(text):
+    return re.findall(r'\w+', (text or '').lower())
+
+
+def _document_models():
+    from categories.models import Category
+    from users.models import CustomUser
+    from .models import Course
+    return {
+        'course': Course.objects.all(),
+        'instructor': CustomUser.objects.filter(role='instructor'),
+        'category': Category.objects.all(),
+    }
+
+
+class BasicSearchBackend:
+    """icontains matching across the same fields; no index to maintain."""
+    name = 'basic'
+
+    def _filter(self, kind, queryset, text):
+        if kind == 'course':
+            return queryset.filter(_course_search_q(text)).annotate(
+                # 0 is the best bucket of the old rank; flip it so higher is better everywhere
+                search_score=Value(100) - _udemy_search_rank_case(text)
+            )
+        q = _instructor_search_q(text) if kind == 'instructor' else _category_tokens_q(text)
+        return queryset.filter(q).annotate(search_score=Value(0, output_field=IntegerField()))
+
+    def filter_courses(self, queryset, text):
+        return self._filter('course', queryset, text)
+
+    def filter_instructors(self, queryset, text):
+        return self._filter('instructor', queryset, text)
+
+    def filter_categories(self, queryset, text):
+        return self._filter('category', queryset, text)
+
+    def create_tables(self, connection):
+        pass
+
+    def drop_tables(self, connection):
+        pass
+
+    def index(self, kind, ids):
+        pass
+
+    def remove(self, kind, ids):
+        pass
+
+    def rebuild(self, querysets=None):
+        return 0
+
+
+class SQLSearchBackend(BasicSearchBackend, metaclass=abc.ABCMeta):
+    """Shared document building and (re)indexing for the vendor index tables."""
+    id_column = 'doc_id'
+
+    # -- querying --
+    @abc.abstractmethod
+    def match_query(self, tokens):
+        """The vendor's full-text query for `tokens`."""
+
+    @abc.abstractmethod
+    def match_sql(self, kind):
+        """(SELECT of matching document ids, SELECT of the score of document `{doc_id}`); every %s is the query."""
+
+    def _filter(self, kind, queryset, text):
+        query = self.match_query(search_tokens(text))
+        if not query:
+            return queryset.none().annotate(search_score=Value(0.0, output_field=FloatField()))
+        ids_sql, score_sql = self.match_sql(kind)
+        meta = queryset.model._meta
+        doc_id = f'{connection.ops.quote_name(meta.db_table)}.{connection.ops.quote_name(meta.pk.column)}'
+        return queryset.filter(pk__in=RawSQL(ids_sql, [query] * ids_sql.count('%s'))).annotate(
+            search_score=RawSQL(
+                f'({score_sql.format(doc_id=doc_id)})', [query] * score_sql.count('%s'), output_field=FloatField()
+            )
+        )
+
+    # -- indexing --
+    def _rows(self, kind, queryset):
+        spec = DOCUMENTS[kind]
+        value_fields = ['pk'] + [field for fields in spec['fields'].values() for field in fields]
+        for values in queryset.values(*value_fields).iterator():
+            row = [values['pk']]
+            for column in spec['columns']:
+                row.append(' '.join(str(values[field]) for field in spec['fields'][column] if values[field]))
+            yield row
+
+    def _write(self, kind, queryset, ids=None):
+        spec = DOCUMENTS[kind]
+        table, columns = spec['table'], list(spec['columns'])
+        insert_sql = (
+            f"INSERT INTO {table} ({self.id_column}, {', '.join(columns)}) "
+            f"VALUES ({', '.join(['%s'] * (len(columns) + 1))})"
+        )
+        written = 0
+        with connection.cursor() as cursor:
+            if ids is not None:
+                ids = list(ids)
+                if not ids:
+                    return 0
+                cursor.execute(
+                    f"DELETE FROM {table} WHERE {self.id_column} IN ({', '.join(['%s'] * len(ids))})", ids
+                )
+                queryset = queryset.filter(pk__in=ids)
+            else:
+                cursor.execute(f"DELETE FROM {table}")
+            batch = []
+            for row in self._rows(kind, queryset):
+                batch.append(row)
+                if len(batch) >= 500:
+                    cursor.executemany(insert_sql, batch)
+                    written += len(batch)
+                    batch = []
+            if batch:
+                cursor.executemany(insert_sql, batch)
+                written += len(batch)
+        return written
+
+    def index(self, kind, ids):
+        try:
+            with transaction.atomic():
+                self._write(kind, _document_models()[kind], ids)
+        except DatabaseError:
+            # Search must never break the write that triggered it; rebuild_search_index repairs drift
+            logger.exception("Search index update failed for %s %s", kind, ids)
+
+    def remove(self, kind, ids):
+        ids = list(ids)
+        if not ids:
+            return
+        try:
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(
+                    f"DELETE FROM {DOCUMENTS[kind]['table']} WHERE {self.id_column} IN ({', '.join(['%s'] * len(ids))})",
+                    ids
+                )
+        except DatabaseError:
+            logger.exception("Search index delete failed for %s %s", kind, ids)
+
+    def rebuild(self, querysets=None):
+        """Reindex everything; `querysets` lets migrations pass historical models."""
+        querysets = querysets or _document_models()
+        return sum(self._write(kind, querysets[kind]) for kind in DOCUMENTS)
+
+
+class SQLiteFTS5Backend(SQLSearchBackend):
+    name = 'sqlite_fts5'
+    id_column = 'rowid'
+
+    def create_tables(self, connection):
+        with connection.cursor() as cursor:
+            for spec in DOCUMENTS.values():
+                cursor.execute(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {spec['table']} USING fts5("
+                    f"{', '.join(spec['columns'])}, tokenize = 'unicode61 remove_diacritics 2')"
+                )
+
+    def drop_tables(self, connection):
+        with connection.cursor() as cursor:
+            for spec in DOCUMENTS.values():
+                cursor.execute(f"DROP TABLE IF EXISTS {spec['table']}")
+
+    def match_query(self, tokens):
+        # Prefix terms ORed together, like the old per-word icontains
+        return ' OR '.join(f'"{token}"*' for token in tokens)
+
+    def match_sql(self, kind):
+        spec = DOCUMENTS[kind]
+        table = spec['table']
+        bm25 = f"bm25({table}, {', '.join(str(weight) for weight in spec['columns'].values())})"
+        # FTS5 answers MATCH + rowid = ? with a seek, so the per-row score is cheap
+        return (
+            f"SELECT rowid FROM {table} WHERE {table} MATCH %s",
+            f"SELECT -{bm25} FROM {table} WHERE {table} MATCH %s AND rowid = {{doc_id}}",
+        )
+
+
+class MySQLFullTextBackend(SQLSearchBackend):
+    name = 'mysql_fulltext'
+    # InnoDB drops words shorter than innodb_ft_min_token_size (3 by default)
+    min_token_size = 3
+
+    def create_tables(self, connection):
+        with connection.cursor() as cursor:
+            for spec in DOCUMENTS.values():
+                columns = list(spec['columns'])
+                cursor.execute(
+                    f"CREATE TABLE IF NOT EXISTS {spec['table']} ("
+                    f"doc_id BIGINT NOT NULL PRIMARY KEY, "
+                    f"{', '.join(f'{column} LONGTEXT' for column in columns)}, "
+                    f"FULLTEXT KEY {spec['table']}_ft ({', '.join(columns)}), "
+                    f"FULLTEXT KEY {spec['table']}_{columns[0]}_ft ({columns[0]})"
+                    f") ENGINE=InnoDB DEFAULT CHARSET=utf8mb4"
+                )
+
+    def drop_tables(self, connection):
+        with connection.cursor() as cursor:
+            for spec in DOCUMENTS.values():
+                cursor.execute(f"DROP TABLE IF EXISTS {spec['table']}")
+
+    def _filter(self, kind, queryset, text):
+        if not any(len(token) >= self.min_token_size for token in search_tokens(text)):
+            # Nothing the FULLTEXT index can see (e.g. "c", "ui"): fall back to icontains
+            return BasicSearchBackend._filter(self, kind, queryset, text)
+        return super()._filter(kind, queryset, text)
+
+    def match_query(self, tokens):
+        return ' '.join(f'{token}*' for token in tokens if len(token) >= self.min_token_size)
+
+    def match_sql(self, kind):
+        spec = DOCUMENTS[kind]
+        table, columns = spec['table'], list(spec['columns'])
+        match_all = f"MATCH({', '.join(columns)}) AGAINST (%s IN BOOLEAN MODE)"
+        match_first = f"MATCH({columns[0]}) AGAINST (%s IN BOOLEAN MODE)"
+        # InnoDB's relevance is BM25-style; the primary column (title / name) counts extra
+        title_boost = spec['columns'][columns[0]] / max(spec['columns'].values()) * 2
+        return (
+            f"SELECT doc_id FROM {table} WHERE {match_all}",
+            f"SELECT {match_all} + {title_boost} * {match_first} FROM {table} WHERE doc_id = {{doc_id}}",
+        )
+
+
+VENDOR_BACKENDS = {
+    'sqlite': SQLiteFTS5Backend,
+    'mysql': MySQLFullTextBackend,
+}
+
+_backend = None
+
+
+def backend_for(connection):
+    """Index backend for a connection's vendor (used by migrations and the rebuild command)."""
+    return VENDOR_BACKENDS.get(connection.vendor, BasicSearchBackend)()
+
+
+def get_search_backend():
+    """Backend for the default database, or the icontains one if its index tables are missing."""
+    global _backend
+    if _backend is None:
+        choice = getattr(settings, 'SEARCH_BACKEND', 'auto')
+        backend = BasicSearchBackend() if choice == 'basic' else backend_for(connection)
+        if isinstance(backend, SQLSearchBackend):
+            tables = set(connection.introspection.table_names())
+            if not all(spec['table'] in tables for spec in DOCUMENTS.values()):
+                logger.warning("Search index tables missing; using icontains search")
+                backend = BasicSearchBackend()
+        _backend = backend
+    return _backend
+
+
+# -- icontains matching (BasicSearchBackend) --
+
+def _single_keyword_course_q(keyword):
+    """One keyword: course text + instructor name/headline + category (Udemy-style breadth)."""
+    if not keyword:
+        return Q(pk=0)  # no match
+    return (
+        Q(title__icontains=keyword) |
+        Q(description__icontains=keyword) |
+        Q(learning_objectives__icontains=keyword) |
+        Q(requirements__icontains=keyword) |
+        Q(target_audience__icontains=keyword) |
+        Q(instructor__first_name__icontains=keyword) |
+        Q(instructor__last_name__icontains=keyword) |
+        Q(instructor__username__icontains=keyword) |
+        Q(instructor__headline__icontains=keyword) |
+        Q(category__name__icontains=keyword) |
+        Q(category__description__icontains=keyword)
+    )
+
+
+def _udemy_search_rank_case(search_text):
+    """Relevance: 0 best — order_by this field ascending. Title first, then instructor name."""
+    q = (search_text or '').strip()
+    if not q:
+        return Value(99)
+    tokens = [t for t in q.split() if t]
+    whens = [
+        When(title__istartswith=q, then=Value(0)),
+        When(title__icontains=q, then=Value(1)),
+    ]
+    if len(tokens) >= 2:
+        whens.append(
+            When(
+                Q(instructor__first_name__icontains=tokens[0])
+                & Q(instructor__last_name__icontains=tokens[-1]),
+                then=Value(2),
+            )
+        )
+        inst_rank = 3
+    else:
+        inst_rank = 2
+    whens.append(
+        When(
+            Q(instructor__first_name__icontains=q)
+            | Q(instructor__last_name__icontains=q)
+            | Q(instructor__username__icontains=q)
+            | Q(instructor__headline__icontains=q),
+            then=Value(inst_rank),
+        )
+    )
+    cat_rank = inst_rank + 1
+    whens.append(When(category__name__icontains=q, then=Value(cat_rank)))
+    return Case(*whens, default=Value(cat_rank + 1), output_field=IntegerField())
+
+
+def _course_search_q(text):
+    """OR across words: e.g. 'music theory' matches category Music OR title with Theory."""
+    if not text:
+        return Q()
+    tokens = [t.strip() for t in text.split() if t.strip()]
+    if not tokens:
+        return Q()
+    if len(tokens) == 1:
+        return _single_keyword_course_q(tokens[0])
+    q = Q()
+    any_token = False
+    for token in tokens:
+        q |= _single_keyword_course_q(token)
+        any_token = True
+    if not any_token:
+        return _single_keyword_course_q(text.strip())
+    return q
+
+
+def _instructor_search_q(query):
+    """Instructor name / expertise / headline / bio; "first last" and "last first" full names."""
+    query_tokens = [t for t in query.split() if t]
+    instructor_match_q = (
+        Q(first_name__icontains=query) |
+        Q(last_name__icontains=query) |
+        Q(expertise__icontains=query) |
+        Q(username__icontains=query) |
+        Q(headline__icontains=query) |
+        Q(bio__icontains=query)
+    )
+    if len(query_tokens) >= 2:
+        first_tok = query_tokens[0]
+        last_tok = query_tokens[-1]
+        instructor_match_q |= (
+            Q(first_name__icontains=first_tok) & Q(last_name__icontains=last_tok)
+        ) | (
+            Q(first_name__icontains=last_tok) & Q(last_name__icontains=first_tok)
+        )
+    return instructor_match_q
+
+
+def _category_tokens_q(text):
+    """Categories whose name or description matches any word in text."""
+    if not text:
+        return Q(pk=0)
+    tokens = [t.strip() for t in text.split() if t.strip()]
+    if not tokens:
+        return Q(name__icontains=text) | Q(description__icontains=text)
+    q = Q()
+    for token in tokens:
+        q |= Q(name__icontains=token) | Q(description__icontains=token)
+    return q
@@ -1,5 +1,7 @@
+import os
 from rest_framework import serializers
-from .models import Course, Section, Lecture, Resource, Enrollment, Progress, Review
+from .models import Course, Section, Lecture, LectureUploadSession, Resource, Enrollment, Progress, Review
+from .curriculum import get_curriculum, lecture_video_urls, localize_video_urls, render_curriculum
 from categories.serializers import SimpleCategorySerializer
 from django.conf import settings
 
@@ -62,77 +64,62 @@ class LectureSerializer(serializers.ModelSerializer):
         base_url = request.build_absolute_uri('/').rstrip('/')
 
         # Access check for non-preview videos
-        if not obj.is_preview:
-            user = request.user
-            has_access = False
-            
-            if user and user.is_authenticated:
-                course_id = obj.section.course_id
-                
-                # Cache enrollment status in context to avoid N+1 queries
-                cache_key = f'has_access_{course_id}'
-                if cache_key not in self.context:
-                    from .models import Course, Enrollment
-                    is_instructor = Course.objects.filter(id=course_id, instructor=user).exists()
-                    is_enrolled = Enrollment.objects.filter(user=user, course_id=course_id).exists()
-                    self.context[cache_key] = is_instructor or is_enrolled
-                
-                has_access = self.context[cache_key]
-                
-            if not has_access:
-                return {
-                    'status': 'locked',
-                    'stream_type': None,
-                    'primary_url': None,
-                    'message': 'Please enroll in the course to access this lecture.'
-                }
-
-        if obj.processing_status != 'completed':
-            return {
-                'status': obj.processing_status,
-                'stream_type': None,
-                'primary_url': None
-            }
-
-        video_data = {
-            'status': 'ready',
-            'stream_type': 'mp4',
-            'hls_url': None,
-            'primary_url': None,
-            'qualities': {},
-            'available_qualities': []
-        }
-
-        if obj.hls_playlist:
-            video_data['hls_url'] = f"{base_url}{obj.hls_playlist.url}"
-            video_data['primary_url'] = video_data['hls_url']
-            video_data['stream_type'] = 'hls'
-            video_data['available_qualities'] = ['1080p', '720p', '480p', '360p']
-
-        quality_map = {
-            '1080p': obj.video_1080p,
-            '720p': obj.video_720p,
-            '480p': obj.video_480p,
-            '360p': obj.video_360p,
-        }
-
-        for quality, field in quality_map.items():
-            if field:
-                url = f"{base_url}{field.url}"
-                video_data['qualities'][quality] = url
-                if quality not in video_data['available_qualities']:
-                    video_data['available_qualities'].append(quality)
-                if not video_data['primary_url']:
-                    video_data['primary_url'] = url
-
-        if not video_data['primary_url'] and obj.video_file:
-            orig_url = f"{base_url}{obj.video_file.url}"
-            video_data['primary_url'] = orig_url
-            video_data['qualities']['original'] = orig_url
-            if 'original' not in video_data['available_qualities']:
-                video_data['available_qualities'].append('original')
-
-        return video_data
+        has_access = obj.is_preview
+        user = request.user
+        if not has_access and user and user.is_authenticated:
+            course_id = obj.section.course_id
+
+            # Cache enrollment status in context to avoid N+1 queries
+            cache_key = f'has_access_{course_id}'
+            if cache_key not in self.context:
+                is_instructor = Course.objects.filter(id=course_id, instructor=user).exists()
+                is_enrolled = Enrollment.objects.filter(user=user, course_id=course_id).exists()
+                self.context[cache_key] = is_instructor or is_enrolled
+
+            has_access = self.context[cache_key]
+
+        return localize_video_urls(lecture_video_urls(obj), obj.id, base_url, has_access)
+
+
+class CurriculumLectureSerializer(LectureSerializer):
+    """Lecture as stored in the curriculum snapshot: unlocked, site-relative URLs."""
+
+    def get_video_urls(self, obj):
+        return lecture_video_urls(obj)
+
+
+class LectureUploadSessionSerializer(serializers.ModelSerializer):
+    chunk_size = serializers.SerializerMethodField()
+
+    class Meta:
+        model = LectureUploadSession
+        fields = [
+            'id', 'lecture', 'filename', 'total_size', 'received_bytes',
+            'checksum', 'status', 'chunk_size', 'created_at', 'updated_at'
+        ]
+        read_only_fields = ['lecture', 'received_bytes', 'status']
+
+    def get_chunk_size(self, obj):
+        return getattr(settings, 'VIDEO_UPLOAD_CHUNK_BYTES', 8 * 1024 * 1024)
+
+    def validate_filename(self, value):
+        from .video_utils import UniversalVideoProcessor
+        ext = os.path.splitext(value)[1].lower()
+        if ext not in UniversalVideoProcessor.SUPPORTED_INPUT_FORMATS:
+            raise serializers.ValidationError(f"Unsupported video format: {ext or 'none'}")
+        return os.path.basename(value)
+
+    def validate_total_size(self, value):
+        max_size = getattr(settings, 'VIDEO_UPLOAD_MAX_BYTES', 10 * 1024 * 1024 * 1024)
+        if value <= 0 or value > max_size:
+            raise serializers.ValidationError(f"total_size must be between 1 and {max_size} bytes.")
+        return value
+
+    def validate_checksum(self, value):
+        value = value.lower()
+        if len(value) != 64 or any(c not in '0123456789abcdef' for c in value):
+            raise serializers.ValidationError("checksum must be a hex SHA-256 digest.")
+        return value
 
 
 class SectionSerializer(serializers.ModelSerializer):
@@ -158,6 +145,11 @@ class SectionSerializer(serializers.ModelSerializer):
         return f"{minutes}m"
 
 
+class CurriculumSectionSerializer(SectionSerializer):
+    """Section as stored in CourseCurriculum.sections (see courses/curriculum.py)."""
+    lectures = CurriculumLectureSerializer(many=True, read_only=True)
+
+
 class ReviewListSerializer(serializers.ModelSerializer):
     """Lightweight review serializer for list views."""
     user_name = serializers.SerializerMethodField()
@@ -243,7 +235,7 @@ class CourseDetailSerializer(serializers.ModelSerializer):
     instructor = InstructorMiniSerializer(read_only=True)
     category = SimpleCategorySerializer(read_only=True)
     category_id = serializers.IntegerField(write_only=True)
-    sections = SectionSerializer(many=True, read_only=True)
+    sections = serializers.SerializerMethodField()
     reviews = ReviewListSerializer(many=True, read_only=True)
     average_rating = serializers.SerializerMethodField()
     total_students = serializers.SerializerMethodField()
@@ -263,6 +255,15 @@ class CourseDetailSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['instructor', 'slug', 'created_at', 'updated_at']
 
+    def get_sections(self, obj):
+        """Stored curriculum plus this caller's access locks; no walk over sections/lectures."""
+        request = self.context.get('request')
+        user = getattr(request, 'user', None)
+        has_access = bool(user and user.is_authenticated) and (
+            obj.instructor_id == user.pk or Enrollment.objects.filter(user=user, course=obj).exists()
+        )
+        return render_curriculum(get_curriculum(obj), request, has_access)
+
     def get_average_rating(self, obj):
         avg = getattr(obj, 'avg_rating', None)
         if avg is not None:
@@ -276,7 +277,8 @@ class CourseDetailSerializer(serializers.ModelSerializer):
         return getattr(obj, 'annotated_students_count', obj.enrollments.count())
 
     def get_total_lectures(self, obj):
-        return obj.total_lectures_count
+        count = getattr(obj, 'annotated_lectures_count', None)
+        return count if count is not None else obj.total_lectures_count
 
     def get_total_duration_display(self, obj):
         total_hours = float(obj.duration or 0)
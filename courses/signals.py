@@ -0,0 +1,429 @@
+"""
+Keep CourseStats and PlatformStats in step with Course, Enrollment, Review
+and Lecture writes, keep the Enrollment progress counters and completion
+bitmaps in step with Progress and Lecture writes (and drop the learner's
+cached continue-learning data), bump the
+course version stamp (detail ETag) on any change to a course tree, mark the
+stored curriculum stale on Section/Lecture/Resource writes, re-score courses
+on the leaderboards, and keep the search and suggest indexes in step with
+Course, instructor and Category writes.
+The previous rating / duration / course is captured in pre_save so updates
+apply the difference instead of recounting.
+"""
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from categories.models import Category
+from users.models import CustomUser
+from .curriculum import invalidate_curriculum
+from .leaderboards import schedule_course_rankings
+from .models import (
+    Course, CourseCurriculum, CourseStats, Enrollment, Lecture, Progress, Resource, Review, Section
+)
+from .progress import adjust_total_lectures, invalidate_resume, mark_lecture_completion
+from .search import INSTRUCTOR_INDEXED_FIELDS, get_search_backend
+from .stats import adjust_course_stats, adjust_platform_stats, allocate_lecture_slot, touch_courses
+from .suggest import suggest_index
+
+
+def _lecture_course_id(lecture):
+    return Section.objects.filter(pk=lecture.section_id).values_list('course_id', flat=True).first()
+
+
+@receiver(post_save, sender=Course)
+def create_course_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        CourseStats.objects.get_or_create(course=instance)
+
+
+# Courses mid-delete: their cascaded reviews are accounted for once, in course_deleted
+_deleting_courses = set()
+
+
+@receiver(pre_save, sender=Course)
+def course_remember_published(sender, instance, raw=False, **kwargs):
+    instance._platform_was_published = instance._previous_category_id = None
+    if instance.pk and not raw:
+        instance._platform_was_published, instance._previous_category_id = Course.objects.filter(
+            pk=instance.pk
+        ).values_list('is_published', 'category_id').first() or (None, None)
+
+
+@receiver(post_save, sender=Course)
+def course_published_changed(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    was_published = False if created else getattr(instance, '_platform_was_published', None)
+    if was_published is None or was_published == instance.is_published:
+        return
+    sign = 1 if instance.is_published else -1
+    has_reviews = CourseStats.objects.filter(course_id=instance.pk, review_count__gt=0).exists()
+    adjust_platform_stats(course_count=sign, reviewed_course_count=sign if has_reviews else 0)
+
+
+@receiver(pre_delete, sender=Course)
+def course_deleting(sender, instance, **kwargs):
+    _deleting_courses.add(instance.pk)
+    instance._platform_reviewed = instance.is_published and CourseStats.objects.filter(
+        course_id=instance.pk, review_count__gt=0
+    ).exists()
+
+
+@receiver(post_delete, sender=Course)
+def course_deleted(sender, instance, **kwargs):
+    _deleting_courses.discard(instance.pk)
+    if instance.is_published:
+        adjust_platform_stats(
+            course_count=-1, reviewed_course_count=-1 if getattr(instance, '_platform_reviewed', False) else 0
+        )
+
+
+@receiver(post_save, sender=Enrollment)
+def enrollment_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        adjust_course_stats(instance.course_id, student_count=1)
+        adjust_platform_stats(student_count=1)
+
+
+@receiver(post_delete, sender=Enrollment)
+def enrollment_deleted(sender, instance, **kwargs):
+    adjust_course_stats(instance.course_id, student_count=-1)
+    adjust_platform_stats(student_count=-1)
+
+
+@receiver(pre_save, sender=Review)
+def review_remember_previous(sender, instance, raw=False, **kwargs):
+    instance._stats_previous = None
+    if instance.pk and not raw:
+        instance._stats_previous = Review.objects.filter(pk=instance.pk).values('course_id', 'rating').first()
+
+
+def _review_deltas(rating, sign):
+    return {'review_count': sign, 'rating_sum': sign * rating, f'rating_{rating}': sign}
+
+
+def _count_reviewed_course(course_id, added):
+    """Platform reviewed_course_count: a published course got its first review / lost its last one."""
+    if course_id in _deleting_courses:
+        return
+    review_count = CourseStats.objects.filter(
+        course_id=course_id, course__is_published=True
+    ).values_list('review_count', flat=True).first()
+    if review_count == (1 if added else 0):
+        adjust_platform_stats(reviewed_course_count=1 if added else -1)
+
+
+@receiver(post_save, sender=Review)
+def review_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_stats_previous', None)
+    if created or previous is None:
+        adjust_course_stats(instance.course_id, **_review_deltas(instance.rating, 1))
+        adjust_platform_stats(**_review_deltas(instance.rating, 1))
+        _count_reviewed_course(instance.course_id, added=True)
+    elif (previous['course_id'], previous['rating']) != (instance.course_id, instance.rating):
+        adjust_course_stats(previous['course_id'], **_review_deltas(previous['rating'], -1))
+        adjust_course_stats(instance.course_id, **_review_deltas(instance.rating, 1))
+        if previous['rating'] != instance.rating:
+            adjust_platform_stats(**{
+                'rating_sum': instance.rating - previous['rating'],
+                f"rating_{previous['rating']}": -1,
+                f'rating_{instance.rating}': 1,
+            })
+        if previous['course_id'] != instance.course_id:
+            _count_reviewed_course(previous['course_id'], added=False)
+            _count_reviewed_course(instance.course_id, added=True)
+
+
+@receiver(post_delete, sender=Review)
+def review_deleted(sender, instance, **kwargs):
+    adjust_course_stats(instance.course_id, **_review_deltas(instance.rating, -1))
+    adjust_platform_stats(**_review_deltas(instance.rating, -1))
+    _count_reviewed_course(instance.course_id, added=False)
+
+
+@receiver(pre_save, sender=Lecture)
+def lecture_remember_previous(sender, instance, raw=False, update_fields=None, **kwargs):
+    instance._stats_previous = None
+    # Pipeline checkpoint saves (update_fields without duration/section) cannot change the counters
+    if not instance.pk or raw or (update_fields is not None and not {'duration', 'section'} & set(update_fields)):
+        return
+    instance._stats_previous = Lecture.objects.filter(pk=instance.pk).values(
+        'duration', 'section_id', 'section__course_id'
+    ).first()
+
+
+@receiver(post_save, sender=Lecture)
+def lecture_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_stats_previous', None)
+    if created:
+        course_id = _lecture_course_id(instance)
+        adjust_course_stats(course_id, lecture_count=1, total_duration=instance.duration)
+        adjust_total_lectures(course_id, 1)
+        _assign_bit_index(instance, course_id)
+    elif previous is not None:
+        course_id = (
+            previous['section__course_id'] if previous['section_id'] == instance.section_id
+            else _lecture_course_id(instance)
+        )
+        if course_id == previous['section__course_id']:
+            adjust_course_stats(course_id, total_duration=instance.duration - previous['duration'])
+        else:
+            adjust_course_stats(previous['section__course_id'], lecture_count=-1, total_duration=-previous['duration'])
+            adjust_course_stats(course_id, lecture_count=1, total_duration=instance.duration)
+            adjust_total_lectures(previous['section__course_id'], -1)
+            adjust_total_lectures(course_id, 1)
+            _assign_bit_index(instance, course_id)
+
+
+def _assign_bit_index(lecture, course_id):
+    # Fresh completion-bitmap slot in the lecture's (new) course
+    lecture.bit_index = allocate_lecture_slot(course_id)
+    Lecture.objects.filter(pk=lecture.pk).update(bit_index=lecture.bit_index)
+
+
+@receiver(post_delete, sender=Lecture)
+def lecture_deleted(sender, instance, **kwargs):
+    course_id = _lecture_course_id(instance)
+    adjust_course_stats(course_id, lecture_count=-1, total_duration=-instance.duration)
+    adjust_total_lectures(course_id, -1)
+
+
+# --- Enrollment progress counters ---
+
+@receiver(pre_save, sender=Enrollment)
+def enrollment_count_lectures(sender, instance, raw=False, **kwargs):
+    if instance.pk is None and not raw:
+        instance.total_lectures = Lecture.objects.filter(section__course_id=instance.course_id).count()
+
+
+@receiver(pre_save, sender=Progress)
+def progress_remember_completed(sender, instance, raw=False, update_fields=None, **kwargs):
+    instance._was_completed = None
+    # Buffered heartbeats and position-only saves never change completion
+    if not instance.pk or raw or (update_fields is not None and 'completed' not in update_fields):
+        return
+    instance._was_completed = Progress.objects.filter(pk=instance.pk).values_list('completed', flat=True).first()
+
+
+@receiver(post_save, sender=Progress)
+def progress_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    was_completed = False if created else getattr(instance, '_was_completed', None)
+    if was_completed is None:
+        return
+    # Compare what the row holds, not the assigned value (a form string like "False" is truthy)
+    completed = Progress._meta.get_field('completed').to_python(instance.completed)
+    if was_completed != completed:
+        mark_lecture_completion(instance.enrollment_id, instance.lecture_id, completed)
+
+
+@receiver(post_delete, sender=Progress)
+def progress_deleted(sender, instance, **kwargs):
+    if instance.completed:
+        mark_lecture_completion(instance.enrollment_id, instance.lecture_id, False)
+
+
+# --- Continue-learning cache ---
+
+@receiver([post_save, post_delete], sender=Enrollment)
+def invalidate_enrollment_resume(sender, instance, raw=False, **kwargs):
+    if not raw:
+        invalidate_resume([instance.user_id])
+
+
+@receiver([post_save, post_delete], sender=Progress)
+def invalidate_progress_resume(sender, instance, raw=False, **kwargs):
+    if not raw:
+        invalidate_resume(Enrollment.objects.filter(pk=instance.enrollment_id).values_list('user_id', flat=True))
+
+
+# --- Search index ---
+
+@receiver(post_save, sender=Course)
+def index_course(sender, instance, raw=False, **kwargs):
+    if not raw:
+        get_search_backend().index('course', [instance.pk])
+        suggest_index.update('course', [instance.pk])
+
+
+@receiver(post_delete, sender=Course)
+def unindex_course(sender, instance, **kwargs):
+    get_search_backend().remove('course', [instance.pk])
+    suggest_index.remove('course', [instance.pk])
+
+
+@receiver(pre_save, sender=CustomUser)
+def user_remember_indexed(sender, instance, raw=False, update_fields=None, **kwargs):
+    instance._search_previous = None
+    # Logins and token refreshes save with update_fields that never touch indexed text
+    if not instance.pk or raw or (update_fields is not None and not INSTRUCTOR_INDEXED_FIELDS & set(update_fields)):
+        instance._search_unchanged = True
+        return
+    instance._search_unchanged = False
+    instance._search_previous = CustomUser.objects.filter(pk=instance.pk).values(*INSTRUCTOR_INDEXED_FIELDS).first()
+
+
+@receiver(post_save, sender=CustomUser)
+def index_instructor(sender, instance, created, raw=False, **kwargs):
+    if raw or getattr(instance, '_search_unchanged', False):
+        return
+    previous = getattr(instance, '_search_previous', None)
+    current = {field: getattr(instance, field) for field in INSTRUCTOR_INDEXED_FIELDS}
+    if not created and previous == current:
+        return
+    backend = get_search_backend()
+    # Not an instructor (any more): indexing writes nothing, which removes the entry
+    backend.index('instructor', [instance.pk])
+    suggest_index.update('instructor', [instance.pk])
+    if not created:
+        # Course documents carry the instructor's name and headline
+        backend.index('course', list(Course.objects.filter(instructor=instance).values_list('pk', flat=True)))
+
+
+@receiver(post_delete, sender=CustomUser)
+def unindex_instructor(sender, instance, **kwargs):
+    get_search_backend().remove('instructor', [instance.pk])
+    suggest_index.remove('instructor', [instance.pk])
+
+
+@receiver(post_save, sender=Category)
+def index_category(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    backend = get_search_backend()
+    backend.index('category', [instance.pk])
+    suggest_index.update('category', [instance.pk])
+    if not created:
+        backend.index('course', list(Course.objects.filter(category=instance).values_list('pk', flat=True)))
+
+
+@receiver(post_delete, sender=Category)
+def unindex_category(sender, instance, **kwargs):
+    get_search_backend().remove('category', [instance.pk])
+    suggest_index.remove('category', [instance.pk])
+
+
+# --- Course version stamp (ETag / Last-Modified of the course detail) ---
+
+# Lecture fields that never appear in the course detail payload
+LECTURE_INTERNAL_FIELDS = {
+    'processing_checkpoints', 'content_hash', 'video_metadata', 'processing_lease', 'processing_lease_until'
+}
+# User fields shown in course detail (instructor card, review author)
+USER_DISPLAY_FIELDS = {'first_name', 'last_name', 'username', 'profile_image', 'headline', 'bio', 'expertise'}
+
+
+# Every course detail shows its category's course count (category.total_courses),
+# so adding, removing or moving a course touches the rest of the category too
+@receiver(post_save, sender=Course)
+def touch_course(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous_category_id = getattr(instance, '_previous_category_id', None)
+    if created:
+        touch_courses(category=instance.category_id)
+    elif previous_category_id is not None and previous_category_id != instance.category_id:
+        touch_courses(category__in=[previous_category_id, instance.category_id])
+    else:
+        touch_courses([instance.pk])
+
+
+@receiver(post_delete, sender=Course)
+def touch_deleted_course_category(sender, instance, **kwargs):
+    touch_courses(category=instance.category_id)
+
+
+@receiver([post_save, post_delete], sender=Section)
+def touch_section_course(sender, instance, raw=False, **kwargs):
+    if not raw:
+        touch_courses([instance.course_id])
+
+
+@receiver(post_save, sender=Lecture)
+def touch_lecture_course(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and set(update_fields) <= LECTURE_INTERNAL_FIELDS):
+        return
+    touch_courses([_lecture_course_id(instance)])
+
+
+@receiver([post_save, post_delete], sender=Resource)
+def touch_resource_course(sender, instance, raw=False, **kwargs):
+    if not raw:
+        touch_courses(sections__lectures=instance.lecture_id)
+
+
+@receiver(post_save, sender=Review)
+def touch_review_course(sender, instance, raw=False, **kwargs):
+    # Comment-only edits do not go through adjust_course_stats
+    if not raw:
+        touch_courses([instance.course_id])
+
+
+@receiver(post_save, sender=Category)
+def touch_category_courses(sender, instance, created, raw=False, **kwargs):
+    if not raw and not created:
+        touch_courses(category=instance.pk)
+
+
+@receiver(post_save, sender=CustomUser)
+def touch_user_courses(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if raw or created or (update_fields is not None and not USER_DISPLAY_FIELDS & set(update_fields)):
+        return
+    touch_courses(instructor=instance.pk)
+    touch_courses(reviews__student=instance.pk)
+
+
+# --- Curriculum snapshot (rebuilt on the next course detail read) ---
+
+@receiver(post_save, sender=Course)
+def create_course_curriculum(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        CourseCurriculum.objects.get_or_create(course=instance)
+
+
+@receiver([post_save, post_delete], sender=Section)
+def invalidate_section_curriculum(sender, instance, raw=False, **kwargs):
+    if not raw:
+        invalidate_curriculum([instance.course_id])
+
+
+@receiver([post_save, post_delete], sender=Lecture)
+def invalidate_lecture_curriculum(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and set(update_fields) <= LECTURE_INTERNAL_FIELDS):
+        return
+    invalidate_curriculum(pk=instance.section_id)
+    previous = getattr(instance, '_stats_previous', None)
+    if previous and previous['section_id'] != instance.section_id:
+        invalidate_curriculum([previous['section__course_id']])
+
+
+@receiver([post_save, post_delete], sender=Resource)
+def invalidate_resource_curriculum(sender, instance, raw=False, **kwargs):
+    if not raw:
+        invalidate_curriculum(lectures=instance.lecture_id)
+
+
+# --- Leaderboards (re-scored after commit) ---
+
+@receiver([post_save, post_delete], sender=Review)
+@receiver([post_save, post_delete], sender=Enrollment)
+def rerank_course(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    course_ids = [instance.course_id]
+    previous = getattr(instance, '_stats_previous', None)
+    if previous:
+        course_ids.append(previous['course_id'])
+    schedule_course_rankings(course_ids)
+
+
+@receiver(post_save, sender=Course)
+def rerank_saved_course(sender, instance, raw=False, **kwargs):
+    # Publishing, unpublishing and category moves
+    if not raw:
+        schedule_course_rankings([instance.pk])
@@ -0,0 +1,159 @@
+"""
+Denormalized per-course counters (CourseStats) and site-wide counters
+(PlatformStats, a single row).
+
+Writes go through adjust_course_stats / adjust_platform_stats, which apply
+deltas with F() expressions so concurrent enrollments/reviews never lose an
+update. rebuild_course_stats / rebuild_platform_stats recompute everything
+from the source tables.
+"""
+from django.db import transaction
+from django.db.models import Count, F, FloatField, IntegerField, Max, Q, Sum, Value
+from django.db.models.functions import Cast, Coalesce, NullIf
+from django.utils import timezone
+
+from .models import Course, CourseStats, Enrollment, Lecture, PlatformStats, Review
+
+
+def adjust_course_stats(course_id, **deltas):
+    """Add deltas (e.g. student_count=1, rating_sum=-4) to a course's counters."""
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if not course_id or not deltas:
+        return
+    updates = {field: F(field) + delta for field, delta in deltas.items()}
+    # Counters are part of the course detail payload
+    updates.update(version=F('version') + 1, last_modified=timezone.now())
+    with transaction.atomic():
+        if CourseStats.objects.filter(course_id=course_id).update(**updates):
+            return
+        # No row yet (course created before the stats table, or mid-cascade delete)
+        if any(delta < 0 for delta in deltas.values()) or not Course.objects.filter(pk=course_id).exists():
+            return
+        stats, created = CourseStats.objects.get_or_create(course_id=course_id, defaults=deltas)
+        if not created:
+            CourseStats.objects.filter(course_id=course_id).update(**updates)
+
+
+def touch_courses(course_ids=None, **filters):
+    """Bump the version stamp of courses (by id, or by Course filters) whose detail payload changed."""
+    courses = CourseStats.objects.all()
+    if course_ids is not None:
+        course_ids = [course_id for course_id in course_ids if course_id]
+        if not course_ids:
+            return
+        courses = courses.filter(course_id__in=course_ids)
+    if filters:
+        courses = courses.filter(course__in=Course.objects.filter(**filters))
+    courses.update(version=F('version') + 1, last_modified=timezone.now())
+
+
+def allocate_lecture_slot(course_id):
+    """Next free Lecture.bit_index in the course (see courses/progress.py); slots are never reused."""
+    if not course_id:
+        return None
+    with transaction.atomic():
+        if not CourseStats.objects.filter(course_id=course_id).update(lecture_slots=F('lecture_slots') + 1):
+            if not Course.objects.filter(pk=course_id).exists():
+                return None
+            used = Lecture.objects.filter(section__course_id=course_id).aggregate(n=Max('bit_index'))['n']
+            stats, created = CourseStats.objects.get_or_create(
+                course_id=course_id, defaults={'lecture_slots': (-1 if used is None else used) + 2}
+            )
+            if not created:
+                CourseStats.objects.filter(course_id=course_id).update(lecture_slots=F('lecture_slots') + 1)
+        # Read back inside the transaction: the update holds the row lock
+        return CourseStats.objects.filter(course_id=course_id).values_list('lecture_slots', flat=True).get() - 1
+
+
+def rebuild_course_stats(course_ids=None):
+    """Recompute counters from Enrollment/Review/Lecture rows. Returns the number of courses rebuilt."""
+    courses = Course.objects.all()
+    if course_ids is not None:
+        courses = courses.filter(pk__in=course_ids)
+    ids = list(courses.values_list('pk', flat=True))
+
+    students = dict(
+        Enrollment.objects.filter(course_id__in=ids).values('course_id')
+        .annotate(n=Count('id')).values_list('course_id', 'n')
+    )
+    reviews = {
+        row['course_id']: row for row in
+        Review.objects.filter(course_id__in=ids).values('course_id').annotate(
+            review_count=Count('id'),
+            rating_sum=Sum('rating'),
+            **{f'rating_{i}': Count('id', filter=Q(rating=i)) for i in range(1, 6)}
+        )
+    }
+    lectures = {
+        row['section__course_id']: row for row in
+        Lecture.objects.filter(section__course_id__in=ids).values('section__course_id').annotate(
+            lecture_count=Count('id'), total_duration=Sum('duration'), max_bit_index=Max('bit_index')
+        )
+    }
+
+    # Versions keep increasing across rebuilds so no old ETag can match again
+    versions = dict(CourseStats.objects.filter(course_id__in=ids).values_list('course_id', 'version'))
+    # Bit indexes already handed out stay taken
+    slots = dict(CourseStats.objects.filter(course_id__in=ids).values_list('course_id', 'lecture_slots'))
+    now = timezone.now()
+    rows = []
+    for course_id in ids:
+        review_row = reviews.get(course_id, {})
+        lecture_row = lectures.get(course_id, {})
+        rows.append(CourseStats(
+            course_id=course_id,
+            student_count=students.get(course_id, 0),
+            review_count=review_row.get('review_count', 0),
+            rating_sum=review_row.get('rating_sum') or 0,
+            lecture_count=lecture_row.get('lecture_count', 0),
+            total_duration=lecture_row.get('total_duration') or 0,
+            version=versions.get(course_id, 0) + 1,
+            lecture_slots=max(
+                slots.get(course_id, 0),
+                (lecture_row['max_bit_index'] + 1) if lecture_row.get('max_bit_index') is not None else 0
+            ),
+            last_modified=now,
+            **{f'rating_{i}': review_row.get(f'rating_{i}', 0) for i in range(1, 6)}
+        ))
+
+    with transaction.atomic():
+        CourseStats.objects.filter(course_id__in=ids).delete()
+        CourseStats.objects.bulk_create(rows, batch_size=500)
+    return len(rows)
+
+
+def adjust_platform_stats(**deltas):
+    """Add deltas (e.g. student_count=1, rating_5=-1) to the platform counters."""
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    if not PlatformStats.objects.filter(pk=1).update(**{field: F(field) + delta for field, delta in deltas.items()}):
+        # No row yet: counting from scratch already includes this write
+        rebuild_platform_stats()
+
+
+def rebuild_platform_stats():
+    """Recompute the platform counters from Course/Enrollment/Review rows."""
+    reviews = Review.objects.aggregate(
+        review_count=Count('id'),
+        rating_sum=Coalesce(Sum('rating'), 0),
+        **{f'rating_{i}': Count('id', filter=Q(rating=i)) for i in range(1, 6)}
+    )
+    published = Course.objects.filter(is_published=True)
+    stats, _ = PlatformStats.objects.update_or_create(pk=1, defaults=dict(
+        course_count=published.count(),
+        reviewed_course_count=published.filter(reviews__isnull=False).distinct().count(),
+        student_count=Enrollment.objects.count(),
+        **reviews
+    ))
+    return stats
+
+
+def average_rating_expression(prefix='stats__'):
+    """SQL average rating from the stats row; NULL when a course has no reviews (like Avg())."""
+    return Cast(F(f'{prefix}rating_sum'), FloatField()) / NullIf(F(f'{prefix}review_count'), 0)
+
+
+def stat_expression(field, prefix='stats__'):
+    """A stats counter for annotate(); 0 for courses without a stats row."""
+    return Coalesce(F(f'{prefix}{field}'), Value(0), output_field=IntegerField())
@@ -0,0 +1,180 @@
+"""
+In-memory prefix index for search-as-you-type suggestions.
+
+Published course titles, instructor names and category names are kept as
+one sorted list of (key, kind, id) entries, where the keys are the label
+from each word onward ("python bootcamp", "bootcamp"). A prefix lookup is a
+bisect plus a short forward scan; no database access.
+
+Each process holds its own copy. Writes update the local copy in place
+(courses/signals.py) and bump a version in the shared cache; other
+processes notice the new version and reload on their next lookup. The
+version counter starts at a random value, so if the cache evicts it the
+restarted counter cannot land on a version some process still holds.
+"""
+import bisect
+import logging
+import re
+import secrets
+import threading
+import time
+
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+logger = logging.getLogger(__name__)
+
+VERSION_CACHE_KEY = 'courses:suggest:version'
+# Longest titles only get keys for their first words
+MAX_KEYS_PER_LABEL = 8
+# Matches looked at per lookup before ranking by weight
+MAX_SCAN = 200
+
+
+def normalize(text):
+    return ' '.join(re.findall(r'\w+', (text or '').casefold()))
+
+
+def _label_keys(label):
+    words = normalize(label).split()
+    return [' '.join(words[i:]) for i in range(min(len(words), MAX_KEYS_PER_LABEL))]
+
+
+class SuggestIndex:
+    # Seconds between checks of the shared version (one cache read)
+    version_check_interval = 1.0
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._entries = []  # sorted (key, kind, id)
+        self._items = {}  # (kind, id) -> suggestion dict incl. weight
+        self._version = None
+        self._loaded = False
+        self._checked_at = 0.0
+
+    # -- loading --
+    def _fetch(self, kind, ids=None):
+        """Suggestion dicts for published courses / instructors / categories from the database."""
+        from categories.models import Category
+        from users.models import CustomUser
+        from .models import Course
+
+        if kind == 'course':
+            queryset = Course.objects.filter(is_published=True)
+            if ids is not None:
+                queryset = queryset.filter(pk__in=ids)
+            return [
+                {'type': 'course', 'id': row['pk'], 'text': row['title'], 'slug': row['slug'],
+                 'weight': row['stats__student_count'] or 0}
+                for row in queryset.values('pk', 'title', 'slug', 'stats__student_count')
+            ]
+        if kind == 'instructor':
+            queryset = CustomUser.objects.filter(role='instructor')
+            if ids is not None:
+                queryset = queryset.filter(pk__in=ids)
+            queryset = queryset.annotate(weight=Count('course', filter=Q(course__is_published=True)))
+            return [
+                {'type': 'instructor', 'id': user.pk, 'text': user.get_full_name(), 'weight': user.weight}
+                for user in queryset.only('first_name', 'last_name', 'username')
+            ]
+        queryset = Category.objects.all()
+        if ids is not None:
+            queryset = queryset.filter(pk__in=ids)
+        return [
+            {'type': 'category', 'id': row['pk'], 'text': row['name'], 'weight': row['weight']}
+            for row in queryset.annotate(
+                weight=Count('courses', filter=Q(courses__is_published=True))
+            ).values('pk', 'name', 'weight')
+        ]
+
+    def load(self):
+        """(Re)build the whole index from the database."""
+        version = cache.get(VERSION_CACHE_KEY)
+        items, entries = {}, []
+        for kind in ('course', 'instructor', 'category'):
+            for item in self._fetch(kind):
+                items[(kind, item['id'])] = item
+                entries.extend((key, kind, item['id']) for key in _label_keys(item['text']))
+        entries.sort()
+        with self._lock:
+            self._items, self._entries = items, entries
+            self._version, self._loaded = version, True
+            self._checked_at = time.monotonic()
+        logger.info("Suggest index loaded: %s entries", len(entries))
+
+    def _ensure_current(self):
+        now = time.monotonic()
+        if self._loaded and now - self._checked_at < self.version_check_interval:
+            return
+        self._checked_at = now
+        if not self._loaded or cache.get(VERSION_CACHE_KEY) != self._version:
+            self.load()
+
+    # -- incremental updates --
+    def _remove_locked(self, kind, pk):
+        item = self._items.pop((kind, pk), None)
+        if not item:
+            return
+        for key in _label_keys(item['text']):
+            i = bisect.bisect_left(self._entries, (key, kind, pk))
+            if i < len(self._entries) and self._entries[i] == (key, kind, pk):
+                del self._entries[i]
+
+    def update(self, kind, ids):
+        """Refresh (or drop) entries after a write, then tell other processes via the version."""
+        ids = list(ids)
+        if self._loaded and ids:
+            fresh = {item['id']: item for item in self._fetch(kind, ids)}
+            with self._lock:
+                for pk in ids:
+                    self._remove_locked(kind, pk)
+                    item = fresh.get(pk)
+                    if item:
+                        self._items[(kind, pk)] = item
+                        for key in _label_keys(item['text']):
+                            bisect.insort(self._entries, (key, kind, pk))
+        self._bump_version()
+
+    def remove(self, kind, ids):
+        with self._lock:
+            for pk in ids:
+                self._remove_locked(kind, pk)
+        self._bump_version()
+
+    def _bump_version(self):
+        cache.add(VERSION_CACHE_KEY, secrets.randbits(62), None)
+        try:
+            version = cache.incr(VERSION_CACHE_KEY)
+        except ValueError:
+            return
+        with self._lock:
+            # Our copy is current only if nobody else changed anything in between
+            if self._loaded and self._version is not None and version == self._version + 1:
+                self._version = version
+            else:
+                self._loaded = False
+
+    # -- lookup --
+    def suggest(self, text, limit=8):
+        prefix = normalize(text)
+        if not prefix:
+            return []
+        self._ensure_current()
+        with self._lock:
+            i = bisect.bisect_left(self._entries, (prefix,))
+            seen, matches = set(), []
+            while i < len(self._entries) and len(matches) < MAX_SCAN:
+                key, kind, pk = self._entries[i]
+                if not key.startswith(prefix):
+                    break
+                if (kind, pk) not in seen:
+                    seen.add((kind, pk))
+                    item = self._items[(kind, pk)]
+                    # Label starting with the query beats a match on a later word
+                    matches.append((not normalize(item['text']).startswith(prefix), -item['weight'], item))
+                i += 1
+        matches.sort(key=lambda match: match[:2])
+        return [{k: v for k, v in item.items() if k != 'weight'} for _, _, item in matches[:limit]]
+
+
+suggest_index = SuggestIndex()
@@ -1,47 +1,152 @@
 import logging
 
+from django.conf import settings
+from django.core.cache import cache
+
 logger = logging.getLogger(__name__)
 
+# Encode queue priorities (lower runs first)
+PRIORITY_HIGH = 0   # Preview lectures and re-encodes of existing lectures
+PRIORITY_SHORT = 3  # Small uploads, finished quickly
+PRIORITY_BULK = 6   # Everything else (bulk course imports)
+
+
+def _mp4_job_key(lecture_id, quality):
+    return f'lecture_mp4_job_{lecture_id}_{quality}'
+
+
+def lecture_processing_priority(lecture, reencode=False, size=None):
+    """Queue priority so previews, re-encodes and short lectures overtake bulk imports."""
+    if reencode or lecture.is_preview:
+        return PRIORITY_HIGH
+    if size is None:
+        try:
+            size = lecture.video_file.size if lecture.video_file else 0
+        except OSError:
+            size = 0
+    if size and size <= getattr(settings, 'VIDEO_SHORT_UPLOAD_BYTES', 200 * 1024 * 1024):
+        return PRIORITY_SHORT
+    return PRIORITY_BULK
+
+
 try:
     from celery import shared_task
 
-    @shared_task(bind=True, max_retries=2, default_retry_delay=60)
+    # acks_late: a task whose worker died is redelivered and resumes from the lecture's checkpoints.
+    # The time limit stays below the broker visibility timeout, so a running encode is never redelivered.
+    @shared_task(
+        bind=True, max_retries=2, default_retry_delay=60, acks_late=True, reject_on_worker_lost=True,
+        time_limit=getattr(settings, 'VIDEO_ENCODE_MAX_SECONDS', 6 * 3600)
+    )
     def process_lecture_video_task(self, lecture_id):
         """Celery task for processing lecture videos in the background."""
+        from .video_utils import LectureBusy, process_lecture_video_universal
         try:
-            from .video_utils import process_lecture_video_universal
             result = process_lecture_video_universal(lecture_id)
             if result:
                 logger.info("Video processing completed for lecture %s", lecture_id)
             else:
                 logger.error("Video processing failed for lecture %s", lecture_id)
+                # Retries are cheap now: finished renditions are skipped
+                raise RuntimeError(f"Video processing failed for lecture {lecture_id}")
             return result
+        except LectureBusy as exc:
+            # Duplicate delivery: don't encode, look again once the holder's lease could have lapsed
+            # (a finished lecture is then only checked against its checkpoints). Give up once the
+            # holder has had the longest possible encode.
+            lease_seconds = getattr(settings, 'VIDEO_ENCODE_LEASE_SECONDS', 300)
+            logger.info("Lecture %s is already being processed; checking again later", lecture_id)
+            raise self.retry(
+                exc=exc, countdown=lease_seconds,
+                max_retries=-(-getattr(settings, 'VIDEO_ENCODE_MAX_SECONDS', 6 * 3600) // lease_seconds) + 1
+            )
         except Exception as exc:
             logger.exception("Video processing error for lecture %s: %s", lecture_id, exc)
             raise self.retry(exc=exc)
 
-except ImportError:
-    import threading
+    def enqueue_lecture_processing(lecture_id, priority=PRIORITY_BULK):
+        return process_lecture_video_task.apply_async(args=[lecture_id], priority=priority)
+
+    @shared_task(bind=True, max_retries=2, default_retry_delay=60,
+                 time_limit=getattr(settings, 'VIDEO_ENCODE_MAX_SECONDS', 6 * 3600))
+    def prepare_mp4_download_task(self, lecture_id, quality):
+        """Celery task remuxing one HLS variant to a downloadable MP4."""
+        from .video_utils import prepare_mp4_download
+        try:
+            if not prepare_mp4_download(lecture_id, quality):
+                logger.warning("No %s rendition to remux for lecture %s", quality, lecture_id)
+        except Exception as exc:
+            logger.exception("MP4 remux error for lecture %s (%s): %s", lecture_id, quality, exc)
+            raise self.retry(exc=exc)
+        finally:
+            cache.delete(_mp4_job_key(lecture_id, quality))
+
+    def enqueue_mp4_download(lecture_id, quality):
+        # One queued remux per rendition, however often the download is requested meanwhile
+        if cache.add(_mp4_job_key(lecture_id, quality), 1, getattr(settings, 'VIDEO_ENCODE_MAX_SECONDS', 6 * 3600)):
+            prepare_mp4_download_task.apply_async(args=[lecture_id, quality], priority=PRIORITY_HIGH)
+
+    def start_local_video_workers():
+        """Celery workers own the queue; nothing runs in-process."""
 
-    class _FakeDelayable:
-        """Fallback that uses threading when Celery is not installed."""
-        def __init__(self, func):
-            self._func = func
+    @shared_task
+    def rebuild_leaderboards_task():
+        """Periodic full leaderboard recompute (CELERY_BEAT_SCHEDULE)."""
+        from .leaderboards import rebuild_leaderboards
+        return rebuild_leaderboards()
 
-        def delay(self, *args, **kwargs):
-            thread = threading.Thread(target=self._func, args=args, kwargs=kwargs, daemon=True)
-            thread.start()
-            return thread
+    @shared_task
+    def cleanup_upload_sessions_task():
+        """Periodic removal of abandoned chunked uploads (CELERY_BEAT_SCHEDULE)."""
+        from .uploads import cleanup_upload_sessions
+        return cleanup_upload_sessions()
 
-    def _process_lecture_video_sync(lecture_id):
+except ImportError:
+    from .video_queue import LocalVideoQueue
+
+    def _process_lecture_video_sync(lecture_id, kind='encode', quality=''):
+        if kind == 'mp4':
+            return _prepare_mp4_download_sync(lecture_id, quality)
+        from .video_utils import LectureBusy, process_lecture_video_universal
         try:
-            from .video_utils import process_lecture_video_universal
             result = process_lecture_video_universal(lecture_id)
             if result:
                 logger.info("Video processing completed for lecture %s", lecture_id)
             else:
                 logger.error("Video processing failed for lecture %s", lecture_id)
+            return result
+        except LectureBusy:
+            logger.info("Lecture %s is already being processed elsewhere; skipping", lecture_id)
+            return True
         except Exception:
             logger.exception("Video processing error for lecture %s", lecture_id)
+            return False
+
+    def _prepare_mp4_download_sync(lecture_id, quality):
+        from .video_utils import prepare_mp4_download
+        try:
+            if not prepare_mp4_download(lecture_id, quality):
+                logger.warning("No %s rendition to remux for lecture %s", quality, lecture_id)
+            return True
+        except Exception:
+            logger.exception("MP4 remux error for lecture %s (%s)", lecture_id, quality)
+            return False
+
+    # Persistent, bounded, prioritised queue instead of a thread per upload
+    process_lecture_video_task = LocalVideoQueue(_process_lecture_video_sync)
+
+    def enqueue_lecture_processing(lecture_id, priority=PRIORITY_BULK):
+        return process_lecture_video_task.delay(lecture_id, priority=priority)
+
+    def enqueue_mp4_download(lecture_id, quality):
+        return process_lecture_video_task.delay(lecture_id, priority=PRIORITY_HIGH, kind='mp4', quality=quality)
 
-    process_lecture_video_task = _FakeDelayable(_process_lecture_video_sync)
+    def start_local_video_workers():
+        """
+        Run the encode pool inside gunicorn workers (post_worker_init), only if
+        VIDEO_QUEUE_IN_WEB_WORKERS is set: web workers are recycled after
+        max_requests, which would orphan running ffmpeg processes. By default the
+        run_video_queue command is the only process that encodes.
+        """
+        if getattr(settings, 'VIDEO_QUEUE_IN_WEB_WORKERS', False):
+            process_lecture_video_task.start()
@@ -1,3 +1,956 @@
-from django.test import TestCase
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from categories.models import Category
+from users.models import CustomUser
+from .curriculum import build_curriculum
+from .leaderboards import rebuild_leaderboards
+from .models import (
+    Course, CourseCurriculum, CourseStats, Enrollment, Lecture, PlatformStats, Progress, Review, Section,
+    VideoProcessingJob,
+)
+from .progress import progress_buffer, progress_report
+from .search import SQLSearchBackend, get_search_backend
+from .stats import rebuild_course_stats, rebuild_platform_stats
+from .suggest import suggest_index
+from .uploads import cleanup_upload_sessions
+from .video_queue import LocalVideoQueue
+from .video_utils import (
+    EncodeProgressReporter, ProcessingLease, UniversalVideoProcessor, compute_content_hash, get_encode_progress,
+    install_verified_upload, link_duplicate_video, process_lecture_video_universal,
+)
+
+TEST_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'courses-tests'},
+    'responses': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'courses-tests-responses'},
+}
+
+
+@override_settings(CACHES=TEST_CACHES)
+class CourseTestCase(TestCase):
+    """A published course with one section of three lectures, and an enrolled student."""
+
+    def setUp(self):
+        for alias in TEST_CACHES:
+            caches[alias].clear()
+        self.instructor = CustomUser.objects.create(
+            email='instructor@example.com', username='instructor', first_name='Ann', last_name='Lee', role='instructor'
+        )
+        self.student = CustomUser.objects.create(email='student@example.com', username='student', role='student')
+        self.category = Category.objects.create(name='Programming')
+        self.course = self.make_course('Python basics')
+        self.section = Section.objects.create(course=self.course, title='Getting started', order=1)
+        self.lectures = [
+            Lecture.objects.create(section=self.section, title=f'Lecture {i}', order=i, duration=10)
+            for i in range(3)
+        ]
+        self.enrollment = Enrollment.objects.create(user=self.student, course=self.course)
+        self.client = APIClient()
+
+    def make_course(self, title, category=None, **fields):
+        fields.setdefault('is_published', True)
+        fields.setdefault('description', f'{title} description')
+        return Course.objects.create(
+            instructor=self.instructor, category=category or self.category, title=title,
+            original_price=10, thumbnail='thumbnails/course.jpg', **fields
+        )
+
+    def refresh_enrollment(self):
+        self.enrollment.refresh_from_db()
+        return self.enrollment
+
+
+class VideoTestCase(CourseTestCase):
+    """CourseTestCase with a throwaway MEDIA_ROOT and an uploaded source video on the first lecture."""
+
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.lecture = self.lectures[0]
+        self.lecture.video_file.save('source.mp4', ContentFile(b'source video'))
+
+    def write_file(self, path, content=b'x'):
+        with open(path, 'wb') as f:
+            f.write(content)
+
+
+class UpdateProgressTests(CourseTestCase):
+
+    def test_form_encoded_false_clears_completion(self):
+        progress = Progress.objects.create(enrollment=self.enrollment, lecture=self.lectures[0], completed=True)
+        self.assertEqual(self.refresh_enrollment().completed_lectures, 1)
+
+        self.client.force_authenticate(self.student)
+        response = self.client.post(f'/api/courses/progress/{progress.pk}/update_progress/', {'completed': 'False'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIs(response.data['data']['completed'], False)
+        enrollment = self.refresh_enrollment()
+        self.assertEqual(enrollment.completed_lectures, 0)
+        self.assertEqual(bytes(enrollment.completion_bitmap), b'')
+        report = self.client.get(f'/api/courses/progress/course_progress/?course_id={self.course.pk}').data['data']
+        self.assertEqual((report['completed_lectures'], report['progress_percentage']), (0, 0))
+
+    def test_invalid_completed_is_rejected(self):
+        progress = Progress.objects.create(enrollment=self.enrollment, lecture=self.lectures[0])
+
+        self.client.force_authenticate(self.student)
+        response = self.client.post(
+            f'/api/courses/progress/{progress.pk}/update_progress/', {'completed': 'maybe'}, format='json'
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.refresh_enrollment().completed_lectures, 0)
+
+
+class CompletionBitmapTests(CourseTestCase):
+
+    def update(self, progress, completed, **kwargs):
+        return self.client.post(f'/api/courses/progress/{progress.pk}/update_progress/', {'completed': completed}, **kwargs)
+
+    def test_set_and_clear_completion(self):
+        first, _, third = [
+            Progress.objects.create(enrollment=self.enrollment, lecture=lecture) for lecture in self.lectures
+        ]
+        self.client.force_authenticate(self.student)
+
+        self.update(first, True, format='json')
+        self.update(third, 'true')
+        enrollment = self.refresh_enrollment()
+        self.assertEqual(enrollment.completed_lectures, 2)
+        self.assertEqual(bytes(enrollment.completion_bitmap), b'\x05')
+
+        self.update(third, 'False')
+        enrollment = self.refresh_enrollment()
+        self.assertEqual(enrollment.completed_lectures, 1)
+        self.assertEqual(bytes(enrollment.completion_bitmap), b'\x01')
+
+        self.update(first, False, format='json')
+        enrollment = self.refresh_enrollment()
+        self.assertEqual(enrollment.completed_lectures, 0)
+        self.assertEqual(bytes(enrollment.completion_bitmap), b'')
+
+    def test_reordering_keeps_bits(self):
+        Progress.objects.create(enrollment=self.enrollment, lecture=self.lectures[2], completed=True)
+        Lecture.objects.filter(pk=self.lectures[2].pk).update(order=0)
+        Lecture.objects.filter(pk=self.lectures[0].pk).update(order=2)
+
+        report = progress_report(self.refresh_enrollment())
+        completed = {lecture['id']: lecture['completed'] for lecture in report['sections'][0]['lectures']}
+        self.assertEqual(completed, {self.lectures[2].pk: True, self.lectures[1].pk: False, self.lectures[0].pk: False})
+
+
+class HeartbeatTests(CourseTestCase):
+
+    def heartbeat(self, *updates):
+        self.client.force_authenticate(self.student)
+        return self.client.post('/api/courses/progress/heartbeat/', {'updates': list(updates)}, format='json')
+
+    def test_positions_are_buffered_until_flush(self):
+        response = self.heartbeat({'lecture_id': self.lectures[0].pk, 'last_position': 30},
+                                  {'lecture_id': self.lectures[0].pk, 'last_position': 45})
+
+        self.assertEqual(response.data['data']['buffered'], 1)
+        self.assertFalse(Progress.objects.exists())
+        progress_buffer.flush()
+        progress = Progress.objects.get()
+        self.assertEqual((progress.last_position, progress.completed), (45, False))
+
+    def test_string_false_does_not_complete(self):
+        response = self.heartbeat({'lecture_id': self.lectures[0].pk, 'last_position': 10, 'completed': 'false'})
+
+        self.assertEqual(response.data['data']['completions'][0]['completed'], False)
+        self.assertFalse(Progress.objects.get().completed)
+        self.assertEqual(self.refresh_enrollment().completed_lectures, 0)
+
+    def test_unconvertible_completed_is_rejected(self):
+        response = self.heartbeat({'lecture_id': self.lectures[0].pk, 'last_position': 10, 'completed': 'done'})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Progress.objects.exists())
+
+    def test_lectures_outside_enrollments_are_rejected(self):
+        other = Section.objects.create(course=self.make_course('Other'), title='Other')
+        lecture = Lecture.objects.create(section=other, title='Elsewhere')
+
+        response = self.heartbeat({'lecture_id': lecture.pk, 'last_position': 5})
+
+        self.assertEqual(response.data['data']['rejected_lecture_ids'], [lecture.pk])
+
+
+class ProcessingLeaseTests(VideoTestCase):
+
+    def test_second_claim_fails_until_release(self):
+        first, second = ProcessingLease(self.lecture.pk), ProcessingLease(self.lecture.pk)
+
+        self.assertTrue(first.acquire())
+        self.assertFalse(second.acquire())
+        first.release()
+        self.assertTrue(second.acquire())
+        second.release()
+
+    def test_finished_upload_is_not_processed_again(self):
+        processor = UniversalVideoProcessor(self.lecture)
+        for quality_name in ('360p', '720p'):
+            self.write_file(processor._mp4_path(quality_name))
+        self.lecture.content_hash = 'a' * 64
+        self.lecture.processing_status = 'completed'
+        self.lecture.processing_checkpoints = {
+            'source': processor._source_key(), 'container': 'mp4', 'output_name': processor.output_name,
+            'renditions': {'360p': {}, '720p': {}},
+            'finished': {'content_hash': 'a' * 64, 'renditions': ['360p', '720p']},
+        }
+        self.lecture.save()
+
+        with mock.patch('courses.video_utils.subprocess') as subprocess:
+            self.assertTrue(process_lecture_video_universal(self.lecture.pk))
+
+        subprocess.run.assert_not_called()
+        subprocess.Popen.assert_not_called()
+        self.lecture.refresh_from_db()
+        self.assertEqual((self.lecture.processing_status, self.lecture.processing_lease), ('completed', ''))
+
+    def test_new_content_is_processed(self):
+        self.lecture.content_hash = 'b' * 64
+        self.lecture.processing_status = 'completed'
+        self.lecture.processing_checkpoints = {
+            'source': UniversalVideoProcessor(self.lecture)._source_key(), 'container': 'mp4', 'renditions': {},
+            'finished': {'content_hash': 'a' * 64, 'renditions': []},
+        }
+
+        self.assertFalse(UniversalVideoProcessor(self.lecture).already_processed())
+
+
+class ChunkedEncodeTests(VideoTestCase):
+
+    def test_keyframes_are_forced_on_source_time(self):
+        processor = UniversalVideoProcessor(self.lecture)
+        config = processor.OUTPUT_QUALITIES['720p']
+
+        self.assertIn('expr:gte(t,n_forced*10+0.000)', processor._video_encode_args(config, 'hls'))
+        self.assertIn('expr:gte(t,n_forced*10+6.500)', processor._video_encode_args(config, 'ts', 303.5))
+        self.assertNotIn('-force_key_frames', processor._video_encode_args(config, 'mp4'))
+
+    def test_chunks_are_encoded_with_their_source_offsets(self):
+        processor = UniversalVideoProcessor(self.lecture)
+        processor.source_key = processor._source_key()
+
+        def split_source(input_path, work_dir):
+            self.write_file(os.path.join(work_dir, 'chunks.csv'),
+                            b'chunk_0000.mkv,0.000000,301.200000\nchunk_0001.mkv,301.200000,598.000000\n')
+            for name in ('chunk_0000.mkv', 'chunk_0001.mkv'):
+                self.write_file(os.path.join(work_dir, name))
+            return sorted(os.path.join(work_dir, name) for name in ('chunk_0000.mkv', 'chunk_0001.mkv'))
+
+        offsets = {}
+
+        def create_quality_versions(chunk, outputs, container, progress_key=None, keyframe_offset=0.0):
+            offsets[os.path.basename(chunk)] = keyframe_offset
+            for path in outputs.values():
+                self.write_file(path)
+            return list(outputs)
+
+        with mock.patch.object(processor, 'split_source', side_effect=split_source), \
+                mock.patch.object(processor, 'create_quality_versions', side_effect=create_quality_versions), \
+                mock.patch.object(processor, 'concat_chunks', return_value=True):
+            done = processor.create_quality_versions_chunked(
+                self.lecture.video_file.path, {'360p': 'a.m3u8', '720p': 'b.m3u8'}, 'hls'
+            )
+
+        self.assertEqual(sorted(done), ['360p', '720p'])
+        self.assertEqual(offsets, {'chunk_0000.mkv': 0.0, 'chunk_0001.mkv': 301.2})
+
+
+class SearchTests(CourseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.make_course('Cooking for beginners', description='Knife skills')
+        self.make_course('Advanced cooking', description='Python powered recipe planner')
+
+    def test_index_backend_ranks_title_matches_first(self):
+        backend = get_search_backend()
+        self.assertIsInstance(backend, SQLSearchBackend)
+
+        results = backend.filter_courses(Course.objects.all(), 'python').order_by('-search_score')
+
+        self.assertEqual([course.title for course in results], ['Python basics', 'Advanced cooking'])
+
+    def test_home_page_counts_every_match(self):
+        for i in range(5):
+            self.make_course(f'Python project {i}')
+
+        response = self.client.get('/api/courses/home/?search=python&page_size=2')
+
+        self.assertEqual(response.data['data']['pagination']['total_courses'], 7)
+
+    def test_incomplete_backend_fails_on_creation(self):
+        class IncompleteBackend(SQLSearchBackend):
+            def match_query(self, tokens):
+                return ' '.join(tokens)
+
+        with self.assertRaises(TypeError):
+            IncompleteBackend()
+
+
+class HLSCopyTests(VideoTestCase):
+
+    def probe(self, keyframe_every, duration=60, fps=25):
+        """keyframes_on_segment_boundaries over a source with a keyframe every `keyframe_every` frames."""
+        packets = '\n'.join(
+            f"{i / fps:.6f},{'K_' if i % keyframe_every == 0 else '__'}" for i in range(duration * fps)
+        )
+        result = mock.Mock(returncode=0, stdout=packets)
+        with mock.patch('courses.video_utils.subprocess.run', return_value=result):
+            return UniversalVideoProcessor(self.lecture).keyframes_on_segment_boundaries('source.mp4', {'fps': fps})
+
+    def test_gop_dividing_the_segment_length_is_copied(self):
+        self.assertTrue(self.probe(keyframe_every=50))   # 2s GOP
+        self.assertTrue(self.probe(keyframe_every=250))  # 10s GOP
+
+    def test_other_gops_are_encoded(self):
+        self.assertFalse(self.probe(keyframe_every=75))    # 3s GOP misses 10s, 20s, ...
+        self.assertFalse(self.probe(keyframe_every=1500))  # Only the first frame is a keyframe
+
+
+class SinglePassEncodeTests(VideoTestCase):
+
+    def run_encode(self, renditions, copy=()):
+        commands = []
+
+        def run_ffmpeg(cmd, timeout, progress_key=None):
+            commands.append(cmd)
+            for path in renditions.values():
+                self.write_file(path)
+            return mock.Mock(returncode=0, stderr='')
+
+        processor = UniversalVideoProcessor(self.lecture)
+        with mock.patch.object(processor, '_run_ffmpeg', side_effect=run_ffmpeg):
+            done = processor.create_quality_versions(self.lecture.video_file.path, renditions, copy=copy)
+        return done, commands
+
+    def test_every_rendition_comes_from_one_decode(self):
+        processor = UniversalVideoProcessor(self.lecture)
+        renditions = {name: processor._mp4_path(name) for name in ('360p', '480p', '720p')}
+
+        done, commands = self.run_encode(renditions)
+
+        self.assertEqual(done, ['360p', '480p', '720p'])
+        self.assertEqual(len(commands), 1)
+        cmd = commands[0]
+        self.assertEqual(cmd.count('-i'), 1)
+        self.assertTrue(cmd[cmd.index('-filter_complex') + 1].startswith('[0:v]split=3[s0][s1][s2]'))
+        for path in renditions.values():
+            self.assertIn(path, cmd)
+
+    def test_copied_rendition_is_not_scaled(self):
+        processor = UniversalVideoProcessor(self.lecture)
+        renditions = {name: processor._mp4_path(name) for name in ('360p', '720p')}
+
+        _, [cmd] = self.run_encode(renditions, copy={'720p'})
+
+        self.assertIn('split=1[s0]', cmd[cmd.index('-filter_complex') + 1])
+        self.assertEqual(cmd.count('libx264'), 1)
+        self.assertIn('copy', cmd)
+
+
+class RenditionPlanTests(VideoTestCase):
+
+    def test_no_upscaling_and_matching_rung_is_copied(self):
+        plan = UniversalVideoProcessor(self.lecture).plan_renditions({
+            'height': 720, 'video_codec': 'h264', 'pix_fmt': 'yuv420p', 'audio_codec': 'aac',
+            'video_bit_rate': 2_000_000,
+        })
+
+        self.assertEqual(list(plan), ['360p', '480p', '720p'])
+        self.assertEqual({name: step['copy'] for name, step in plan.items()},
+                         {'360p': False, '480p': False, '720p': True})
+
+    def test_high_bitrate_source_is_encoded(self):
+        plan = UniversalVideoProcessor(self.lecture).plan_renditions({
+            'height': 720, 'video_codec': 'h264', 'pix_fmt': 'yuv420p', 'video_bit_rate': 8_000_000,
+        })
+
+        self.assertFalse(plan['720p']['copy'])
+
+    def test_tiny_source_still_gets_the_lowest_rung(self):
+        plan = UniversalVideoProcessor(self.lecture).plan_renditions({'height': 240})
+
+        self.assertEqual(plan, {'360p': {'copy': False}})
+
+    def test_rotated_phone_video_is_probed_as_portrait(self):
+        probe = mock.Mock(returncode=0, stdout=json.dumps({
+            'format': {'duration': '12.5', 'size': '1000', 'bit_rate': '640000'},
+            'streams': [{'codec_type': 'video', 'width': 1920, 'height': 1080, 'codec_name': 'h264',
+                         'pix_fmt': 'yuv420p', 'avg_frame_rate': '30000/1001', 'tags': {'rotate': '90'}}],
+        }))
+        with mock.patch('courses.video_utils.subprocess.run', return_value=probe):
+            info = UniversalVideoProcessor(self.lecture).get_video_info('source.mp4')
+
+        self.assertEqual((info['width'], info['height'], info['fps']), (1080, 1920, 29.97))
+        self.assertEqual(info['duration'], 12.5)
+
+
+class EncodeProgressTests(CourseTestCase):
+
+    def test_progress_is_published_and_served(self):
+        lecture = self.lectures[0]
+        reporter = EncodeProgressReporter(lecture.pk, 100, ['360p', '720p'])
+        reporter.begin('encoding', ['360p', '720p'])
+        reporter.update('full', {'out_time_us': '25000000', 'fps': '48.0', 'progress': 'continue'})
+        reporter.publish(force=True)
+
+        self.client.force_authenticate(self.instructor)
+        response = self.client.get(
+            f'/api/courses/courses/{self.course.pk}/sections/{self.section.pk}/lectures/{lecture.pk}/processing-status/'
+        )
+
+        progress = response.data['progress']
+        self.assertEqual(progress['stage'], 'encoding')
+        self.assertEqual(progress['renditions']['720p']['percent'], 25.0)
+        self.assertEqual(progress['renditions']['720p']['fps'], 48.0)
+
+    def test_parallel_runs_add_up(self):
+        reporter = EncodeProgressReporter(self.lectures[0].pk, 100, ['720p'])
+        reporter.begin('encoding', ['720p'])
+        reporter.update('chunk_0', {'out_time_us': '30000000', 'progress': 'end'})
+        reporter.update('chunk_1', {'out_time_us': '20000000', 'progress': 'continue'})
+        reporter.finish([])
+
+        self.assertEqual(get_encode_progress(self.lectures[0].pk)['renditions']['720p']['percent'], 50.0)
+
+
+@override_settings(VIDEO_MAX_CONCURRENT_ENCODES=1, VIDEO_QUEUE_MAX_ATTEMPTS=3)
+class VideoQueueTests(CourseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.queue = LocalVideoQueue(mock.Mock(return_value=True))
+
+    def test_jobs_are_claimed_by_priority_within_the_cap(self):
+        bulk = self.queue.delay(self.lectures[0].pk, priority=6)
+        self.queue.delay(self.lectures[1].pk, priority=3)
+        again = self.queue.delay(self.lectures[0].pk, priority=0)
+
+        self.assertEqual(again.pk, bulk.pk)
+        self.assertEqual(VideoProcessingJob.objects.count(), 2)
+        self.assertEqual(self.queue._claim().pk, bulk.pk)
+        self.assertIsNone(self.queue._claim())  # One slot, taken
+
+        VideoProcessingJob.objects.filter(pk=bulk.pk).update(status='completed', slot=None)
+        self.assertEqual(self.queue._claim().lecture_id, self.lectures[1].pk)
+
+    def test_stale_jobs_are_requeued_then_failed(self):
+        lecture = self.lectures[0]
+        Lecture.objects.filter(pk=lecture.pk).update(processing_status='processing')
+        long_ago = timezone.now() - timedelta(hours=1)
+        retry = VideoProcessingJob.objects.create(
+            lecture=self.lectures[1], status='running', slot=0, attempts=1, heartbeat_at=long_ago
+        )
+        give_up = VideoProcessingJob.objects.create(
+            lecture=lecture, status='running', slot=1, attempts=3, heartbeat_at=long_ago
+        )
+
+        self.queue._requeue_stale()
+
+        retry.refresh_from_db()
+        give_up.refresh_from_db()
+        lecture.refresh_from_db()
+        self.assertEqual((retry.status, retry.slot), ('queued', None))
+        self.assertEqual((give_up.status, give_up.slot), ('failed', None))
+        self.assertEqual(lecture.processing_status, 'failed')
+
+
+class DuplicateUploadTests(VideoTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.lecture.content_hash = compute_content_hash(self.lecture.video_file.path)
+        self.lecture.hls_playlist = 'lecture_videos/hls/lecture_donor_master.m3u8'
+        self.lecture.video_720p = 'lecture_videos/lecture_donor_720p.mp4'
+        self.lecture.processing_status = 'completed'
+        self.lecture.save()
+        os.makedirs(os.path.dirname(self.lecture.hls_playlist.path), exist_ok=True)
+        self.write_file(self.lecture.hls_playlist.path, b'#EXTM3U')
+
+    def test_same_upload_reuses_the_renditions(self):
+        duplicate = self.lectures[1]
+        duplicate.video_file.save('copy.mp4', ContentFile(b'source video'))
+        duplicate.content_hash = compute_content_hash(duplicate.video_file.path)
+        duplicate_upload = duplicate.video_file.path
+
+        self.assertTrue(link_duplicate_video(duplicate))
+
+        duplicate.refresh_from_db()
+        self.assertEqual(duplicate.processing_status, 'completed')
+        self.assertEqual(duplicate.hls_playlist.name, self.lecture.hls_playlist.name)
+        self.assertEqual(duplicate.video_720p.name, self.lecture.video_720p.name)
+        self.assertEqual(duplicate.video_file.name, self.lecture.video_file.name)
+        self.assertFalse(os.path.exists(duplicate_upload))
+
+    def test_different_upload_is_encoded(self):
+        other = self.lectures[1]
+        other.video_file.save('other.mp4', ContentFile(b'another video'))
+        other.content_hash = compute_content_hash(other.video_file.path)
+
+        self.assertFalse(link_duplicate_video(other))
+
+
+class ChunkedUploadTests(VideoTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.instructor)
+        self.url = (f'/api/courses/courses/{self.course.pk}/sections/{self.section.pk}'
+                    f'/lectures/{self.lectures[1].pk}/upload-sessions/')
+
+    def open_session(self, content, checksum=None):
+        response = self.client.post(self.url, {
+            'filename': 'lecture.mp4', 'total_size': len(content),
+            'checksum': checksum or hashlib.sha256(content).hexdigest(),
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        return f"{self.url}{response.data['id']}/"
+
+    def put(self, session_url, content, start):
+        chunk = content[start:start + 6]
+        return self.client.put(
+            session_url, data=chunk, content_type='application/octet-stream',
+            HTTP_CONTENT_RANGE=f'bytes {start}-{start + len(chunk) - 1}/{len(content)}'
+        )
+
+    def test_resumable_upload_is_verified_in_the_worker(self):
+        content = b'chunked lecture video'
+        session_url = self.open_session(content)
+
+        self.assertEqual(self.put(session_url, content, 0).data['received_bytes'], 6)
+        self.assertEqual(self.put(session_url, content, 0).status_code, 409)  # Retried chunk
+        for start in range(6, len(content), 6):
+            self.assertEqual(self.put(session_url, content, start).status_code, 200)
+        with mock.patch('courses.views.enqueue_lecture_processing') as enqueue, \
+                self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(f'{session_url}complete/')
+
+        self.assertEqual(response.status_code, 202)
+        enqueue.assert_called_once()
+        lecture = Lecture.objects.get(pk=self.lectures[1].pk)
+        self.assertTrue(install_verified_upload(lecture))
+        lecture.refresh_from_db()
+        with lecture.video_file.open('rb') as f:
+            self.assertEqual(f.read(), content)
+        self.assertEqual(lecture.content_hash, hashlib.sha256(content).hexdigest())
+        self.assertEqual(self.client.get(session_url).data['status'], 'completed')
+
+    def test_checksum_mismatch_is_rejected_and_cleaned_up(self):
+        content = b'corrupted'
+        session_url = self.open_session(content, checksum='0' * 64)
+        for start in range(0, len(content), 6):
+            self.put(session_url, content, start)
+        with mock.patch('courses.views.enqueue_lecture_processing'), self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'{session_url}complete/')
+
+        self.assertFalse(install_verified_upload(Lecture.objects.get(pk=self.lectures[1].pk)))
+        self.assertEqual(self.client.get(session_url).data['status'], 'failed')
+        self.assertEqual(cleanup_upload_sessions(), (1, 0))
+        self.assertEqual(self.client.get(session_url).status_code, 404)
+
+
+class PreviewTests(VideoTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.processor = UniversalVideoProcessor(self.lecture)
+
+    def test_poster_skips_intro_without_seeking_past_short_clips(self):
+        self.assertEqual(self.processor._preview_paths(600)['poster_time'], 5.0)
+        self.assertEqual(self.processor._preview_paths(20)['poster_time'], 2.0)
+
+    def test_thumbnail_track_maps_cues_to_sprite_tiles(self):
+        previews = self.processor._preview_paths(1005)
+        for sheet in (1, 2):
+            self.write_file(previews['sprite'] % sheet)
+
+        self.assertEqual(self.processor.write_thumbnail_track(previews, 1005),
+                         f'lecture_videos/previews/{os.path.basename(previews["vtt"])}')
+        with open(previews['vtt']) as f:
+            cues = f.read().split('\n\n')
+        self.assertEqual(cues[0], 'WEBVTT')
+        self.assertEqual(len(cues) - 1, 101)
+        name = self.processor.output_name
+        self.assertEqual(cues[1], f'00:00:00.000 --> 00:00:10.000\n{name}_sprite_001.jpg#xywh=0,0,160,90')
+        self.assertEqual(cues[12].split('#')[1], 'xywh=160,90,160,90')
+        self.assertEqual(cues[101].strip(), f'00:16:40.000 --> 00:16:45.000\n{name}_sprite_002.jpg#xywh=0,0,160,90')
+
+    def test_no_track_without_sprite_sheets(self):
+        self.assertIsNone(self.processor.write_thumbnail_track(self.processor._preview_paths(60), 60))
+
+
+class CourseStatsTests(CourseTestCase):
+
+    def stats(self):
+        return CourseStats.objects.get(course=self.course)
+
+    def test_counters_follow_enrollments_reviews_and_lectures(self):
+        other = CustomUser.objects.create(email='other@example.com', username='other', role='student')
+        Enrollment.objects.create(user=other, course=self.course)
+        review = Review.objects.create(course=self.course, student=self.student, rating=5, comment='Great')
+        Review.objects.create(course=self.course, student=other, rating=2, comment='Meh')
+        stats = self.stats()
+        self.assertEqual((stats.student_count, stats.review_count, stats.rating_sum), (2, 2, 7))
+        self.assertEqual(stats.average_rating, 3.5)
+        self.assertEqual((stats.lecture_count, stats.total_duration), (3, 30))
+
+        review.rating = 4
+        review.save()
+        self.lectures[0].delete()
+        stats = self.stats()
+        self.assertEqual(stats.rating_distribution, {'1_star': 0, '2_star': 1, '3_star': 0, '4_star': 1, '5_star': 0})
+        self.assertEqual(stats.rating_sum, 6)
+        self.assertEqual((stats.lecture_count, stats.total_duration), (2, 20))
+
+        review.delete()
+        self.enrollment.delete()
+        stats = self.stats()
+        self.assertEqual((stats.student_count, stats.review_count, stats.rating_sum, stats.rating_4), (1, 1, 2, 0))
+
+    def test_rebuild_matches_incremental_counters(self):
+        Review.objects.create(course=self.course, student=self.student, rating=3, comment='OK')
+        fields = ['student_count', 'review_count', 'rating_sum', 'rating_3', 'lecture_count', 'total_duration',
+                  'lecture_slots']
+        before = CourseStats.objects.filter(course=self.course).values(*fields, 'version').get()
+
+        rebuild_course_stats([self.course.pk])
+
+        after = CourseStats.objects.filter(course=self.course).values(*fields, 'version').get()
+        self.assertEqual({f: after[f] for f in fields}, {f: before[f] for f in fields})
+        self.assertGreater(after['version'], before['version'])
+
+
+class SuggestTests(CourseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        suggest_index.load()
+
+    def suggest(self, q):
+        response = self.client.get('/api/courses/search/suggest/', {'q': q})
+        self.assertEqual(response.status_code, 200)
+        return [(item['type'], item['text']) for item in response.data['suggestions']]
+
+    def test_matches_any_word_and_ranks_label_prefix_first(self):
+        self.make_course('Advanced Python Patterns')
+
+        self.assertEqual(self.suggest('PYTH'), [('course', 'Python basics'), ('course', 'Advanced Python Patterns')])
+        self.assertEqual(self.suggest('lee'), [('instructor', 'Ann Lee')])
+        self.assertEqual(self.suggest('prog'), [('category', 'Programming')])
+        self.assertEqual(self.suggest(''), [])
+
+    def test_writes_update_the_index(self):
+        self.course.is_published = False
+        self.course.save()
+        self.assertEqual(self.suggest('python'), [])
+
+        self.course.title = 'Python for data science'
+        self.course.is_published = True
+        self.course.save()
+        self.assertEqual(self.suggest('data sci'), [('course', 'Python for data science')])
+
+
+class ConditionalCourseDetailTests(CourseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.student)
+        self.url = f'/api/courses/courses/{self.course.pk}/'
+
+    def etag(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return response['ETag']
+
+    def test_unchanged_course_is_not_modified(self):
+        etag = self.etag()
+
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.client.force_authenticate(self.instructor)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_curriculum_and_category_changes_refresh_the_etag(self):
+        etag = self.etag()
+        self.lectures[1].title = 'Renamed'
+        self.lectures[1].save()
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        # Detail shows the category's course count
+        etag = self.etag()
+        self.make_course('Django basics')
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        etag = self.etag()
+        self.make_course('Painting', category=Category.objects.create(name='Art'))
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+
+class CurriculumSnapshotTests(CourseTestCase):
+
+    def lecture_titles(self, user=None):
+        self.client.force_authenticate(user or self.student)
+        response = self.client.get(f'/api/courses/courses/{self.course.pk}/')
+        self.assertEqual(response.status_code, 200)
+        return [lecture['title'] for lecture in response.data['sections'][0]['lectures']]
+
+    def test_snapshot_is_rebuilt_only_after_a_write(self):
+        self.lecture_titles()
+        with mock.patch('courses.curriculum.build_curriculum', wraps=build_curriculum) as build:
+            self.lecture_titles()
+            build.assert_not_called()
+
+            self.lectures[0].title = 'Welcome'
+            self.lectures[0].save()
+            self.assertEqual(self.lecture_titles(), ['Welcome', 'Lecture 1', 'Lecture 2'])
+            build.assert_called_once()
+
+    def test_stale_build_is_not_stored(self):
+        curriculum = CourseCurriculum.objects.get_or_create(course=self.course)[0]
+        Section.objects.create(course=self.course, title='Extras', order=2)
+
+        build_curriculum(self.course.pk, curriculum.version)
+
+        self.assertTrue(CourseCurriculum.objects.get(course=self.course).is_stale)
+
+    def test_locks_are_applied_per_caller(self):
+        visitor = CustomUser.objects.create(email='visitor@example.com', username='visitor', role='student')
+        self.client.force_authenticate(visitor)
+        lecture = self.client.get(f'/api/courses/courses/{self.course.pk}/').data['sections'][0]['lectures'][0]
+        self.assertEqual(lecture['video_urls']['status'], 'locked')
+
+        self.client.force_authenticate(self.student)
+        lecture = self.client.get(f'/api/courses/courses/{self.course.pk}/').data['sections'][0]['lectures'][0]
+        self.assertEqual(lecture['video_urls']['status'], 'pending')
+
+
+class KeysetPaginationTests(CourseTestCase):
+
+    def walk(self, url, params):
+        seen, cursor = [], ''
+        while cursor is not None:
+            response = self.client.get(url, {**params, 'cursor': cursor})
+            self.assertEqual(response.status_code, 200, response.data)
+            data = response.data.get('data', response.data)
+            items = data.get('courses', data.get('reviews'))
+            seen += [item['id'] for item in items]
+            cursor = data['pagination']['next_cursor'] if 'pagination' in data else data['next_cursor']
+        return seen
+
+    def test_home_pages_through_ties_without_repeats(self):
+        # Equal ratings (none) and prices: only the id tiebreak orders them
+        ids = [self.course.pk] + [self.make_course(f'Course {i}').pk for i in range(6)]
+
+        for sort in ('rating', 'price_low', 'newest'):
+            seen = self.walk('/api/courses/home/', {'sort': sort, 'page_size': 2})
+            self.assertEqual(sorted(seen), sorted(ids), sort)
+        self.assertEqual(self.walk('/api/courses/home/', {'sort': 'price_low', 'page_size': 2}), sorted(ids))
+
+    def test_reviews_page_by_cursor(self):
+        students = CustomUser.objects.bulk_create(
+            CustomUser(email=f'reviewer{i}@example.com', username=f'reviewer{i}', role='student') for i in range(25)
+        )
+        Review.objects.bulk_create(
+            Review(course=self.course, student=student, rating=4, comment='Good') for student in students
+        )
+        self.client.force_authenticate(self.student)
+
+        seen = self.walk(f'/api/courses/courses/{self.course.pk}/reviews/', {})
+        self.assertEqual(sorted(seen), sorted(Review.objects.values_list('id', flat=True)))
+        self.assertEqual(len(seen), 25)
+
+    def test_invalid_cursor_is_rejected(self):
+        self.assertEqual(self.client.get('/api/courses/home/', {'cursor': 'not-a-cursor'}).status_code, 400)
+
+
+class LeaderboardTests(CourseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.students = CustomUser.objects.bulk_create(
+            CustomUser(email=f'learner{i}@example.com', username=f'learner{i}', role='student') for i in range(10)
+        )
+
+    def review(self, course, ratings):
+        for student, rating in zip(self.students, ratings):
+            Review.objects.create(course=course, student=student, rating=rating, comment='Review')
+
+    def board(self, board, **params):
+        response = self.client.get(f'/api/courses/leaderboards/{board}/', params)
+        self.assertEqual(response.status_code, 200)
+        return [course['title'] for course in response.data['courses']]
+
+    def test_top_rated_weighs_ratings_by_review_count(self):
+        proven = self.make_course('Proven')
+        weak = self.make_course('Weak')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.review(self.course, [5])
+            self.review(proven, [5] * 10)
+            self.review(weak, [2] * 10)
+        rebuild_leaderboards()
+
+        # One 5-star review is pulled towards the platform mean; ten are not
+        self.assertEqual(self.board('top_rated'), ['Proven', 'Python basics', 'Weak'])
+
+    def test_enrollments_rescore_popular_and_trending(self):
+        rising = self.make_course('Rising', category=Category.objects.create(name='Design'))
+        rebuild_leaderboards()
+        self.assertEqual(self.board('popular'), ['Python basics', 'Rising'])
+        with self.captureOnCommitCallbacks(execute=True):
+            for student in self.students[:2]:
+                Enrollment.objects.create(user=student, course=rising)
+
+        self.assertEqual(self.board('popular'), ['Rising', 'Python basics'])
+        self.assertEqual(self.board('trending', category=self.category.pk), ['Python basics'])
+        self.assertEqual(self.client.get('/api/courses/leaderboards/unknown/').status_code, 404)
+
+
+class RatingStatisticsTests(CourseTestCase):
+
+    def statistics(self):
+        response = self.client.get('/api/courses/rating-statistics/')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_statistics_follow_writes(self):
+        other = CustomUser.objects.create(email='other@example.com', username='other', role='student')
+        draft = self.make_course('Draft', is_published=False)
+        with self.captureOnCommitCallbacks(execute=True):
+            Review.objects.create(course=self.course, student=self.student, rating=5, comment='Great')
+            Review.objects.create(course=self.course, student=other, rating=3, comment='OK')
+            Enrollment.objects.create(user=other, course=draft)
+
+        data = self.statistics()
+        self.assertEqual(data['platform_statistics'], {
+            'total_courses': 1, 'total_reviews': 2, 'total_students': 2, 'average_rating': 4.0,
+            'courses_with_reviews': 1,
+        })
+        self.assertEqual(data['rating_distribution']['5_star'], 1)
+        self.assertEqual(data['rating_percentages']['3_star'], 50.0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            draft.is_published = True
+            draft.save()
+        self.assertEqual(self.statistics()['platform_statistics']['total_courses'], 2)
+
+    def test_counters_match_a_rebuild(self):
+        Review.objects.create(course=self.course, student=self.student, rating=4, comment='Good')
+        self.make_course('Draft', is_published=False).delete()
+        fields = [f.name for f in PlatformStats._meta.fields if f.name not in ('id', 'updated_at')]
+        incremental = PlatformStats.objects.values(*fields).get()
+
+        rebuild_platform_stats()
+
+        self.assertEqual(PlatformStats.objects.values(*fields).get(), incremental)
+
+
+class HomeFacetTests(CourseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.make_course('Django in depth', level='Advanced', discounted_price=1500)
+        self.make_course('Watercolour', category=Category.objects.create(name='Art'), discounted_price=0)
+
+    def home(self, **params):
+        response = self.client.get('/api/courses/home/', {'facets': '1', **params})
+        self.assertEqual(response.status_code, 200)
+        return response.data['data']
+
+    def test_each_facet_ignores_only_its_own_filter(self):
+        data = self.home(category='programming', level='advanced')
+        facets = data['facets']
+
+        self.assertEqual([course['title'] for course in data['courses']], ['Django in depth'])
+        self.assertEqual([(c['name'], c['count']) for c in facets['category']], [('Programming', 1)])
+        self.assertEqual({level['value']: level['count'] for level in facets['level']},
+                         {'Beginner': 1, 'Intermediate': 0, 'Advanced': 1})
+        self.assertEqual({price['key']: price['count'] for price in facets['price'] if price['count']},
+                         {'1000-2000': 1})
+
+    def test_price_filter_and_unfiltered_counts(self):
+        data = self.home(price_max='0')
+        self.assertEqual([course['title'] for course in data['courses']], ['Watercolour'])
+        self.assertEqual({price['key']: price['count'] for price in data['facets']['price']},
+                         {'free': 1, '0-500': 1, '500-1000': 0, '1000-2000': 1, '2000+': 0})
+        self.assertNotIn('facets', self.client.get('/api/courses/home/').data['data'])
+
+
+class ContinueLearningTests(CourseTestCase):
+    url = '/api/courses/enrollments/continue_learning/'
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.student)
+
+    def resume(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return response.data['data'][0]['continue_learning']
+
+    def test_next_and_last_watched_lectures(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Progress.objects.create(enrollment=self.enrollment, lecture=self.lectures[0], completed=True)
+            Progress.objects.create(enrollment=self.enrollment, lecture=self.lectures[2], last_position=30)
+
+        resume = self.resume()
+        self.assertEqual(resume['next_lecture']['id'], self.lectures[1].pk)
+        self.assertEqual((resume['last_watched_lecture']['id'], resume['last_watched_lecture']['last_position']),
+                         (self.lectures[2].pk, 30))
+        self.assertEqual((resume['total_completed_lectures'], resume['total_lectures']), (1, 3))
+
+    def test_cached_until_progress_or_course_changes(self):
+        self.resume()
+        with self.assertNumQueries(1):
+            self.assertEqual(self.resume()['next_lecture']['id'], self.lectures[0].pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Progress.objects.create(enrollment=self.enrollment, lecture=self.lectures[0], completed=True)
+        self.assertEqual(self.resume()['next_lecture']['id'], self.lectures[1].pk)
+
+        self.lectures[1].title = 'Variables'
+        self.lectures[1].save()
+        self.assertEqual(self.resume()['next_lecture']['title'], 'Variables')
+
+
+class ProgressReportTests(CourseTestCase):
+
+    def test_report_uses_two_queries_at_any_course_size(self):
+        Progress.objects.create(enrollment=self.enrollment, lecture=self.lectures[0], completed=True)
+        Progress.objects.create(enrollment=self.enrollment, lecture=self.lectures[1], last_position=300)
+        extra = Section.objects.create(course=self.course, title='More', order=2)
+        Lecture.objects.bulk_create(
+            Lecture(section=extra, title=f'Extra {i}', order=i, duration=5, bit_index=10 + i) for i in range(20)
+        )
+        Section.objects.create(course=self.course, title='Coming soon', order=3)
+        enrollment = self.refresh_enrollment()
+
+        with self.assertNumQueries(2):
+            report = progress_report(enrollment)
+
+        first, more, empty = report['sections']
+        self.assertEqual((first['completed_lectures'], first['total_lectures'], first['watched_duration']),
+                         (1, 3, 15))
+        self.assertEqual((more['total_lectures'], more['total_duration']), (20, 100))
+        self.assertEqual((empty['title'], empty['lectures'], empty['total_lectures']), ('Coming soon', [], 0))
+        self.assertEqual((report['completed_lectures'], report['total_lectures']), (1, 23))
+        self.assertEqual(report['watched_duration'], 15)
@@ -0,0 +1,74 @@
+import hashlib
+import logging
+import os
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.uploadhandler import FileUploadHandler
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import LectureUploadSession
+
+logger = logging.getLogger(__name__)
+
+
+class ContentHashUploadHandler(FileUploadHandler):
+    """
+    Fingerprints uploaded files while Django streams them to disk. Every chunk
+    is hashed and passed on untouched to the next handler, so the file is never
+    read twice. Digests end up in request.upload_content_hashes[field_name].
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.sha256 = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.sha256.update(raw_data)
+        return raw_data
+
+    def file_complete(self, file_size):
+        if not hasattr(self.request, 'upload_content_hashes'):
+            self.request.upload_content_hashes = {}
+        self.request.upload_content_hashes[self.field_name] = self.sha256.hexdigest()
+        # Returning None lets the next handler build the actual uploaded file
+        return None
+
+
+def cleanup_upload_sessions():
+    """
+    Delete chunked upload sessions idle for VIDEO_UPLOAD_SESSION_TTL_HOURS, and
+    failed ones, with their partial files; then remove .part files no session
+    owns. Returns (sessions, files) deleted.
+    """
+    ttl = timedelta(hours=getattr(settings, 'VIDEO_UPLOAD_SESSION_TTL_HOURS', 24))
+    cutoff = timezone.now() - ttl
+    expired = LectureUploadSession.objects.filter(
+        Q(status='uploading', updated_at__lt=cutoff) | Q(status='failed')
+    )
+    upload_dir = os.path.join(settings.MEDIA_ROOT, 'lecture_videos', 'uploads')
+    files = 0
+    for upload in expired:
+        part_path = os.path.join(settings.MEDIA_ROOT, upload.relative_path)
+        if os.path.exists(part_path):
+            os.remove(part_path)
+            files += 1
+    sessions, _ = expired.delete()
+
+    # Leftovers of deleted lectures or crashed requests; young files may belong to a session being created
+    live = {
+        str(pk) for pk in LectureUploadSession.objects.filter(
+            status__in=['uploading', 'verifying']
+        ).values_list('pk', flat=True)
+    }
+    if os.path.isdir(upload_dir):
+        for entry in os.scandir(upload_dir):
+            stem, ext = os.path.splitext(entry.name)
+            if ext == '.part' and stem not in live and entry.stat().st_mtime < time.time() - ttl.total_seconds():
+                os.remove(entry.path)
+                files += 1
+    if sessions or files:
+        logger.info("Removed %s abandoned upload sessions and %s partial files", sessions, files)
+    return sessions, files
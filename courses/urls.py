@@ -1,9 +1,9 @@
 from django.urls import path, include, re_path
 from rest_framework.routers import DefaultRouter
 from .views import (
-    CourseViewSet, SectionViewSet, LectureViewSet,
+    CourseViewSet, SectionViewSet, LectureViewSet, LectureUploadSessionViewSet,
     ResourceViewSet, EnrollmentViewSet, ProgressViewSet,
-    global_search, home_page_courses, top_rated_courses, rating_statistics
+    global_search, search_suggest, home_page_courses, top_rated_courses, course_leaderboard, rating_statistics
 )
 
 # 1. Main router for simple endpoints
@@ -18,8 +18,10 @@ urlpatterns = [
 
     # 2. Custom API Endpoints (Home & Search)
     path('search/', global_search, name='global-search'),
+    path('search/suggest/', search_suggest, name='search-suggest'),
     path('home/', home_page_courses, name='home-page-courses'),
     path('top-rated/', top_rated_courses, name='top-rated-courses'),
+    path('leaderboards/<str:board>/', course_leaderboard, name='course-leaderboard'),
     path('rating-statistics/', rating_statistics, name='rating-statistics'),
 
     # 3. Manual Nested Routes (Udemy-Style)
@@ -42,6 +44,29 @@ urlpatterns = [
         'get': 'retrieve', 'put': 'update', 'patch': 'partial_update', 'delete': 'destroy'
     }), name='section-lectures-detail'),
 
+    # Lecture MP4 download (remuxed from HLS on first request): /courses/1/sections/2/lectures/3/download/?quality=720p
+    re_path(r'^courses/(?P<course_pk>\d+)/sections/(?P<section_pk>\d+)/lectures/(?P<pk>\d+)/download/$', LectureViewSet.as_view({
+        'get': 'download'
+    }), name='section-lectures-download'),
+
+    # Lecture encode progress: /courses/1/sections/2/lectures/3/processing-status/
+    re_path(r'^courses/(?P<course_pk>\d+)/sections/(?P<section_pk>\d+)/lectures/(?P<pk>\d+)/processing-status/$', LectureViewSet.as_view({
+        'get': 'processing_status'
+    }), name='section-lectures-processing-status'),
+
+    # Chunked, resumable video uploads: /courses/1/sections/2/lectures/3/upload-sessions/
+    re_path(r'^courses/(?P<course_pk>\d+)/sections/(?P<section_pk>\d+)/lectures/(?P<lecture_pk>\d+)/upload-sessions/$', LectureUploadSessionViewSet.as_view({
+        'post': 'create'
+    }), name='lecture-upload-sessions-list'),
+
+    re_path(r'^courses/(?P<course_pk>\d+)/sections/(?P<section_pk>\d+)/lectures/(?P<lecture_pk>\d+)/upload-sessions/(?P<pk>[0-9a-f-]+)/$', LectureUploadSessionViewSet.as_view({
+        'get': 'retrieve', 'put': 'append', 'delete': 'destroy'
+    }), name='lecture-upload-sessions-detail'),
+
+    re_path(r'^courses/(?P<course_pk>\d+)/sections/(?P<section_pk>\d+)/lectures/(?P<lecture_pk>\d+)/upload-sessions/(?P<pk>[0-9a-f-]+)/complete/$', LectureUploadSessionViewSet.as_view({
+        'post': 'complete'
+    }), name='lecture-upload-sessions-complete'),
+
     # Resources: /courses/1/sections/2/lectures/3/resources/
     re_path(r'^courses/(?P<course_pk>\d+)/sections/(?P<section_pk>\d+)/lectures/(?P<lecture_pk>\d+)/resources/$', ResourceViewSet.as_view({
         'get': 'list', 'post': 'create'
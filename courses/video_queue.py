@@ -0,0 +1,171 @@
+import logging
+import os
+import socket
+import threading
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+class LocalVideoQueue:
+    """
+    Persistent, prioritised video encode queue used when Celery is not installed.
+    Jobs are VideoProcessingJob rows, so they survive restarts. The worker pool runs
+    in the run_video_queue command (or, with VIDEO_QUEUE_IN_WEB_WORKERS, in each
+    gunicorn worker); it claims jobs in priority order. A running job holds one of
+    VIDEO_MAX_CONCURRENT_ENCODES slots, and the unique index on the slot column
+    makes the cap hold across all processes. A job whose process dies is re-queued,
+    and marked failed after VIDEO_QUEUE_MAX_ATTEMPTS attempts.
+    """
+
+    HEARTBEAT_SECONDS = 30
+    POLL_SECONDS = 5
+
+    def __init__(self, func):
+        self._func = func
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._started = False
+        self.worker_id = ''
+
+    @property
+    def concurrency(self):
+        return getattr(settings, 'VIDEO_MAX_CONCURRENT_ENCODES', None) or max(1, (os.cpu_count() or 2) // 2)
+
+    def delay(self, lecture_id, priority=6, kind='encode', quality=''):
+        """Queue a lecture job (one queued job per lecture and kind; a re-queue only raises its priority)"""
+        from .models import VideoProcessingJob
+
+        job = VideoProcessingJob.objects.filter(
+            lecture_id=lecture_id, kind=kind, quality=quality, status='queued'
+        ).first()
+        if job:
+            if priority < job.priority:
+                VideoProcessingJob.objects.filter(pk=job.pk).update(priority=priority)
+        else:
+            job = VideoProcessingJob.objects.create(
+                lecture_id=lecture_id, kind=kind, quality=quality, priority=priority
+            )
+
+        # Workers in this process (if any) pick it up now; others within POLL_SECONDS
+        self._wakeup.set()
+        return job
+
+    def pending_count(self):
+        from .models import VideoProcessingJob
+        return VideoProcessingJob.objects.filter(status__in=['queued', 'running']).count()
+
+    def start(self):
+        """Start this process's worker pool (idempotent)"""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+            # Resolved here, not in __init__, so forked gunicorn workers get their own pid
+            self.worker_id = f'{socket.gethostname()}:{os.getpid()}'
+
+        self._requeue_stale()
+        for i in range(self.concurrency):
+            threading.Thread(target=self._work, name=f'video-queue-{i}', daemon=True).start()
+        threading.Thread(target=self._heartbeat, name='video-queue-heartbeat', daemon=True).start()
+        logger.info("Local video queue started with %s workers (%s)", self.concurrency, self.worker_id)
+
+    def _requeue_stale(self):
+        """
+        Jobs whose process stopped heartbeating (restart, crash) go back to the queue,
+        or fail for good once they have used up VIDEO_QUEUE_MAX_ATTEMPTS attempts
+        """
+        from .models import Lecture, VideoProcessingJob
+
+        now = timezone.now()
+        stale = VideoProcessingJob.objects.filter(
+            status='running', heartbeat_at__lt=now - timedelta(seconds=self.HEARTBEAT_SECONDS * 4)
+        )
+        exhausted = stale.filter(attempts__gte=getattr(settings, 'VIDEO_QUEUE_MAX_ATTEMPTS', 3))
+        lecture_ids = list(exhausted.filter(kind='encode').values_list('lecture_id', flat=True))
+        failed = exhausted.update(status='failed', worker='', slot=None, finished_at=now)
+        if failed:
+            logger.error("Gave up on %s video processing job(s) that kept crashing: lectures %s", failed, lecture_ids)
+            # Saved one by one so the course caches see the new status
+            for lecture in Lecture.objects.filter(pk__in=lecture_ids, processing_status='processing'):
+                lecture.processing_status = 'failed'
+                lecture.save(update_fields=['processing_status'])
+
+        requeued = stale.update(status='queued', worker='', slot=None)
+        if requeued:
+            logger.warning("Requeued %s stale video processing job(s)", requeued)
+
+    def _claim(self):
+        from .models import VideoProcessingJob
+
+        taken = set(VideoProcessingJob.objects.filter(slot__isnull=False).values_list('slot', flat=True))
+        free = [slot for slot in range(self.concurrency) if slot not in taken]
+        if not free:
+            return None
+        for job in VideoProcessingJob.objects.filter(status='queued').order_by('priority', 'created_at')[:5]:
+            for slot in free:
+                now = timezone.now()
+                try:
+                    # One conditional update: the job must still be queued and the slot free
+                    # (unique index), so neither a job nor the concurrency cap is ever shared
+                    with transaction.atomic():
+                        claimed = VideoProcessingJob.objects.filter(pk=job.pk, status='queued').update(
+                            status='running', slot=slot, worker=self.worker_id, started_at=now,
+                            heartbeat_at=now, attempts=F('attempts') + 1
+                        )
+                except IntegrityError:
+                    # Another process took this slot since we looked
+                    continue
+                if claimed:
+                    return job
+                # Another process took the job
+                break
+        return None
+
+    def _work(self):
+        from .models import VideoProcessingJob
+
+        while True:
+            close_old_connections()
+            try:
+                job = self._claim()
+            except Exception:
+                logger.exception("Could not claim a video processing job")
+                job = None
+
+            if job is None:
+                self._wakeup.wait(timeout=self.POLL_SECONDS)
+                self._wakeup.clear()
+                continue
+
+            result = False
+            try:
+                result = bool(self._func(job.lecture_id, kind=job.kind, quality=job.quality))
+            except Exception:
+                logger.exception("Video processing error for lecture %s", job.lecture_id)
+            finally:
+                close_old_connections()
+                VideoProcessingJob.objects.filter(pk=job.pk).update(
+                    status='completed' if result else 'failed', slot=None, finished_at=timezone.now()
+                )
+            # A slot is free again: let waiting workers (here or elsewhere) re-check
+            self._wakeup.set()
+
+    def _heartbeat(self):
+        from .models import VideoProcessingJob
+
+        while True:
+            time.sleep(self.HEARTBEAT_SECONDS)
+            close_old_connections()
+            try:
+                VideoProcessingJob.objects.filter(
+                    status='running', worker=self.worker_id
+                ).update(heartbeat_at=timezone.now())
+                self._requeue_stale()
+            except Exception:
+                logger.exception("Video queue heartbeat failed")
@@ -1,13 +1,24 @@
 import os
+import csv
+import glob
+import math
 import subprocess
 import json
 import logging
+import hashlib
+import uuid
 import threading
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
 from pathlib import Path
 from django.conf import settings
-from django.db import transaction
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+from django.db.models import Q
 from django.utils import timezone
-from .models import Lecture
+from .models import Lecture, LectureUploadSession
 import shutil
 
 logger = logging.getLogger(__name__)
@@ -18,6 +29,241 @@ local_ffprobe = os.path.join(settings.BASE_DIR, 'ffprobe')
 FFMPEG_CMD = local_ffmpeg if os.path.exists(local_ffmpeg) else (shutil.which('ffmpeg') or 'ffmpeg')
 FFPROBE_CMD = local_ffprobe if os.path.exists(local_ffprobe) else (shutil.which('ffprobe') or 'ffprobe')
 
+def encode_progress_cache_key(lecture_id):
+    return f'lecture_encode_progress_{lecture_id}'
+
+
+def get_encode_progress(lecture_id):
+    """Latest published encode progress of a lecture, or None"""
+    return cache.get(encode_progress_cache_key(lecture_id))
+
+
+class EncodeProgressReporter:
+    """
+    Publishes per-rendition encode progress (percent, fps, ETA) of one lecture
+    to the cache, parsed from ffmpeg's -progress output. Writes are throttled
+    to one per VIDEO_PROGRESS_INTERVAL seconds and never touch the database.
+    """
+
+    def __init__(self, lecture_id, total_seconds, qualities):
+        self.key = encode_progress_cache_key(lecture_id)
+        self.total_seconds = total_seconds or 0
+        self.interval = getattr(settings, 'VIDEO_PROGRESS_INTERVAL', 2)
+        self.lock = threading.Lock()
+        self.stage = 'probing'
+        self.renditions = {quality_name: {'state': 'queued', 'percent': 0.0} for quality_name in qualities}
+        self.runs = {}
+        self.fps = {}
+        self.started = time.monotonic()
+        self.published = 0
+
+    def begin(self, stage, qualities=()):
+        """Start a stage; `qualities` are the renditions this ffmpeg step writes"""
+        with self.lock:
+            self.stage = stage
+            self.runs, self.fps = {}, {}
+            self.started = time.monotonic()
+            for quality_name in qualities:
+                self.renditions[quality_name] = {'state': stage, 'percent': 0.0}
+        self.publish(force=True)
+
+    def update(self, run_key, fields):
+        """One -progress block from the ffmpeg process identified by run_key"""
+        try:
+            out_seconds = int(fields.get('out_time_us') or fields.get('out_time_ms') or 0) / 1_000_000
+        except ValueError:
+            out_seconds = 0
+        try:
+            fps = float(fields.get('fps') or 0)
+        except ValueError:
+            fps = 0.0
+        with self.lock:
+            # Chunked encodes run several processes; their positions add up to the lecture timeline
+            self.runs[run_key] = out_seconds
+            self.fps[run_key] = fps if fields.get('progress') != 'end' else 0.0
+        self.publish()
+
+    def finish(self, qualities):
+        with self.lock:
+            for quality_name in qualities:
+                self.renditions[quality_name] = {'state': 'completed', 'percent': 100.0}
+        self.publish(force=True)
+
+    def snapshot(self, status='processing'):
+        with self.lock:
+            done = sum(self.runs.values())
+            percent = min(100.0, done / self.total_seconds * 100) if self.total_seconds else 0.0
+            elapsed = time.monotonic() - self.started
+            eta = int(elapsed * (100 - percent) / percent) if percent else None
+            renditions = {}
+            for quality_name, rendition in self.renditions.items():
+                if rendition['state'] in ('queued', 'completed'):
+                    renditions[quality_name] = dict(rendition)
+                else:
+                    renditions[quality_name] = {
+                        'state': rendition['state'],
+                        'percent': round(percent, 1),
+                        'fps': round(sum(self.fps.values()), 1),
+                        'eta_seconds': eta,
+                    }
+            return {
+                'status': status,
+                'stage': self.stage,
+                'renditions': renditions,
+                'updated_at': timezone.now().isoformat(),
+            }
+
+    def publish(self, force=False, status='processing'):
+        now = time.monotonic()
+        if not force and now - self.published < self.interval:
+            return
+        self.published = now
+        try:
+            cache.set(self.key, self.snapshot(status), timeout=24 * 3600)
+        except Exception as e:
+            # Progress is best effort; never fail an encode because the cache is down
+            logger.warning(f"Could not publish encode progress: {e}")
+
+
+# Lecture fields pointing at processed output; shared as-is between duplicate uploads
+RENDITION_FIELDS = (
+    'video_360p', 'video_480p', 'video_720p', 'video_1080p', 'hls_playlist',
+    'poster_image', 'thumbnail_sprite', 'thumbnail_vtt',
+)
+
+
+def compute_content_hash(path):
+    """SHA-256 of a file, read in 1 MB chunks"""
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def link_duplicate_video(lecture):
+    """
+    If a processed lecture already has the same upload (by content hash), point
+    this lecture at its renditions and HLS playlist instead of encoding again.
+    The duplicate upload is deleted and the existing original reused.
+    Returns True if the lecture was linked.
+    """
+    if not lecture.content_hash:
+        return False
+
+    donor = Lecture.objects.filter(
+        content_hash=lecture.content_hash, processing_status='completed'
+    ).exclude(pk=lecture.pk).exclude(hls_playlist='').exclude(hls_playlist__isnull=True).order_by('id').first()
+    if not donor or not os.path.exists(donor.hls_playlist.path):
+        return False
+
+    if lecture.video_file and donor.video_file and lecture.video_file.name != donor.video_file.name:
+        lecture.video_file.delete(save=False)
+    lecture.video_file = donor.video_file.name or None
+    for field_name in RENDITION_FIELDS:
+        setattr(lecture, field_name, getattr(donor, field_name).name or None)
+    lecture.duration = donor.duration
+    lecture.file_size = donor.file_size
+    lecture.video_metadata = donor.video_metadata
+    lecture.processing_checkpoints = {}
+    lecture.processing_status = 'completed'
+    lecture.save()
+    logger.info(f"Lecture {lecture.id} is a duplicate of lecture {donor.id}; reusing its renditions")
+    return True
+
+
+def install_verified_upload(lecture):
+    """
+    Finish a chunked upload whose complete call queued this run: check the
+    assembled file against the client's SHA-256 and move it into place as
+    the lecture's video. Runs in the encode worker, so hashing a multi-GB
+    file never holds up a request. Returns False if the upload was rejected.
+    """
+    from django.core.files.storage import default_storage
+
+    upload = lecture.upload_sessions.filter(status='verifying').order_by('-updated_at').first()
+    if upload is None:
+        return True
+    part_path = os.path.join(settings.MEDIA_ROOT, upload.relative_path)
+    digest = compute_content_hash(part_path) if os.path.exists(part_path) else None
+    if digest != upload.checksum:
+        logger.warning(f"Upload {upload.id} for lecture {lecture.id} failed its checksum; discarded")
+        upload.status = 'failed'
+        upload.save(update_fields=['status', 'updated_at'])
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        # The previous video (if any) stays in place
+        lecture.processing_status = 'completed' if lecture.hls_playlist else 'failed'
+        lecture.save(update_fields=['processing_status'])
+        return False
+
+    # Move the assembled file into place instead of copying it through the storage API
+    name = default_storage.get_available_name(
+        os.path.join(Lecture._meta.get_field('video_file').upload_to, upload.filename)
+    )
+    os.replace(part_path, default_storage.path(name))
+    with transaction.atomic():
+        lecture.video_file.name = name
+        lecture.content_hash = digest
+        lecture.file_size = upload.total_size
+        lecture.save()
+        upload.status = 'completed'
+        upload.save(update_fields=['status', 'updated_at'])
+    return True
+
+
+class LectureBusy(Exception):
+    """Another worker holds the lecture's processing lease."""
+
+
+class ProcessingLease:
+    """
+    Exclusive claim on processing one lecture, so a redelivered task (broker
+    visibility timeout, duplicate enqueue) never encodes the same outputs
+    concurrently. It is taken with one conditional UPDATE and expires after
+    VIDEO_ENCODE_LEASE_SECONDS unless renewed; a background thread renews it
+    while the encode runs, so a crashed worker's lease lapses quickly.
+    """
+
+    def __init__(self, lecture_id):
+        self.lecture_id = lecture_id
+        self.seconds = getattr(settings, 'VIDEO_ENCODE_LEASE_SECONDS', 300)
+        self.token = uuid.uuid4().hex
+        self.lecture = None
+        self._stop = threading.Event()
+
+    def acquire(self):
+        now = timezone.now()
+        claimed = Lecture.objects.filter(pk=self.lecture_id).filter(
+            Q(processing_lease_until__isnull=True) | Q(processing_lease_until__lt=now) | Q(processing_lease='')
+        ).update(processing_lease=self.token, processing_lease_until=now + timedelta(seconds=self.seconds))
+        if not claimed:
+            return False
+        threading.Thread(target=self._renew, name=f'lecture-lease-{self.lecture_id}', daemon=True).start()
+        return True
+
+    def _renew(self):
+        try:
+            while not self._stop.wait(self.seconds / 3):
+                until = timezone.now() + timedelta(seconds=self.seconds)
+                Lecture.objects.filter(pk=self.lecture_id, processing_lease=self.token).update(
+                    processing_lease_until=until
+                )
+                # Full saves of the processor's instance must not write back an older expiry
+                if self.lecture is not None:
+                    self.lecture.processing_lease_until = until
+        except Exception:
+            logger.exception("Could not renew the processing lease of lecture %s", self.lecture_id)
+        finally:
+            close_old_connections()
+
+    def release(self):
+        self._stop.set()
+        Lecture.objects.filter(pk=self.lecture_id, processing_lease=self.token).update(
+            processing_lease='', processing_lease_until=None
+        )
+
+
 class UniversalVideoProcessor:
     """
     Universal video processor: Handles any format, creates 360p-1080p MP4s 
@@ -33,10 +279,23 @@ class UniversalVideoProcessor:
         '1080p': {'height': 1080, 'bitrate': '4500k', 'audio_bitrate': '192k'},
     }
 
+    # HLS segment length; encodes force a keyframe on every multiple of it (source time)
+    HLS_SEGMENT_SECONDS = 10
+
+    # Seek previews: one 160x90 tile every 10 seconds, 10x10 tiles per sprite sheet
+    PREVIEW_INTERVAL = 10
+    PREVIEW_TILE_SIZE = (160, 90)
+    PREVIEW_GRID = (10, 10)
+
     def __init__(self, lecture):
         self.lecture = lecture
         self.media_root = settings.MEDIA_ROOT
         self.lecture_id = str(lecture.id)
+        # File name stem of every output; see _choose_output_name for why it can differ from the id
+        self.output_name = f'lecture_{self.lecture_id}'
+        if lecture.hls_playlist and lecture.hls_playlist.name.endswith('_master.m3u8'):
+            self.output_name = os.path.basename(lecture.hls_playlist.name)[:-len('_master.m3u8')]
+        self.progress = None
         # Directory setup
         self.output_dir = os.path.join(self.media_root, 'lecture_videos')
         self.hls_base = os.path.join(self.output_dir, 'hls')
@@ -44,7 +303,12 @@ class UniversalVideoProcessor:
         os.makedirs(self.hls_base, exist_ok=True)
 
     def get_video_info(self, video_path):
-        """Get video duration and metadata using ffprobe"""
+        """
+        Get video duration and stream metadata using ffprobe.
+        Returns a dict with duration/size plus the first video and audio stream's
+        geometry, codecs, bitrates and frame rate (empty values if probing fails).
+        """
+        info = {'duration': 0, 'size': 0}
         try:
             cmd = [
                 FFPROBE_CMD, '-v', 'quiet', '-print_format', 'json',
@@ -53,74 +317,638 @@ class UniversalVideoProcessor:
             result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
             if result.returncode == 0:
                 data = json.loads(result.stdout)
-                duration = float(data['format'].get('duration', 0))
-                size = int(data['format'].get('size', 0))
-                return duration, size
+                info['duration'] = float(data['format'].get('duration', 0))
+                info['size'] = int(data['format'].get('size', 0))
+                info['bit_rate'] = int(data['format'].get('bit_rate', 0))
+
+                streams = data.get('streams', [])
+                video = next((st for st in streams if st.get('codec_type') == 'video'), None)
+                audio = next((st for st in streams if st.get('codec_type') == 'audio'), None)
+
+                if video:
+                    width, height = int(video.get('width', 0)), int(video.get('height', 0))
+                    # Phone recordings are often stored landscape with a rotation flag
+                    rotation = int(video.get('tags', {}).get('rotate', 0) or 0)
+                    for side_data in video.get('side_data_list', []):
+                        rotation = int(side_data.get('rotation', rotation) or 0)
+                    if abs(rotation) % 180 == 90:
+                        width, height = height, width
+
+                    num, _, den = video.get('avg_frame_rate', '0/1').partition('/')
+                    info.update({
+                        'width': width,
+                        'height': height,
+                        'video_codec': video.get('codec_name'),
+                        'pix_fmt': video.get('pix_fmt'),
+                        'video_bit_rate': int(video.get('bit_rate', 0)),
+                        'fps': round(float(num) / float(den), 3) if float(den or 0) else 0,
+                    })
+                if audio:
+                    info.update({
+                        'audio_codec': audio.get('codec_name'),
+                        'audio_bit_rate': int(audio.get('bit_rate', 0)),
+                    })
         except Exception as e:
             logger.error(f"FFprobe error: {e}")
-        return 0, 0
+        return info
+
+    def plan_renditions(self, info):
+        """
+        Pick the output ladder for a source: qualities above the source height are
+        dropped (never upscale), and a rendition is stream-copied when the source
+        already is H.264/AAC at that height within the rendition's bitrate.
+        Returns {quality_name: {'copy': bool}} ordered low to high.
+        """
+        source_height = info.get('height') or 0
+        if not source_height:
+            # Unknown geometry: keep the historical behaviour of encoding the full ladder
+            return {quality_name: {'copy': False} for quality_name in self.OUTPUT_QUALITIES}
 
-    def create_quality_version(self, input_path, output_path, config):
-        """Create a specific quality MP4 version"""
+        plan = {}
+        for quality_name, config in self.OUTPUT_QUALITIES.items():
+            if config['height'] > source_height:
+                continue
+            source_video_kbps = (info.get('video_bit_rate') or info.get('bit_rate', 0)) / 1000
+            plan[quality_name] = {
+                'copy': (
+                    config['height'] == source_height
+                    and info.get('video_codec') == 'h264'
+                    and info.get('pix_fmt') == 'yuv420p'
+                    and info.get('audio_codec') in ('aac', None)
+                    and 0 < source_video_kbps <= int(config['bitrate'].rstrip('k')) * 1.25
+                )
+            }
+
+        if not plan:
+            # Source is below the lowest rung: still produce one (360p) rendition
+            lowest = next(iter(self.OUTPUT_QUALITIES))
+            plan[lowest] = {'copy': False}
+        return plan
+
+    def keyframes_on_segment_boundaries(self, input_path, info, probe_seconds=120):
+        """
+        Whether the source has a keyframe on the first frame of every
+        HLS_SEGMENT_SECONDS boundary (checked over its first `probe_seconds`,
+        packet flags only, no decode). A stream-copied HLS variant keeps the
+        source's keyframes, so only then do its segments cut where the
+        encoded variants' forced keyframes do.
+        """
+        cmd = [
+            FFPROBE_CMD, '-v', 'quiet', '-select_streams', 'v:0', '-read_intervals', f'%+{probe_seconds}',
+            '-show_entries', 'packet=pts_time,flags', '-of', 'csv=p=0', input_path
+        ]
         try:
-            cmd = [
-                FFMPEG_CMD, '-i', input_path,
-                '-vf', f'scale=-2:{config["height"]}',
-                '-c:v', 'libx264', '-profile:v', 'main', '-level', '3.1',
-                '-b:v', config['bitrate'], '-maxrate', config['bitrate'],
-                '-bufsize', f'{int(config["bitrate"].rstrip("k")) * 2}k',
-                '-c:a', 'aac', '-b:a', config['audio_bitrate'],
-                '-preset', 'medium', '-crf', '23',
-                '-movflags', '+faststart', '-f', 'mp4', '-y', output_path
+            result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
+        except subprocess.TimeoutExpired:
+            return False
+        if result.returncode != 0:
+            return False
+        packets, keyframes = [], []
+        for line in result.stdout.splitlines():
+            pts_time, _, flags = line.partition(',')
+            if pts_time in ('', 'N/A'):
+                continue
+            packets.append(float(pts_time))
+            if 'K' in flags:
+                keyframes.append(float(pts_time))
+        if not keyframes:
+            return False
+        start, end = min(packets), max(packets)
+        frame = 1 / info['fps'] if info.get('fps') else 0.1
+        boundary = start + self.HLS_SEGMENT_SECONDS
+        while boundary <= end:
+            if not any(boundary - 0.001 <= t < boundary + frame + 0.001 for t in keyframes):
+                return False
+            boundary += self.HLS_SEGMENT_SECONDS
+        return True
+
+    def _run_ffmpeg(self, cmd, timeout, progress_key=None):
+        """
+        Run an ffmpeg command like subprocess.run. With a progress_key, ffmpeg's
+        -progress stream is parsed line by line and fed to self.progress.
+        """
+        if progress_key is None or self.progress is None:
+            return subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
+
+        cmd = [cmd[0], '-progress', 'pipe:1', '-nostats', *cmd[1:]]
+        timed_out = threading.Event()
+        # stderr goes to a file: a full pipe would stall ffmpeg while we read stdout
+        with tempfile.TemporaryFile(mode='w+') as stderr:
+            proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=stderr, text=True)
+            watchdog = threading.Timer(timeout, lambda: (timed_out.set(), proc.kill()))
+            watchdog.start()
+            try:
+                fields = {}
+                for line in proc.stdout:
+                    key, _, value = line.strip().partition('=')
+                    fields[key] = value
+                    if key == 'progress':
+                        self.progress.update(progress_key, fields)
+                        fields = {}
+                proc.wait()
+            finally:
+                watchdog.cancel()
+            if timed_out.is_set():
+                raise subprocess.TimeoutExpired(cmd, timeout)
+            stderr.seek(0)
+            return subprocess.CompletedProcess(cmd, proc.returncode, None, stderr.read())
+
+    def _video_encode_args(self, config, container='mp4', keyframe_offset=0.0):
+        """
+        x264/AAC encoder arguments shared by every rendition. `keyframe_offset`
+        is the source time of the input's first frame (a chunk of a chunked
+        encode), so forced keyframes fall on the same source times in every
+        chunk and rendition.
+        """
+        args = [
+            '-c:v', 'libx264', '-profile:v', 'main', '-level', '3.1',
+            '-b:v', config['bitrate'], '-maxrate', config['bitrate'],
+            '-bufsize', f'{int(config["bitrate"].rstrip("k")) * 2}k',
+            '-c:a', 'aac', '-b:a', config['audio_bitrate'],
+            '-preset', 'medium', '-crf', '23',
+        ]
+        if container in ('hls', 'ts'):
+            # Fixed keyframe cadence keeps segments aligned across renditions
+            segment = self.HLS_SEGMENT_SECONDS
+            first = -keyframe_offset % segment  # Input time of the first multiple of the segment length
+            args += ['-force_key_frames', f'expr:gte(t,n_forced*{segment}+{first:.3f})']
+        return args
+
+    def _container_args(self, container, quality_name, output_path):
+        """Muxer arguments for one rendition output"""
+        if container == 'hls':
+            hls_dir_path = os.path.dirname(output_path)
+            return [
+                '-start_number', '0', '-hls_time', str(self.HLS_SEGMENT_SECONDS), '-hls_list_size', '0',
+                '-hls_segment_filename', os.path.join(hls_dir_path, f'{self.output_name}_{quality_name}_%d.ts'),
+                '-f', 'hls', '-y', output_path
             ]
-            # Timeout increased to 30 mins for high-quality renders
+        if container == 'ts':
+            # Intermediate chunk output, concatenated later by stream copy
+            return ['-f', 'mpegts', '-y', output_path]
+        return ['-movflags', '+faststart', '-f', 'mp4', '-y', output_path]
+
+    def _hls_paths(self, quality_name):
+        """(directory name, playlist path) of a rendition's HLS variant"""
+        hls_dir_name = f'{self.output_name}_{quality_name}'
+        hls_dir_path = os.path.join(self.hls_base, hls_dir_name)
+        os.makedirs(hls_dir_path, exist_ok=True)
+        return hls_dir_name, os.path.join(hls_dir_path, f'{self.output_name}_{quality_name}.m3u8')
+
+    def _mp4_path(self, quality_name):
+        return os.path.join(self.output_dir, f'{self.output_name}_{quality_name}.mp4')
+
+    def create_quality_versions(self, input_path, renditions, container='mp4', copy=(), progress_key='full',
+                                previews=None, keyframe_offset=0.0):
+        """
+        Create every rendition from a single ffmpeg run.
+        The source is decoded once and fanned out with a split filter graph,
+        so each extra quality only costs its own scale + encode.
+        `renditions` maps quality name -> output path (an MP4 file, or a variant
+        playlist when container='hls'); names in `copy` are stream-copied from
+        the source instead of encoded. With `previews` (see _preview_paths) the
+        poster and sprite sheets are taken from the same decoded frames.
+        `keyframe_offset`: see _video_encode_args.
+        Returns the names written.
+        """
+        names = list(renditions)
+        if not names:
+            return []
+        encoded = [name for name in names if name not in copy]
+
+        cmd = [FFMPEG_CMD, '-i', input_path]
+        branches = len(encoded) + (2 if previews else 0)
+        if branches:
+            graph = [f'[0:v]split={branches}' + ''.join(f'[s{i}]' for i in range(branches))]
+            for i, quality_name in enumerate(encoded):
+                graph.append(f'[s{i}]scale=-2:{self.OUTPUT_QUALITIES[quality_name]["height"]}[v{i}]')
+            if previews:
+                graph += self._preview_filters(f'[s{len(encoded)}]', f'[s{len(encoded) + 1}]', previews)
+            cmd += ['-filter_complex', ';'.join(graph)]
+
+        for quality_name in names:
+            if quality_name in copy:
+                cmd += ['-map', '0:v:0', '-map', '0:a?', '-c', 'copy']
+            else:
+                cmd += [
+                    '-map', f'[v{encoded.index(quality_name)}]', '-map', '0:a?',
+                    *self._video_encode_args(self.OUTPUT_QUALITIES[quality_name], container, keyframe_offset),
+                ]
+            cmd += self._container_args(container, quality_name, renditions[quality_name])
+        if previews:
+            cmd += self._preview_output_args(previews)
+
+        try:
+            # Timeout: 30 mins per rendition for high-quality renders
+            result = self._run_ffmpeg(cmd, 1800 * len(names), progress_key)
+            if result.returncode != 0:
+                logger.error(f"Encode failed for lecture {self.lecture_id} ({', '.join(names)}): {result.stderr[-2000:]}")
+                return []
+        except subprocess.TimeoutExpired:
+            logger.error(f"Timeout processing {', '.join(names)} for lecture {self.lecture_id}")
+            return []
+
+        return [
+            name for name in names
+            if os.path.exists(renditions[name]) and os.path.getsize(renditions[name]) > 0
+        ]
+
+    def _preview_paths(self, duration=0):
+        """Output paths of the poster, sprite sheets (image2 pattern) and WebVTT track"""
+        preview_dir = os.path.join(self.output_dir, 'previews')
+        os.makedirs(preview_dir, exist_ok=True)
+        return {
+            'poster': os.path.join(preview_dir, f'{self.output_name}_poster.jpg'),
+            'sprite': os.path.join(preview_dir, f'{self.output_name}_sprite_%03d.jpg'),
+            'vtt': os.path.join(preview_dir, f'{self.output_name}_thumbnails.vtt'),
+            # Skip black intro frames without seeking past short clips
+            'poster_time': min(5.0, duration * 0.1),
+        }
+
+    def _sprite_sheets(self, previews):
+        return sorted(glob.glob(previews['sprite'].replace('%03d', '[0-9][0-9][0-9]')))
+
+    def _previews_exist(self, previews):
+        return os.path.exists(previews['poster']) and bool(self._sprite_sheets(previews))
+
+    def _preview_filters(self, poster_in, sprite_in, previews):
+        """Filter chains turning two decoded branches into [poster] and [sprite]"""
+        tile_w, tile_h = self.PREVIEW_TILE_SIZE
+        columns, rows = self.PREVIEW_GRID
+        return [
+            # First frame at or after poster_time, and nothing else
+            f"{poster_in}select='isnan(prev_selected_t)*gte(t,{previews['poster_time']:.3f})',"
+            f"scale=-2:'min(720,ih)'[poster]",
+            f'{sprite_in}fps=1/{self.PREVIEW_INTERVAL},'
+            f'scale={tile_w}:{tile_h}:force_original_aspect_ratio=decrease,'
+            f'pad={tile_w}:{tile_h}:(ow-iw)/2:(oh-ih)/2,tile={columns}x{rows}[sprite]',
+        ]
+
+    def _preview_output_args(self, previews):
+        return [
+            '-map', '[poster]', '-frames:v', '1', '-q:v', '3', '-f', 'image2', '-y', previews['poster'],
+            '-map', '[sprite]', '-q:v', '5', '-f', 'image2', '-y', previews['sprite'],
+        ]
+
+    def create_previews(self, input_path, previews):
+        """
+        Poster and sprite sheets without an encode to share the decode with
+        (chunked encodes, resumed runs). Only keyframes are decoded, which is
+        plenty for 10-second seek thumbnails.
+        """
+        graph = ['[0:v]split=2[p][t]', *self._preview_filters('[p]', '[t]', previews)]
+        cmd = [
+            FFMPEG_CMD, '-skip_frame', 'nokey', '-i', input_path,
+            '-filter_complex', ';'.join(graph), *self._preview_output_args(previews)
+        ]
+        try:
+            result = subprocess.run(cmd, capture_output=True, text=True, timeout=1800)
+            if result.returncode != 0:
+                logger.error(f"Preview generation failed for lecture {self.lecture_id}: {result.stderr[-2000:]}")
+        except subprocess.TimeoutExpired:
+            logger.error(f"Timeout generating previews for lecture {self.lecture_id}")
+        return self._previews_exist(previews)
+
+    def write_thumbnail_track(self, previews, duration):
+        """WebVTT track mapping each PREVIEW_INTERVAL of the video to its sprite tile"""
+        sheets = self._sprite_sheets(previews)
+        if not sheets or not duration:
+            return None
+
+        tile_w, tile_h = self.PREVIEW_TILE_SIZE
+        columns, rows = self.PREVIEW_GRID
+        per_sheet = columns * rows
+        cue_count = min(math.ceil(duration / self.PREVIEW_INTERVAL), len(sheets) * per_sheet)
+
+        def timestamp(seconds):
+            ms = int(round(seconds * 1000))
+            return f'{ms // 3600000:02d}:{ms // 60000 % 60:02d}:{ms // 1000 % 60:02d}.{ms % 1000:03d}'
+
+        lines = ['WEBVTT', '']
+        for i in range(cue_count):
+            start = i * self.PREVIEW_INTERVAL
+            end = min(start + self.PREVIEW_INTERVAL, duration)
+            sheet, position = divmod(i, per_sheet)
+            x, y = (position % columns) * tile_w, (position // columns) * tile_h
+            lines += [
+                f'{timestamp(start)} --> {timestamp(end)}',
+                f'{os.path.basename(sheets[sheet])}#xywh={x},{y},{tile_w},{tile_h}',
+                ''
+            ]
+        with open(previews['vtt'], 'w') as f:
+            f.write('\n'.join(lines))
+        return f'lecture_videos/previews/{os.path.basename(previews["vtt"])}'
+
+    def _work_dir(self):
+        """Scratch directory for chunked encodes of this lecture"""
+        work_dir = os.path.join(self.output_dir, 'work', f'lecture_{self.lecture_id}')
+        os.makedirs(work_dir, exist_ok=True)
+        return work_dir
+
+    def split_source(self, input_path, work_dir):
+        """
+        Cut the source into ~VIDEO_CHUNK_SECONDS pieces without re-encoding.
+        The segment muxer only cuts on keyframes, so every chunk decodes on its own
+        and chunk lengths vary; their start times go to chunks.csv (see chunk_offsets).
+        """
+        chunk_seconds = getattr(settings, 'VIDEO_CHUNK_SECONDS', 300)
+        cmd = [
+            FFMPEG_CMD, '-i', input_path,
+            '-map', '0:v:0', '-map', '0:a?', '-c', 'copy',
+            '-f', 'segment', '-segment_time', str(chunk_seconds), '-reset_timestamps', '1',
+            '-segment_list', os.path.join(work_dir, 'chunks.csv'), '-segment_list_type', 'csv',
+            '-y', os.path.join(work_dir, 'chunk_%04d.mkv')
+        ]
+        try:
             result = subprocess.run(cmd, capture_output=True, text=True, timeout=1800)
-            return result.returncode == 0
+            if result.returncode != 0:
+                logger.error(f"Splitting source failed for lecture {self.lecture_id}: {result.stderr[-2000:]}")
+                return []
         except subprocess.TimeoutExpired:
-            logger.error(f"Timeout processing {config['height']}p for lecture {self.lecture_id}")
+            logger.error(f"Timeout splitting source for lecture {self.lecture_id}")
+            return []
+        return sorted(
+            os.path.join(work_dir, name) for name in os.listdir(work_dir)
+            if name.startswith('chunk_') and name.endswith('.mkv')
+        )
+
+    def chunk_offsets(self, work_dir):
+        """{chunk path: start time in the source} from split_source's list, or None if it is missing"""
+        list_path = os.path.join(work_dir, 'chunks.csv')
+        if not os.path.exists(list_path):
+            return None
+        with open(list_path, newline='') as f:
+            return {
+                os.path.join(work_dir, os.path.basename(row[0])): float(row[1])
+                for row in csv.reader(f) if len(row) >= 2
+            }
+
+    def concat_chunks(self, chunk_outputs, output_path, container, quality_name):
+        """Join encoded chunks of one rendition into its final MP4 / HLS variant (stream copy)"""
+        list_path = f'{os.path.splitext(chunk_outputs[0])[0]}.txt'
+        with open(list_path, 'w') as f:
+            for chunk_output in chunk_outputs:
+                f.write(f"file '{chunk_output}'\n")
+
+        cmd = [FFMPEG_CMD, '-f', 'concat', '-safe', '0', '-i', list_path, '-map', '0', '-c', 'copy']
+        if container == 'mp4':
+            cmd += ['-bsf:a', 'aac_adtstoasc']
+        cmd += self._container_args(container, quality_name, output_path)
+        try:
+            result = subprocess.run(cmd, capture_output=True, text=True, timeout=1800)
+            if result.returncode != 0:
+                logger.error(f"Concat failed for lecture {self.lecture_id} {quality_name}: {result.stderr[-2000:]}")
+                return False
+        except subprocess.TimeoutExpired:
+            logger.error(f"Timeout joining {quality_name} chunks for lecture {self.lecture_id}")
             return False
+        return os.path.exists(output_path) and os.path.getsize(output_path) > 0
+
+    def create_quality_versions_chunked(self, input_path, renditions, container='mp4', copy=()):
+        """
+        Long-lecture variant of create_quality_versions: split the source at
+        keyframes, encode the chunks on VIDEO_ENCODE_WORKERS parallel ffmpeg
+        processes on this host (each chunk still single-pass across renditions),
+        then join every rendition by stream copy. Each chunk gets its own
+        timeout, so total length no longer runs into a single process budget.
+        Keyframes are forced on source time, so segments of every chunk and
+        rendition line up.
+        """
+        processed = []
+        copied = {name: path for name, path in renditions.items() if name in copy}
+        if copied:
+            if self.progress:
+                self.progress.begin('copying', copied)
+            processed += self.create_quality_versions(input_path, copied, container, copy)
+
+        encoded = [name for name in renditions if name not in copy]
+        if not encoded:
+            return processed
+
+        # Chunks survive a crashed run: reuse them only if the split finished for this very source
+        work_dir = self._work_dir()
+        marker_path = os.path.join(work_dir, 'split.done')
+        source_key = getattr(self, 'source_key', None)
+        chunks, offsets = [], None
+        if source_key and os.path.exists(marker_path):
+            with open(marker_path) as f:
+                if f.read() == source_key:
+                    chunks = sorted(
+                        os.path.join(work_dir, name) for name in os.listdir(work_dir)
+                        if name.startswith('chunk_') and name.endswith('.mkv')
+                    )
+                    offsets = self.chunk_offsets(work_dir)
+        if not chunks or offsets is None or not set(chunks) <= set(offsets):
+            if self.progress:
+                self.progress.begin('splitting')
+            # Start from a clean scratch dir so chunks of an earlier upload are never mixed in
+            shutil.rmtree(work_dir, ignore_errors=True)
+            work_dir = self._work_dir()
+            chunks = self.split_source(input_path, work_dir)
+            offsets = self.chunk_offsets(work_dir)
+            if not chunks or offsets is None or not set(chunks) <= set(offsets):
+                logger.error(f"Splitting lecture {self.lecture_id} produced no usable chunk list")
+                return processed
+            with open(marker_path, 'w') as f:
+                f.write(source_key or '')
+
+        def encode_chunk(chunk):
+            stem = os.path.splitext(chunk)[0]
+            # A chunk output only gets its final name once fully written, so existing ones are complete
+            done = [name for name in encoded if os.path.exists(f'{stem}_{name}.ts')]
+            outputs = {name: f'{stem}_{name}.ts.part' for name in encoded if name not in done}
+            for name in self.create_quality_versions(
+                chunk, outputs, 'ts', progress_key=chunk, keyframe_offset=offsets[chunk]
+            ):
+                os.replace(outputs[name], f'{stem}_{name}.ts')
+                done.append(name)
+            return done
+
+        workers = getattr(settings, 'VIDEO_ENCODE_WORKERS', None) or os.cpu_count() or 1
+        if self.progress:
+            self.progress.begin('encoding', encoded)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            # ffmpeg does the work in child processes; threads only wait on them
+            results = list(pool.map(encode_chunk, chunks))
+
+        if self.progress:
+            self.progress.begin('joining')
+        for quality_name in encoded:
+            if not all(quality_name in done for done in results):
+                logger.error(f"Some {quality_name} chunks failed for lecture {self.lecture_id}")
+                continue
+            chunk_outputs = [f'{os.path.splitext(chunk)[0]}_{quality_name}.ts' for chunk in chunks]
+            if self.concat_chunks(chunk_outputs, renditions[quality_name], container, quality_name):
+                processed.append(quality_name)
+
+        if len(processed) == len(renditions):
+            shutil.rmtree(work_dir, ignore_errors=True)
+        return processed
+
+    def _choose_output_name(self):
+        """
+        Output stem for a fresh encode. Normally lecture_<id>, but when deduplicated
+        lectures still point at this lecture's files, a new stem is used so the new
+        encode never overwrites renditions other lectures are serving.
+        """
+        output_name = f'lecture_{self.lecture_id}'
+        shared = Lecture.objects.exclude(pk=self.lecture.pk).filter(
+            Q(hls_playlist=f'lecture_videos/hls/{output_name}_master.m3u8')
+            | Q(video_360p__startswith=f'lecture_videos/{output_name}_')
+        ).exists()
+        if shared:
+            output_name = f'{output_name}_{uuid.uuid4().hex[:8]}'
+        return output_name
+
+    def _source_key(self):
+        """Identifies the uploaded original; checkpoints of another upload are discarded"""
+        stat = os.stat(self.lecture.video_file.path)
+        return f'{self.lecture.video_file.name}:{stat.st_size}:{int(stat.st_mtime)}'
+
+    def already_processed(self):
+        """
+        This upload is live already: the lecture completed from the same
+        source file and content hash, with every rendition of that run still
+        on disk. A redelivered or repeated job must not run again, since that
+        would hide the served URLs while it re-probes and re-packages them.
+        """
+        checkpoints = self.lecture.processing_checkpoints or {}
+        finished = checkpoints.get('finished')
+        if self.lecture.processing_status != 'completed' or not finished:
+            return False
+        container = 'hls' if getattr(settings, 'VIDEO_PIPELINE_MODE', 'mp4') == 'hls' else 'mp4'
+        if (
+            checkpoints.get('container') != container
+            or finished.get('content_hash') != self.lecture.content_hash
+            or checkpoints.get('source') != self._source_key()
+            or set(finished.get('renditions', [])) != set(checkpoints.get('renditions', {}))
+        ):
+            return False
+        self.output_name = checkpoints.get('output_name') or f'lecture_{self.lecture_id}'
+        return all(
+            os.path.exists(self._hls_paths(quality_name)[1] if container == 'hls' else self._mp4_path(quality_name))
+            for quality_name in finished['renditions']
+        )
+
+    def _output_is_valid(self, output_path, expected_duration):
+        """A finished rendition exists and its ffprobe duration matches the source"""
+        if not os.path.exists(output_path) or os.path.getsize(output_path) == 0:
+            return False
+        if not expected_duration:
+            return True
+        duration = self.get_video_info(output_path)['duration']
+        return abs(duration - expected_duration) <= max(1.0, expected_duration * 0.01)
+
+    def save_checkpoint(self, qualities, renditions):
+        """Persist finished renditions so a retry can skip them"""
+        if not qualities:
+            return
+        done = self.lecture.processing_checkpoints.setdefault('renditions', {})
+        for quality_name in qualities:
+            done[quality_name] = {'path': renditions[quality_name], 'completed_at': timezone.now().isoformat()}
+        self.lecture.save(update_fields=['processing_checkpoints'])
+        if self.progress:
+            self.progress.finish(qualities)
+
+    def write_master_playlist(self, qualities):
+        """Write the HLS Master Playlist (.m3u8) for the given variants"""
+        if not qualities:
+            return None
 
-    def create_hls_streams(self):
-        """Create HLS segments and Master Playlist (.m3u8)"""
         master_playlist = "#EXTM3U\n#EXT-X-VERSION:3\n"
+        for quality_name in qualities:
+            config = self.OUTPUT_QUALITIES[quality_name]
+            hls_dir_name, playlist_path = self._hls_paths(quality_name)
+            bandwidth = int(config['bitrate'].rstrip('k')) * 1000
+            master_playlist += f'#EXT-X-STREAM-INF:BANDWIDTH={bandwidth},RESOLUTION=-2x{config["height"]},NAME="{quality_name}"\n'
+            master_playlist += f'{hls_dir_name}/{os.path.basename(playlist_path)}\n'
+
+        master_filename = f'{self.output_name}_master.m3u8'
+        master_path = os.path.join(self.hls_base, master_filename)
+        with open(master_path, 'w') as f:
+            f.write(master_playlist)
+        return f'lecture_videos/hls/{master_filename}'
+
+    def create_hls_streams(self, qualities=None):
+        """Create HLS segments by remuxing the MP4 renditions, then the Master Playlist"""
         available_qualities = []
 
-        for quality_name, config in self.OUTPUT_QUALITIES.items():
-            mp4_path = os.path.join(self.output_dir, f'lecture_{self.lecture_id}_{quality_name}.mp4')
+        for quality_name in (qualities or self.OUTPUT_QUALITIES):
+            mp4_path = self._mp4_path(quality_name)
 
             if os.path.exists(mp4_path):
-                hls_dir_name = f'lecture_{self.lecture_id}_{quality_name}'
-                hls_dir_path = os.path.join(self.hls_base, hls_dir_name)
-                os.makedirs(hls_dir_path, exist_ok=True)
-
-                playlist_name = f'lecture_{self.lecture_id}_{quality_name}.m3u8'
-                playlist_path = os.path.join(hls_dir_path, playlist_name)
+                _, playlist_path = self._hls_paths(quality_name)
 
                 cmd = [
                     FFMPEG_CMD, '-i', mp4_path,
                     '-codec:', 'copy', '-start_number', '0',
-                    '-hls_time', '10', '-hls_list_size', '0',
+                    '-hls_time', str(self.HLS_SEGMENT_SECONDS), '-hls_list_size', '0',
                     '-f', 'hls', '-y', playlist_path
                 ]
 
                 try:
                     result = subprocess.run(cmd, capture_output=True, timeout=600)
                     if result.returncode == 0:
-                        bandwidth = int(config['bitrate'].rstrip('k')) * 1000
-                        master_playlist += f'#EXT-X-STREAM-INF:BANDWIDTH={bandwidth},RESOLUTION=-2x{config["height"]},NAME="{quality_name}"\n'
-                        master_playlist += f'{hls_dir_name}/{playlist_name}\n'
                         available_qualities.append(quality_name)
                 except Exception as e:
                     logger.error(f"HLS segment failed for {quality_name}: {e}")
 
-        if available_qualities:
-            master_filename = f'lecture_{self.lecture_id}_master.m3u8'
-            master_path = os.path.join(self.hls_base, master_filename)
-            with open(master_path, 'w') as f:
-                f.write(master_playlist)
-            return f'lecture_videos/hls/{master_filename}'
+        return self.write_master_playlist(available_qualities)
+
+    def existing_mp4_rendition(self, quality_name):
+        """Relative media path of the rendition's MP4 if it is on disk, else None"""
+        existing = getattr(self.lecture, f'video_{quality_name.lower()}', None)
+        if existing and os.path.exists(existing.path):
+            return existing.name
         return None
 
+    def has_hls_variant(self, quality_name):
+        return os.path.exists(self._hls_paths(quality_name)[1])
+
+    def ensure_mp4_rendition(self, quality_name):
+        """
+        Produce a downloadable MP4 for a rendition that was only packaged as
+        HLS. The segments are remuxed (stream copy), never re-encoded. Runs in
+        the job queue (a long lecture outlasts any request timeout).
+        Returns the relative media path, or None if the variant does not exist.
+        """
+        field_name = f'video_{quality_name.lower()}'
+        existing = self.existing_mp4_rendition(quality_name)
+        if existing:
+            return existing
+
+        _, playlist_path = self._hls_paths(quality_name)
+        if not os.path.exists(playlist_path):
+            return None
+
+        output_path = self._mp4_path(quality_name)
+        # Write next to the target and rename, so concurrent requests never serve a partial file
+        tmp_path = f'{output_path}.{threading.get_ident()}.part'
+        cmd = [
+            FFMPEG_CMD, '-i', playlist_path,
+            '-c', 'copy', '-bsf:a', 'aac_adtstoasc',
+            '-movflags', '+faststart', '-f', 'mp4', '-y', tmp_path
+        ]
+        try:
+            result = subprocess.run(
+                cmd, capture_output=True, text=True, timeout=getattr(settings, 'VIDEO_ENCODE_MAX_SECONDS', 6 * 3600)
+            )
+            if result.returncode != 0:
+                logger.error(f"MP4 remux failed for lecture {self.lecture_id} {quality_name}: {result.stderr[-2000:]}")
+                return None
+            os.replace(tmp_path, output_path)
+        except subprocess.TimeoutExpired:
+            logger.error(f"Timeout remuxing {quality_name} MP4 for lecture {self.lecture_id}")
+            return None
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        relative_path = f'lecture_videos/{os.path.basename(output_path)}'
+        setattr(self.lecture, field_name, relative_path)
+        self.lecture.save(update_fields=[field_name])
+        return relative_path
+
     def process_video(self):
         """Execute the full processing pipeline"""
         try:
@@ -133,38 +961,144 @@ class UniversalVideoProcessor:
                 logger.error("No video file found in lecture object")
                 return False
 
+            if self.already_processed():
+                logger.info(f"Lecture {self.lecture_id} is already processed for this upload; nothing to do")
+                return True
+
+            # Same upload already processed elsewhere: reuse it, no encode
+            if not self.lecture.content_hash:
+                self.lecture.content_hash = compute_content_hash(input_path)
+                self.lecture.save(update_fields=['content_hash'])
+            if link_duplicate_video(self.lecture):
+                return True
+
             # 1. Update status to 'processing'
-            duration, file_size = self.get_video_info(input_path)
-            self.lecture.duration = int(duration)
-            self.lecture.file_size = file_size
+            info = self.get_video_info(input_path)
+            plan = self.plan_renditions(info)
+            self.lecture.duration = int(info['duration'])
+            self.lecture.file_size = info['size']
+            self.lecture.video_metadata = {**info, 'renditions': list(plan)}
             self.lecture.processing_status = 'processing'
             self.lecture.save()
+            self.progress = EncodeProgressReporter(self.lecture_id, info['duration'], plan)
 
-            processed_qualities = []
-            
-            # 2. Generate MP4 Qualities
-            for quality_name, config in self.OUTPUT_QUALITIES.items():
-                output_filename = f'lecture_{self.lecture_id}_{quality_name}.mp4'
-                output_path = os.path.join(self.output_dir, output_filename)
-                
-                if self.create_quality_version(input_path, output_path, config):
-                    # Link to model fields
-                    field_name = f'video_{quality_name.lower()}'
-                    if hasattr(self.lecture, field_name):
-                        setattr(self.lecture, field_name, f'lecture_videos/{output_filename}')
-                    processed_qualities.append(quality_name)
+            # 'hls' packages segments straight from the encoder; MP4s are made on demand
+            container = 'hls' if getattr(settings, 'VIDEO_PIPELINE_MODE', 'mp4') == 'hls' else 'mp4'
+
+            # Resume: keep renditions a previous (crashed or retried) run already finished for this upload
+            self.source_key = self._source_key()
+            checkpoints = self.lecture.processing_checkpoints or {}
+            if checkpoints.get('source') != self.source_key or checkpoints.get('container') != container:
+                checkpoints = {
+                    'source': self.source_key, 'container': container,
+                    'output_name': self._choose_output_name(), 'renditions': {}
+                }
+            self.output_name = checkpoints.get('output_name') or f'lecture_{self.lecture_id}'
+            self.lecture.processing_checkpoints = checkpoints
+
+            renditions = {
+                quality_name: self._hls_paths(quality_name)[1] if container == 'hls' else self._mp4_path(quality_name)
+                for quality_name in plan
+            }
+            copy = {quality_name for quality_name, step in plan.items() if step['copy']}
+            if copy and container == 'hls' and not self.keyframes_on_segment_boundaries(input_path, info):
+                # A copied variant would keep the source's keyframes and switch badly against the encoded ones
+                logger.info(f"Lecture {self.lecture_id}: source keyframes miss segment boundaries; encoding every variant")
+                copy = set()
+            processed_qualities = [
+                quality_name for quality_name in plan
+                if quality_name in checkpoints['renditions']
+                and self._output_is_valid(renditions[quality_name], info['duration'])
+            ]
+            checkpoints['renditions'] = {name: checkpoints['renditions'][name] for name in processed_qualities}
+            self.lecture.save(update_fields=['processing_checkpoints'])
+            if processed_qualities:
+                logger.info(f"Resuming lecture {self.lecture_id}, already done: {processed_qualities}")
+                self.progress.finish(processed_qualities)
+
+            # Poster and seek thumbnails ride along with the single-pass encode when there is one
+            previews = self._preview_paths(info['duration'])
+            previews_done = bool(checkpoints.get('previews')) and self._previews_exist(previews)
+            if not previews_done:
+                for stale_sheet in self._sprite_sheets(previews):
+                    os.remove(stale_sheet)
+
+            # 2. Generate Qualities
+            remaining = {name: path for name, path in renditions.items() if name not in processed_qualities}
+            if remaining and info['duration'] >= getattr(settings, 'VIDEO_CHUNKED_MIN_DURATION', 1200):
+                done = self.create_quality_versions_chunked(input_path, remaining, container, copy)
+                self.save_checkpoint(done, renditions)
+                processed_qualities += done
+
+            remaining = {name: path for name, path in renditions.items() if name not in processed_qualities}
+            if remaining and getattr(settings, 'VIDEO_SINGLE_PASS_ENCODE', True):
+                self.progress.begin('encoding', remaining)
+                done = self.create_quality_versions(
+                    input_path, remaining, container, copy, previews=None if previews_done else previews
+                )
+                self.save_checkpoint(done, renditions)
+                processed_qualities += done
+                # A failed run may have left a partial sprite set behind
+                previews_done = previews_done or (len(done) == len(remaining) and self._previews_exist(previews))
+
+            # One ffmpeg process per quality for anything still missing (also the fallback if the split graph fails)
+            for quality_name in plan:
+                if quality_name not in processed_qualities:
+                    self.progress.begin('encoding', [quality_name])
+                    done = self.create_quality_versions(
+                        input_path, {quality_name: renditions[quality_name]}, container, copy
+                    )
+                    self.save_checkpoint(done, renditions)
+                    processed_qualities += done
+            processed_qualities = [quality_name for quality_name in plan if quality_name in processed_qualities]
 
             if not processed_qualities:
                 raise Exception("Failed to generate any quality versions")
 
-            # 3. Generate HLS Playlist
-            hls_path = self.create_hls_streams()
+            if not previews_done:
+                self.progress.begin('previews')
+                for stale_sheet in self._sprite_sheets(previews):
+                    os.remove(stale_sheet)
+                previews_done = self.create_previews(input_path, previews)
+            if previews_done and self.write_thumbnail_track(previews, info['duration']):
+                checkpoints['previews'] = True
+                self.lecture.save(update_fields=['processing_checkpoints'])
+            # Previews are optional: a lecture without them still plays
+            sheets = self._sprite_sheets(previews)
+            self.lecture.poster_image = (
+                f'lecture_videos/previews/{os.path.basename(previews["poster"])}' if previews_done else None
+            )
+            self.lecture.thumbnail_sprite = f'lecture_videos/previews/{os.path.basename(sheets[0])}' if sheets else None
+            self.lecture.thumbnail_vtt = (
+                f'lecture_videos/previews/{os.path.basename(previews["vtt"])}'
+                if checkpoints.get('previews') else None
+            )
+
+            # 3. Link MP4 fields and generate HLS Playlist
+            # Fields of renditions outside this run's output (e.g. from an earlier, larger upload) are cleared
+            for quality_name in self.OUTPUT_QUALITIES:
+                field_name = f'video_{quality_name.lower()}'
+                if container == 'mp4' and quality_name in processed_qualities:
+                    setattr(self.lecture, field_name, f'lecture_videos/{os.path.basename(renditions[quality_name])}')
+                else:
+                    setattr(self.lecture, field_name, None)
+                    if container == 'hls' and os.path.exists(self._mp4_path(quality_name)):
+                        # Stale MP4 from an earlier upload: downloads are remuxed from the new encode
+                        os.remove(self._mp4_path(quality_name))
+
+            self.progress.begin('packaging')
+            if container == 'hls':
+                hls_path = self.write_master_playlist(processed_qualities)
+            else:
+                hls_path = self.create_hls_streams(processed_qualities)
             if hls_path:
                 self.lecture.hls_playlist = hls_path
 
             # 4. Finish
+            checkpoints['finished'] = {'content_hash': self.lecture.content_hash, 'renditions': processed_qualities}
             self.lecture.processing_status = 'completed'
             self.lecture.save()
+            self.progress.publish(force=True, status='completed')
             logger.info(f"Processing completed for {self.lecture_id}. Qualities: {processed_qualities}")
             return True
 
@@ -172,14 +1106,34 @@ class UniversalVideoProcessor:
             logger.exception(f"Fatal error in video processing: {e}")
             self.lecture.processing_status = 'failed'
             self.lecture.save()
+            if self.progress:
+                self.progress.publish(force=True, status='failed')
             return False
 
+def prepare_mp4_download(lecture_id, quality_name):
+    """Job queue entry point: remux one HLS variant of a lecture to MP4"""
+    lecture = Lecture.objects.get(id=lecture_id)
+    return bool(UniversalVideoProcessor(lecture).ensure_mp4_rendition(quality_name))
+
+
 def process_lecture_video_universal(lecture_id):
-    """Wrapper function to be called from a background thread"""
+    """
+    Wrapper function to be called from a background thread. Raises
+    LectureBusy if another worker is already processing the lecture.
+    """
+    lease = ProcessingLease(lecture_id)
+    if not lease.acquire():
+        raise LectureBusy(lecture_id)
     try:
-        lecture = Lecture.objects.get(id=lecture_id)
-        processor = UniversalVideoProcessor(lecture)
+        # Loaded after the claim so its saves carry our lease
+        lease.lecture = Lecture.objects.get(id=lecture_id)
+        if not install_verified_upload(lease.lecture):
+            # Rejected upload: nothing to encode, and retrying cannot fix the file
+            return True
+        processor = UniversalVideoProcessor(lease.lecture)
         return processor.process_video()
     except Exception as e:
         logger.error(f"Wrapper error: {e}")
-        return False
\ No newline at end of file
+        return False
+    finally:
+        lease.release()
\ No newline at end of file
@@ -1,25 +1,47 @@
+import hashlib
 import logging
+import os
+import re
 import uuid
 from django.shortcuts import get_object_or_404
 from django.utils.text import slugify
 from django.utils import timezone
 from django.db import transaction
-from django.db.models import Q, Count, Avg, Case, When, IntegerField, Value
+from django.conf import settings
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+from django.db.models import Q, F, Count, Sum, FloatField, Value
+from django.db.models.functions import Coalesce
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 
 from rest_framework import viewsets, status, filters
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly, BasePermission, AllowAny
-from rest_framework.parsers import MultiPartParser, FormParser
-from rest_framework.exceptions import PermissionDenied
+from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
+from rest_framework.exceptions import PermissionDenied, Throttled, ValidationError
+from rest_framework.fields import BooleanField
 
-from .models import Course, Section, Lecture, Resource, Enrollment, Progress, Review
+from .models import (
+    Course, CourseStats, LeaderboardEntry, PlatformStats, Section, Lecture, LectureUploadSession,
+    Resource, Enrollment, Progress, Review
+)
 from .serializers import (
     CourseListSerializer, CourseDetailSerializer, SectionSerializer, LectureSerializer,
-    ResourceSerializer, EnrollmentSerializer, ProgressSerializer, ReviewSerializer
+    LectureUploadSessionSerializer, ResourceSerializer, EnrollmentSerializer, ProgressSerializer,
+    ReviewSerializer
 )
-from .tasks import process_lecture_video_task
+from .search import get_search_backend
+from .suggest import suggest_index
+from .facets import catalog_filters, facet_counts
+from .leaderboards import BOARDS
+from .pagination import InvalidCursor, KeysetPaginator, wants_total
+from .progress import progress_buffer, progress_report, record_progress, sync_enrollment_completion
+from .resume import resume_for_user
+from .stats import average_rating_expression, rebuild_platform_stats, stat_expression
+from .tasks import enqueue_lecture_processing, lecture_processing_priority
+from .uploads import ContentHashUploadHandler
+from core.cache import cache_response
 from users.models import CustomUser
 from categories.models import Category
 
@@ -65,6 +87,40 @@ class IsEnrolled(BasePermission):
         return Enrollment.objects.filter(user=request.user, course=course).exists()
 
 
+def _course_version(request, pk):
+    """(version, last_modified) of a course, read once per request; (None, None) if unknown."""
+    if not hasattr(request, '_course_version'):
+        request._course_version = (None, None)
+        if str(pk).isdigit():
+            request._course_version = CourseStats.objects.filter(course_id=pk).values_list(
+                'version', 'last_modified'
+            ).first() or (None, None)
+            # Live encode progress is part of the payload, so it cannot be validated by version
+            if Lecture.objects.filter(section__course_id=pk, processing_status='processing').exists():
+                request._course_version = (None, None)
+    return request._course_version
+
+
+def course_detail_etag(request, pk=None, **kwargs):
+    """Version stamp + the caller's access level (locks differ per user) + host (absolute URLs)."""
+    version, _ = _course_version(request, pk)
+    if version is None:
+        return None
+    user = request.user
+    if Course.objects.filter(pk=pk, instructor_id=user.pk).exists():
+        access = 'instructor'
+    elif Enrollment.objects.filter(course_id=pk, user_id=user.pk).exists():
+        access = 'enrolled'
+    else:
+        access = 'public'
+    host = hashlib.md5(request.get_host().encode()).hexdigest()[:8]
+    return f'"course-{pk}-v{version}-{access}-{host}"'
+
+
+def course_detail_last_modified(request, pk=None, **kwargs):
+    return _course_version(request, pk)[1]
+
+
 class CourseViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
     parser_classes = (MultiPartParser, FormParser)
@@ -82,18 +138,19 @@ class CourseViewSet(viewsets.ModelViewSet):
 
         if self.action == 'list':
             queryset = queryset.annotate(
-                avg_rating=Avg('reviews__rating'),
-                annotated_students_count=Count('enrollments', distinct=True),
-                annotated_lectures_count=Count('sections__lectures', distinct=True),
-                annotated_review_count=Count('reviews', distinct=True),
+                avg_rating=average_rating_expression(),
+                annotated_students_count=stat_expression('student_count'),
+                annotated_lectures_count=stat_expression('lecture_count'),
+                annotated_review_count=stat_expression('review_count'),
             )
         else:
-            queryset = queryset.prefetch_related(
-                'sections__lectures__resources',
+            # Curriculum comes from its stored snapshot (courses/curriculum.py), joined in here
+            queryset = queryset.select_related('curriculum').prefetch_related(
                 'reviews__student',
             ).annotate(
-                avg_rating=Avg('reviews__rating'),
-                annotated_students_count=Count('enrollments', distinct=True),
+                avg_rating=average_rating_expression(),
+                annotated_students_count=stat_expression('student_count'),
+                annotated_lectures_count=stat_expression('lecture_count'),
             )
 
         category_id = self.request.query_params.get('category')
@@ -105,6 +162,11 @@ class CourseViewSet(viewsets.ModelViewSet):
                 queryset = queryset.none()
         return queryset
 
+    @method_decorator(condition(etag_func=course_detail_etag, last_modified_func=course_detail_last_modified))
+    def retrieve(self, request, *args, **kwargs):
+        """Course detail; If-None-Match / If-Modified-Since get a 304 without serializing."""
+        return super().retrieve(request, *args, **kwargs)
+
     def perform_create(self, serializer):
         title = serializer.validated_data['title']
         base_slug = slugify(title)
@@ -201,6 +263,18 @@ class CourseViewSet(viewsets.ModelViewSet):
     def reviews(self, request, pk=None):
         course = self.get_object()
         reviews = course.reviews.all().order_by('-created_at')
+        cursor = request.query_params.get('cursor')
+        if cursor is not None:
+            keyset = KeysetPaginator(reviews, ('-created_at', '-id'), self.paginator.get_page_size(request))
+            try:
+                page, next_cursor = keyset.page(cursor)
+            except InvalidCursor:
+                return Response({'status': 'error', 'message': 'Invalid cursor.'}, status=status.HTTP_400_BAD_REQUEST)
+            data = {'status': 'success', 'next_cursor': next_cursor, 'reviews': ReviewSerializer(page, many=True).data}
+            if wants_total(request):
+                data['count'] = keyset.count()
+            return Response(data)
+
         page = self.paginate_queryset(reviews)
         if page is not None:
             serializer = ReviewSerializer(page, many=True)
@@ -250,10 +324,50 @@ class CourseViewSet(viewsets.ModelViewSet):
         })
 
 
+def _leaderboard_entries(board, category=None):
+    """Ranked entries of a board, best first; one index range scan."""
+    entries = LeaderboardEntry.objects.filter(board=board).select_related(
+        'course__instructor', 'course__category', 'course__stats'
+    ).order_by('-score', 'course_id')
+    if category:
+        try:
+            entries = entries.filter(category_id=int(category))
+        except (ValueError, TypeError):
+            entries = entries.none()
+    return entries
+
+
+def _leaderboard_course_data(entry):
+    course = entry.course
+    stats = getattr(course, 'stats', None)
+    return {
+        'id': course.id,
+        'title': course.title,
+        'slug': course.slug,
+        'thumbnail': course.thumbnail.url if course.thumbnail else None,
+        'instructor': {
+            'id': course.instructor.id,
+            'name': course.instructor.get_full_name(),
+            'profile_image': course.instructor.profile_image.url if hasattr(course.instructor, 'profile_image') and course.instructor.profile_image else None
+        },
+        'category': {
+            'id': course.category.id,
+            'name': course.category.name
+        },
+        'average_rating': stats.average_rating if stats else 0.0,
+        'review_count': stats.review_count if stats else 0,
+        'total_students': stats.student_count if stats else 0,
+        'original_price': str(course.original_price),
+        'discounted_price': str(course.discounted_price) if course.discounted_price else None,
+        'level': course.level
+    }
+
+
 @api_view(['GET'])
 @permission_classes([AllowAny])
+@cache_response('catalog')
 def top_rated_courses(request):
-    """Fetch courses with high ratings and good review counts."""
+    """Fetch courses with high ratings and good review counts (materialized top_rated board)."""
     try:
         try:
             min_reviews = int(request.GET.get('min_reviews', 5))
@@ -262,42 +376,12 @@ def top_rated_courses(request):
             min_reviews = 5
             limit = 10
 
-        courses = Course.objects.filter(
-            is_published=True
-        ).select_related('instructor', 'category').annotate(
-            review_count=Count('reviews'),
-            avg_rating=Avg('reviews__rating'),
-            total_students=Count('enrollments')
-        ).filter(
-            review_count__gte=min_reviews,
-            avg_rating__gte=4.0
-        ).order_by('-avg_rating', '-review_count')[:limit]
-
-        courses_data = []
-        for course in courses:
-            current_avg = round(float(course.avg_rating or 0), 1)
-
-            courses_data.append({
-                'id': course.id,
-                'title': course.title,
-                'slug': course.slug,
-                'thumbnail': course.thumbnail.url if course.thumbnail else None,
-                'instructor': {
-                    'id': course.instructor.id,
-                    'name': course.instructor.get_full_name(),
-                    'profile_image': course.instructor.profile_image.url if hasattr(course.instructor, 'profile_image') and course.instructor.profile_image else None
-                },
-                'category': {
-                    'id': course.category.id,
-                    'name': course.category.name
-                },
-                'average_rating': current_avg,
-                'review_count': course.review_count,
-                'total_students': course.total_students,
-                'original_price': str(course.original_price),
-                'discounted_price': str(course.discounted_price) if course.discounted_price else None,
-                'level': course.level
-            })
+        entries = _leaderboard_entries('top_rated', request.GET.get('category')).filter(
+            course__stats__review_count__gte=min_reviews,
+            # Average rating of at least 4.0
+            course__stats__rating_sum__gte=F('course__stats__review_count') * 4,
+        )[:limit]
+        courses_data = [_leaderboard_course_data(entry) for entry in entries]
 
         return Response({
             'status': 'success',
@@ -315,44 +399,56 @@ def top_rated_courses(request):
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
-def rating_statistics(request):
-    """Fetch platform-wide rating statistics in a single optimized query."""
+@cache_response('catalog')
+def course_leaderboard(request, board):
+    """Top of a materialized leaderboard (top_rated, popular, trending), optionally per category."""
+    if board not in BOARDS:
+        return Response({
+            'status': 'error',
+            'message': f"Unknown leaderboard. Choose one of: {', '.join(BOARDS)}."
+        }, status=status.HTTP_404_NOT_FOUND)
     try:
-        total_courses = Course.objects.filter(is_published=True).count()
-        total_students = Enrollment.objects.count()
+        limit = min(max(int(request.GET.get('limit', 10)), 1), 100)
+    except ValueError:
+        limit = 10
 
-        stats = Review.objects.aggregate(
-            overall_avg=Avg('rating'),
-            total_revs=Count('id')
-        )
+    courses_data = []
+    for entry in _leaderboard_entries(board, request.GET.get('category'))[:limit]:
+        course_data = _leaderboard_course_data(entry)
+        course_data['score'] = round(entry.score, 3)
+        courses_data.append(course_data)
 
-        total_reviews = stats['total_revs'] or 0
-        platform_avg_rating = round(stats['overall_avg'] or 0, 1)
+    return Response({
+        'status': 'success',
+        'board': board,
+        'count': len(courses_data),
+        'courses': courses_data
+    })
 
-        rating_data = Review.objects.values('rating').annotate(count=Count('rating'))
 
-        rating_counts = {f'{i}_star': 0 for i in range(1, 6)}
-        for item in rating_data:
-            rating_counts[f"{item['rating']}_star"] = item['count']
+@api_view(['GET'])
+@permission_classes([AllowAny])
+@cache_response('catalog')
+def rating_statistics(request):
+    """Fetch platform-wide rating statistics from the PlatformStats counters (one row)."""
+    try:
+        stats = PlatformStats.objects.filter(pk=1).first() or rebuild_platform_stats()
+        total_reviews = stats.review_count
 
+        rating_counts = stats.rating_distribution
         rating_percentages = {
             rating: round((count / total_reviews * 100), 1) if total_reviews > 0 else 0
             for rating, count in rating_counts.items()
         }
 
-        courses_with_reviews_count = Course.objects.filter(
-            is_published=True,
-            reviews__isnull=False
-        ).distinct().count()
-
         return Response({
             'status': 'success',
             'platform_statistics': {
-                'total_courses': total_courses,
+                'total_courses': stats.course_count,
                 'total_reviews': total_reviews,
-                'total_students': total_students,
-                'average_rating': platform_avg_rating,
-                'courses_with_reviews': courses_with_reviews_count
+                'total_students': stats.student_count,
+                'average_rating': stats.average_rating,
+                'courses_with_reviews': stats.reviewed_course_count
             },
             'rating_distribution': rating_counts,
             'rating_percentages': rating_percentages
@@ -395,6 +491,14 @@ class LectureViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated, IsEnrolled]
     parser_classes = (MultiPartParser, FormParser)
 
+    def initialize_request(self, request, *args, **kwargs):
+        # Fingerprint video uploads while they stream to disk (used for deduplication)
+        request.upload_handlers.insert(0, ContentHashUploadHandler(request))
+        return super().initialize_request(request, *args, **kwargs)
+
+    def _uploaded_content_hash(self):
+        return getattr(self.request, 'upload_content_hashes', {}).get('video_file', '')
+
     def get_queryset(self):
         return Lecture.objects.filter(
             section_id=self.kwargs['section_pk'],
@@ -405,9 +509,10 @@ class LectureViewSet(viewsets.ModelViewSet):
         section = get_object_or_404(Section, pk=self.kwargs['section_pk'])
         if section.course.instructor != self.request.user:
             raise PermissionDenied("Only the course instructor can add lectures.")
+        self._check_processing_backlog()
 
         with transaction.atomic():
-            lecture = serializer.save(section=section)
+            lecture = serializer.save(section=section, content_hash=self._uploaded_content_hash())
 
         self._start_video_processing(lecture)
 
@@ -416,27 +521,294 @@ class LectureViewSet(viewsets.ModelViewSet):
         if lecture_obj.section.course.instructor != self.request.user:
             raise PermissionDenied("Only the course instructor can update lectures.")
 
+        new_video = 'video_file' in self.request.FILES or 'original_video' in self.request.FILES
+        if new_video:
+            self._check_processing_backlog()
+
         with transaction.atomic():
-            lecture = serializer.save()
+            if new_video:
+                lecture = serializer.save(content_hash=self._uploaded_content_hash())
+            else:
+                lecture = serializer.save()
+
+        if new_video:
+            self._start_video_processing(lecture, reencode=True)
+
+    @action(detail=True, methods=['get'])
+    def download(self, request, course_pk=None, section_pk=None, pk=None):
+        """
+        MP4 download URL for one quality. A rendition only packaged as HLS is
+        remuxed by the job queue first; until then the response is 202 and the
+        client polls again.
+        """
+        from .tasks import enqueue_mp4_download
+        from .video_utils import UniversalVideoProcessor
+
+        lecture = self.get_object()
+        quality = request.query_params.get('quality', '720p')
+
+        if quality not in UniversalVideoProcessor.OUTPUT_QUALITIES:
+            return Response({
+                'status': 'error',
+                'message': f"quality must be one of: {', '.join(UniversalVideoProcessor.OUTPUT_QUALITIES)}"
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        if lecture.processing_status != 'completed':
+            return Response({
+                'status': 'error',
+                'message': 'Video is not ready yet',
+                'processing_status': lecture.processing_status
+            }, status=status.HTTP_409_CONFLICT)
+
+        processor = UniversalVideoProcessor(lecture)
+        if processor.existing_mp4_rendition(quality):
+            return Response({
+                'status': 'success',
+                'quality': quality,
+                'ready': True,
+                'download_url': request.build_absolute_uri(getattr(lecture, f'video_{quality}').url)
+            })
+
+        if not processor.has_hls_variant(quality):
+            return Response({
+                'status': 'error',
+                'message': f'{quality} is not available for this lecture'
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        enqueue_mp4_download(lecture.id, quality)
+        return Response({
+            'status': 'success',
+            'quality': quality,
+            'ready': False,
+            'message': 'The download is being prepared; try again shortly',
+            'download_url': None
+        }, status=status.HTTP_202_ACCEPTED, headers={'Retry-After': '30'})
+
+    @action(detail=True, methods=['get'])
+    def processing_status(self, request, course_pk=None, section_pk=None, pk=None):
+        """Live encode progress (stage, per-rendition percent, fps, ETA) of a lecture."""
+        from .video_utils import get_encode_progress
+
+        lecture = self.get_object()
+        return Response({
+            'status': 'success',
+            'lecture_id': lecture.id,
+            'processing_status': lecture.processing_status,
+            'progress': get_encode_progress(lecture.id)
+        })
 
-        if 'video_file' in self.request.FILES or 'original_video' in self.request.FILES:
-            self._start_video_processing(lecture)
+    def _check_processing_backlog(self):
+        """Backpressure: refuse new uploads while the encode queue is full."""
+        if 'video_file' not in self.request.FILES and 'original_video' not in self.request.FILES:
+            return
+        _check_processing_backlog()
 
-    def _start_video_processing(self, lecture):
-        """Dispatch video processing to Celery if a video file exists."""
-        video_exists = (hasattr(lecture, 'video_file') and lecture.video_file) or \
-                       (hasattr(lecture, 'original_video') and lecture.original_video)
+    def _start_video_processing(self, lecture, reencode=False):
+        _start_video_processing(lecture, reencode=reencode)
 
-        if video_exists:
-            lecture.processing_status = 'processing'
-            lecture.save()
 
-            transaction.on_commit(lambda: process_lecture_video_task.delay(lecture.id))
+def _check_processing_backlog():
+    max_pending = getattr(settings, 'VIDEO_QUEUE_MAX_PENDING', 50)
+    if Lecture.objects.filter(processing_status='processing').count() >= max_pending:
+        raise Throttled(wait=300, detail='Video processing queue is full. Please retry the upload later.')
 
-            logger.info("Video processing task dispatched for lecture: %s", lecture.title)
-        else:
-            lecture.processing_status = 'ready'
-            lecture.save()
+
+def _start_video_processing(lecture, reencode=False):
+    """Queue video processing (Celery or the local encode queue) if a video file exists."""
+    video_exists = (hasattr(lecture, 'video_file') and lecture.video_file) or \
+                   (hasattr(lecture, 'original_video') and lecture.original_video)
+
+    if video_exists:
+        from .video_utils import link_duplicate_video
+        if link_duplicate_video(lecture):
+            logger.info("Duplicate upload for lecture %s; reused existing renditions", lecture.title)
+            return
+
+        lecture.processing_status = 'processing'
+        lecture.save()
+
+        priority = lecture_processing_priority(lecture, reencode=reencode)
+        transaction.on_commit(lambda: enqueue_lecture_processing(lecture.id, priority))
+
+        logger.info("Video processing task dispatched for lecture: %s", lecture.title)
+    else:
+        lecture.processing_status = 'ready'
+        lecture.save()
+
+
+class LectureUploadSessionViewSet(viewsets.GenericViewSet):
+    """
+    Chunked, resumable lecture video uploads.
+
+    POST   .../upload-sessions/                 -> open a session (filename, total_size, checksum)
+    GET    .../upload-sessions/<id>/            -> current offset, to resume after a reconnect
+    PUT    .../upload-sessions/<id>/            -> raw bytes, "Content-Range: bytes start-end/total"
+    POST   .../upload-sessions/<id>/complete/   -> 202; SHA-256 check and processing run in the background
+    DELETE .../upload-sessions/<id>/            -> abort and discard the partial file
+    """
+    serializer_class = LectureUploadSessionSerializer
+    permission_classes = [IsAuthenticated]
+    parser_classes = (JSONParser, FormParser, MultiPartParser)
+
+    CONTENT_RANGE_RE = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+    STREAM_CHUNK_SIZE = 64 * 1024
+
+    def get_queryset(self):
+        return LectureUploadSession.objects.filter(
+            lecture_id=self.kwargs['lecture_pk'],
+            lecture__section_id=self.kwargs['section_pk'],
+            lecture__section__course_id=self.kwargs['course_pk'],
+            uploaded_by=self.request.user
+        ).select_related('lecture')
+
+    def _part_path(self, upload):
+        return os.path.join(settings.MEDIA_ROOT, upload.relative_path)
+
+    def create(self, request, course_pk=None, section_pk=None, lecture_pk=None):
+        lecture = get_object_or_404(
+            Lecture.objects.select_related('section__course'),
+            pk=lecture_pk, section_id=section_pk, section__course_id=course_pk
+        )
+        if lecture.section.course.instructor != request.user:
+            raise PermissionDenied("Only the course instructor can upload lecture videos.")
+
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        upload = serializer.save(lecture=lecture, uploaded_by=request.user)
+
+        part_path = self._part_path(upload)
+        os.makedirs(os.path.dirname(part_path), exist_ok=True)
+        open(part_path, 'wb').close()
+
+        return Response(self.get_serializer(upload).data, status=status.HTTP_201_CREATED)
+
+    def retrieve(self, request, course_pk=None, section_pk=None, lecture_pk=None, pk=None):
+        return Response(self.get_serializer(self.get_object()).data)
+
+    def append(self, request, course_pk=None, section_pk=None, lecture_pk=None, pk=None):
+        """Stream one byte range straight to the partial file; never buffered in memory."""
+        upload = self.get_object()
+        if upload.status != 'uploading':
+            return Response({
+                'status': 'error',
+                'message': f'Upload session is {upload.status}'
+            }, status=status.HTTP_409_CONFLICT)
+
+        match = self.CONTENT_RANGE_RE.match(request.META.get('HTTP_CONTENT_RANGE', ''))
+        if not match:
+            return Response({
+                'status': 'error',
+                'message': 'Content-Range header "bytes start-end/total" is required'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        start, end, total = (int(g) for g in match.groups())
+        length = end - start + 1
+        max_chunk = getattr(settings, 'VIDEO_UPLOAD_CHUNK_MAX_BYTES', 64 * 1024 * 1024)
+        if total != upload.total_size or length <= 0 or end >= total or length > max_chunk:
+            return Response({
+                'status': 'error',
+                'message': f'Invalid range; chunks must lie within {upload.total_size} bytes and not exceed {max_chunk} bytes'
+            }, status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+
+        # Only the next byte range is accepted; a client that lost its place resumes from received_bytes
+        if start != upload.received_bytes:
+            return Response({
+                'status': 'error',
+                'message': 'Chunk does not start at the current offset',
+                'received_bytes': upload.received_bytes
+            }, status=status.HTTP_409_CONFLICT)
+
+        written = 0
+        with open(self._part_path(upload), 'r+b') as f:
+            f.seek(start)
+            while written < length:
+                data = request.stream.read(min(self.STREAM_CHUNK_SIZE, length - written)) if request.stream else b''
+                if not data:
+                    break
+                f.write(data)
+                written += len(data)
+
+        if written != length:
+            return Response({
+                'status': 'error',
+                'message': f'Expected {length} bytes, received {written}',
+                'received_bytes': upload.received_bytes
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        # Conditional update: a duplicate (retried) chunk racing this one cannot move the offset twice
+        updated = LectureUploadSession.objects.filter(
+            pk=upload.pk, status='uploading', received_bytes=start
+        ).update(received_bytes=end + 1, updated_at=timezone.now())
+        upload.refresh_from_db(fields=['received_bytes', 'status', 'updated_at'])
+        if not updated:
+            return Response({
+                'status': 'error',
+                'message': 'Chunk does not start at the current offset',
+                'received_bytes': upload.received_bytes
+            }, status=status.HTTP_409_CONFLICT)
+
+        return Response(self.get_serializer(upload).data)
+
+    def complete(self, request, course_pk=None, section_pk=None, lecture_pk=None, pk=None):
+        """
+        Hand the assembled file to the lecture's video processing. The SHA-256
+        check and the move into place run in the encode worker (a multi-GB hash
+        would outlast the request); the session reports 'verifying' until then,
+        and 'completed' or 'failed' after.
+        """
+        upload = self.get_object()
+        if upload.status != 'uploading':
+            return Response({
+                'status': 'error',
+                'message': f'Upload session is {upload.status}'
+            }, status=status.HTTP_409_CONFLICT)
+
+        if upload.received_bytes != upload.total_size:
+            return Response({
+                'status': 'error',
+                'message': 'Upload is incomplete',
+                'received_bytes': upload.received_bytes,
+                'total_size': upload.total_size
+            }, status=status.HTTP_409_CONFLICT)
+
+        _check_processing_backlog()
+
+        # Conditional update: a repeated complete call cannot queue the upload twice
+        if not LectureUploadSession.objects.filter(pk=upload.pk, status='uploading').update(
+            status='verifying', updated_at=timezone.now()
+        ):
+            upload.refresh_from_db(fields=['status'])
+            return Response({
+                'status': 'error',
+                'message': f'Upload session is {upload.status}'
+            }, status=status.HTTP_409_CONFLICT)
+        upload.refresh_from_db(fields=['status', 'updated_at'])
+
+        lecture = upload.lecture
+        lecture.processing_status = 'processing'
+        lecture.save(update_fields=['processing_status'])
+        priority = lecture_processing_priority(lecture, reencode=bool(lecture.video_file), size=upload.total_size)
+        transaction.on_commit(lambda: enqueue_lecture_processing(lecture.id, priority))
+
+        return Response({
+            'status': 'success',
+            'lecture_id': lecture.id,
+            'processing_status': lecture.processing_status,
+            'upload': self.get_serializer(upload).data
+        }, status=status.HTTP_202_ACCEPTED)
+
+    def destroy(self, request, course_pk=None, section_pk=None, lecture_pk=None, pk=None):
+        upload = self.get_object()
+        if upload.status == 'verifying':
+            return Response({
+                'status': 'error',
+                'message': 'Upload session is being verified'
+            }, status=status.HTTP_409_CONFLICT)
+        part_path = self._part_path(upload)
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        upload.delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
 
 class ResourceViewSet(viewsets.ModelViewSet):
@@ -470,53 +842,17 @@ class EnrollmentViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
+        # progress_percentage comes from the enrollment's own counters
         return Enrollment.objects.filter(user=self.request.user).select_related(
             'course', 'course__instructor', 'course__category'
-        ).prefetch_related('progress')
+        )
 
     @action(detail=False, methods=['get'])
     def continue_learning(self, request):
-        """Fetch in-progress courses with detailed progress for resume functionality."""
-        enrollments = self.get_queryset().filter(completed=False).order_by('-last_accessed')
-
-        response_data = []
-        for enrollment in enrollments:
-            last_progress = enrollment.progress.filter(completed=False).order_by('-updated_at').first()
-
-            next_lecture = None
-            for section in enrollment.course.sections.all().order_by('order'):
-                for lecture in section.lectures.all().order_by('order'):
-                    prog_exists = any(p.lecture_id == lecture.id and p.completed for p in enrollment.progress.all())
-                    if not prog_exists:
-                        next_lecture = lecture
-                        break
-                if next_lecture:
-                    break
-
-            enrollment_data = EnrollmentSerializer(enrollment, context={'request': request}).data
-
-            total_completed = enrollment.progress.filter(completed=True).count()
-            total_lectures_count = sum(section.lectures.count() for section in enrollment.course.sections.all())
-
-            enrollment_data['continue_learning'] = {
-                'next_lecture': {
-                    'id': next_lecture.id if next_lecture else None,
-                    'title': next_lecture.title if next_lecture else None,
-                    'duration': next_lecture.duration if next_lecture else None,
-                    'duration_display': f"{next_lecture.duration//60}:{next_lecture.duration%60:02d}" if next_lecture else None,
-                } if next_lecture else None,
-                'last_watched_lecture': {
-                    'id': last_progress.lecture.id if last_progress else None,
-                    'title': last_progress.lecture.title if last_progress else None,
-                    'last_position': last_progress.last_position if last_progress else None,
-                    'completed': last_progress.completed if last_progress else False,
-                } if last_progress else None,
-                'total_completed_lectures': total_completed,
-                'total_lectures': total_lectures_count,
-            }
-
-            response_data.append(enrollment_data)
-
+        """Fetch in-progress courses with their next and last-watched lectures for resume functionality."""
+        response_data = resume_for_user(
+            request, self.get_queryset().filter(completed=False).order_by('-last_accessed')
+        )
         return Response({
             'status': 'success',
             'count': len(response_data),
@@ -538,92 +874,71 @@ class ProgressViewSet(viewsets.ModelViewSet):
         if not course_id:
             return Response({'status': 'error', 'message': 'course_id is required'}, status=400)
 
-        enrollment = get_object_or_404(
-            Enrollment.objects.select_related('course').prefetch_related(
-                'course__sections',
-                'course__sections__lectures',
-                'progress'
-            ),
-            user=request.user,
-            course_id=course_id
-        )
+        enrollment = get_object_or_404(Enrollment, user=request.user, course_id=course_id)
 
-        sections_data = []
-        total_lectures = 0
-        completed_lectures = 0
-        total_duration = 0
-        watched_duration = 0
-
-        all_progress = {p.lecture_id: p for p in enrollment.progress.all()}
-
-        for section in enrollment.course.sections.all().order_by('order'):
-            section_lectures = []
-            section_completed = 0
-            section_duration = 0
-            section_watched = 0
-            lectures = section.lectures.all().order_by('order')
-            section_total = lectures.count()
-
-            for lecture in lectures:
-                prog_obj = all_progress.get(lecture.id)
-                is_done = prog_obj.completed if prog_obj else False
-
-                section_lectures.append({
-                    'id': lecture.id,
-                    'title': lecture.title,
-                    'duration': lecture.duration,
-                    'completed': is_done,
-                    'last_position': prog_obj.last_position if prog_obj else 0,
-                    'updated_at': prog_obj.updated_at.isoformat() if prog_obj else None
-                })
+        return Response({
+            'status': 'success',
+            'data': progress_report(enrollment)
+        })
 
-                total_lectures += 1
-                total_duration += lecture.duration
-                section_duration += lecture.duration
-
-                if is_done:
-                    completed_lectures += 1
-                    section_completed += 1
-                    watched_duration += lecture.duration
-                    section_watched += lecture.duration
-                elif prog_obj:
-                    watched_duration += min(prog_obj.last_position / 60, lecture.duration)
-                    section_watched += min(prog_obj.last_position / 60, lecture.duration)
-
-            sections_data.append({
-                'id': section.id,
-                'title': section.title,
-                'lectures': section_lectures,
-                'completed_lectures': section_completed,
-                'total_lectures': section_total,
-                'progress_percentage': round((section_completed / section_total * 100), 1) if section_total > 0 else 0,
-                'total_duration': section_duration,
-                'watched_duration': round(section_watched, 1)
-            })
+    @action(detail=False, methods=['post'])
+    def heartbeat(self, request):
+        """
+        Batched playback positions: {"updates": [{"lecture_id": 3, "last_position": 120}, ...]}.
+        Positions are buffered and written in bulk every few seconds; an update with
+        "completed" is written immediately, like update_progress.
+        """
+        updates = request.data.get('updates')
+        max_updates = getattr(settings, 'PROGRESS_HEARTBEAT_MAX_UPDATES', 100)
+        if not isinstance(updates, list) or not updates or len(updates) > max_updates:
+            return Response({
+                'status': 'error',
+                'message': f'updates must be a list of 1 to {max_updates} items.'
+            }, status=status.HTTP_400_BAD_REQUEST)
 
-        progress_percentage = min(round((completed_lectures / total_lectures * 100), 1) if total_lectures > 0 else 0, 100.0)
+        # Last update per lecture wins
+        latest = {}
+        try:
+            for update in updates:
+                completed = update.get('completed')
+                latest[int(update['lecture_id'])] = (
+                    max(int(update.get('last_position', 0)), 0),
+                    None if completed is None else BooleanField().to_internal_value(completed)
+                )
+        except (KeyError, TypeError, ValueError, AttributeError, ValidationError):
+            return Response({
+                'status': 'error',
+                'message': 'Each update needs an integer lecture_id and last_position, and completed must be a boolean.'
+            }, status=status.HTTP_400_BAD_REQUEST)
 
-        if progress_percentage >= 100:
-            if not enrollment.completed:
-                enrollment.completed = True
-                enrollment.completed_at = timezone.now()
-                enrollment.save()
-        else:
-            if enrollment.completed:
-                enrollment.completed = False
-                enrollment.completed_at = None
-                enrollment.save()
+        lecture_courses = dict(
+            Lecture.objects.filter(pk__in=latest).values_list('pk', 'section__course_id')
+        )
+        enrollments = {
+            enrollment.course_id: enrollment for enrollment in
+            Enrollment.objects.filter(user=request.user, course_id__in=set(lecture_courses.values()))
+        }
+
+        accepted, completions, rejected = 0, [], []
+        for lecture_id, (last_position, completed) in latest.items():
+            enrollment = enrollments.get(lecture_courses.get(lecture_id))
+            if enrollment is None:
+                rejected.append(lecture_id)
+            elif completed is not None:
+                record_progress(enrollment, lecture_id, completed, last_position)
+                completions.append({'lecture_id': lecture_id, 'completed': completed,
+                                    'course_completed': enrollment.completed})
+            else:
+                progress_buffer.add(enrollment.pk, lecture_id, last_position)
+                accepted += 1
 
         return Response({
             'status': 'success',
             'data': {
-                'course_id': enrollment.course.id,
-                'progress_percentage': progress_percentage,
-                'total_lectures': total_lectures,
-                'completed_lectures': completed_lectures,
-                'total_duration': total_duration,
-                'watched_duration': round(watched_duration, 1),
-                'sections': sections_data
+                'buffered': accepted,
+                'completions': completions,
+                'rejected_lecture_ids': rejected,
+                'flush_interval': progress_buffer.interval
             }
         })
 
@@ -631,7 +946,12 @@ class ProgressViewSet(viewsets.ModelViewSet):
     def update_progress(self, request, pk=None):
         """Update lecture progress with atomic transaction for data safety."""
         progress = self.get_object()
-        completed = request.data.get('completed', progress.completed)
+        try:
+            # Form posts send "False"/"0"; only a real bool may reach the completion counters
+            completed = BooleanField().to_internal_value(request.data.get('completed', progress.completed))
+        except ValidationError:
+            return Response({'status': 'error', 'message': 'completed must be a boolean.'},
+                            status=status.HTTP_400_BAD_REQUEST)
         last_position = request.data.get('last_position', progress.last_position)
 
         try:
@@ -641,21 +961,8 @@ class ProgressViewSet(viewsets.ModelViewSet):
                 progress.save()
 
                 enrollment = progress.enrollment
-                enrollment.last_accessed = timezone.now()
-
-                total_lectures = Lecture.objects.filter(section__course=enrollment.course).count()
-                completed_count = Progress.objects.filter(enrollment=enrollment, completed=True).count()
-
-                if total_lectures > 0 and completed_count >= total_lectures:
-                    if not enrollment.completed:
-                        enrollment.completed = True
-                        enrollment.completed_at = timezone.now()
-                else:
-                    if enrollment.completed:
-                        enrollment.completed = False
-                        enrollment.completed_at = None
-
-                enrollment.save()
+                progress_buffer.discard(enrollment.pk, progress.lecture_id)
+                sync_enrollment_completion(enrollment)
 
             return Response({
                 'status': 'success',
@@ -671,68 +978,83 @@ class ProgressViewSet(viewsets.ModelViewSet):
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
+@cache_response('catalog')
 def home_page_courses(request):
     """Home page API with sorting, filtering, and pagination."""
     try:
         page = request.GET.get('page', 1)
         page_size = min(int(request.GET.get('page_size', 12)), 50)
-        category = request.GET.get('category')
-        level = request.GET.get('level')
         search = request.GET.get('search')
         sort_by = request.GET.get('sort', 'newest')
 
         courses = Course.objects.filter(is_published=True).select_related(
             'instructor', 'category'
         ).annotate(
-            total_students=Count('enrollments', distinct=True),
-            avg_rating=Avg('reviews__rating')
+            total_students=stat_expression('student_count'),
+            avg_rating=average_rating_expression()
+        ).annotate(
+            # Non-null sort keys for keyset pagination
+            sort_rating=Coalesce('avg_rating', Value(0.0), output_field=FloatField()),
+            sort_price=Coalesce('discounted_price', 'original_price'),
         )
 
-        if category:
-            courses = courses.filter(category__name__icontains=category)
-        if level:
-            courses = courses.filter(level__iexact=level)
-
-        try:
-            if request.GET.get('price_min'):
-                courses = courses.filter(discounted_price__gte=float(request.GET.get('price_min')))
-            if request.GET.get('price_max'):
-                courses = courses.filter(discounted_price__lte=float(request.GET.get('price_max')))
-        except (ValueError, TypeError):
-            pass
-
         if search:
-            courses = courses.filter(_course_search_q(search))
-            courses = courses.annotate(_search_rank=_udemy_search_rank_case(search))
-            sort_map = {
-                'newest': ('_search_rank', '-created_at'),
-                'oldest': ('_search_rank', 'created_at'),
-                'price_low': ('_search_rank', 'discounted_price'),
-                'price_high': ('_search_rank', '-discounted_price'),
-                'rating': ('_search_rank', '-avg_rating'),
-                'popular': ('_search_rank', '-total_students'),
-                'relevance': ('_search_rank', '-total_students', '-avg_rating'),
-            }
-            courses = courses.order_by(*sort_map.get(sort_by, sort_map['relevance']))
+            courses = get_search_backend().filter_courses(courses, search)
+
+        # Category (ids or exact names, comma-separated), level, price_min/max, min_rating
+        filters = catalog_filters(request.GET)
+        facets = None
+        if request.GET.get('facets', '').lower() in ('1', 'true', 'yes'):
+            facets = facet_counts(courses, filters)
+        for q in filters.values():
+            courses = courses.filter(q)
+
+        # Every ordering ends in id so rows with equal keys page deterministically
+        sort_map = {
+            'newest': ('-created_at', '-id'),
+            'oldest': ('created_at', 'id'),
+            'price_low': ('sort_price', 'id'),
+            'price_high': ('-sort_price', '-id'),
+            'rating': ('-sort_rating', '-id'),
+            'popular': ('-total_students', '-id'),
+        }
+        if search:
+            sort_map = {name: ('-search_score',) + ordering for name, ordering in sort_map.items()}
+            sort_map['relevance'] = ('-search_score', '-total_students', '-sort_rating', '-id')
+            ordering = sort_map.get(sort_by, sort_map['relevance'])
         else:
-            sort_map = {
-                'newest': '-created_at',
-                'oldest': 'created_at',
-                'price_low': 'discounted_price',
-                'price_high': '-discounted_price',
-                'rating': '-avg_rating',
-                'popular': '-total_students',
-            }
-            courses = courses.order_by(sort_map.get(sort_by, '-created_at'))
+            ordering = sort_map.get(sort_by, sort_map['newest'])
 
-        paginator = Paginator(courses, page_size)
-        try:
-            page_obj = paginator.page(page)
-        except (PageNotAnInteger, EmptyPage):
-            page_obj = paginator.page(1)
+        keyset = KeysetPaginator(courses, ordering, page_size)
+        cursor = request.GET.get('cursor')
+        if cursor is not None:
+            # Infinite scroll: no COUNT, no OFFSET
+            try:
+                page_courses, next_cursor = keyset.page(cursor)
+            except InvalidCursor:
+                return Response({'status': 'error', 'message': 'Invalid cursor.'}, status=400)
+            pagination = {'next_cursor': next_cursor, 'has_next': next_cursor is not None, 'page_size': page_size}
+            if wants_total(request):
+                pagination['total_courses'] = keyset.count()
+        else:
+            paginator = Paginator(keyset.queryset, page_size)
+            try:
+                page_obj = paginator.page(page)
+            except (PageNotAnInteger, EmptyPage):
+                page_obj = paginator.page(1)
+            page_courses = list(page_obj)
+            pagination = {
+                'current_page': page_obj.number,
+                'total_pages': paginator.num_pages,
+                'total_courses': paginator.count,
+                'has_next': page_obj.has_next(),
+                'has_previous': page_obj.has_previous(),
+                # Lets clients switch to cursor pages after the first numbered one
+                'next_cursor': keyset.encode(page_courses[-1]) if page_obj.has_next() else None,
+            }
 
         courses_data = []
-        for course in page_obj:
+        for course in page_courses:
             courses_data.append({
                 'id': course.id,
                 'title': course.title,
@@ -752,18 +1074,15 @@ def home_page_courses(request):
                 'created_at': course.created_at.isoformat(),
             })
 
+        data = {
+            'courses': courses_data,
+            'pagination': pagination
+        }
+        if facets is not None:
+            data['facets'] = facets
         return Response({
             'status': 'success',
-            'data': {
-                'courses': courses_data,
-                'pagination': {
-                    'current_page': page_obj.number,
-                    'total_pages': paginator.num_pages,
-                    'total_courses': paginator.count,
-                    'has_next': page_obj.has_next(),
-                    'has_previous': page_obj.has_previous(),
-                }
-            }
+            'data': data
         })
 
     except Exception as e:
@@ -771,90 +1090,21 @@ def home_page_courses(request):
         return Response({'status': 'error', 'message': 'Could not load courses.'}, status=500)
 
 
-def _single_keyword_course_q(keyword):
-    """One keyword: course text + instructor name/headline + category (Udemy-style breadth)."""
-    if not keyword:
-        return Q(pk=0)  # no match
-    return (
-        Q(title__icontains=keyword) |
-        Q(description__icontains=keyword) |
-        Q(learning_objectives__icontains=keyword) |
-        Q(requirements__icontains=keyword) |
-        Q(target_audience__icontains=keyword) |
-        Q(instructor__first_name__icontains=keyword) |
-        Q(instructor__last_name__icontains=keyword) |
-        Q(instructor__username__icontains=keyword) |
-        Q(instructor__headline__icontains=keyword) |
-        Q(category__name__icontains=keyword) |
-        Q(category__description__icontains=keyword)
-    )
-
-
-def _udemy_search_rank_case(search_text):
-    """Relevance: 0 best — order_by this field ascending. Title first, then instructor name."""
-    q = (search_text or '').strip()
-    if not q:
-        return Value(99)
-    tokens = [t for t in q.split() if t]
-    whens = [
-        When(title__istartswith=q, then=Value(0)),
-        When(title__icontains=q, then=Value(1)),
-    ]
-    if len(tokens) >= 2:
-        whens.append(
-            When(
-                Q(instructor__first_name__icontains=tokens[0])
-                & Q(instructor__last_name__icontains=tokens[-1]),
-                then=Value(2),
-            )
-        )
-        inst_rank = 3
-    else:
-        inst_rank = 2
-    whens.append(
-        When(
-            Q(instructor__first_name__icontains=q)
-            | Q(instructor__last_name__icontains=q)
-            | Q(instructor__username__icontains=q)
-            | Q(instructor__headline__icontains=q),
-            then=Value(inst_rank),
-        )
-    )
-    cat_rank = inst_rank + 1
-    whens.append(When(category__name__icontains=q, then=Value(cat_rank)))
-    return Case(*whens, default=Value(cat_rank + 1), output_field=IntegerField())
-
-
-def _course_search_q(text):
-    """OR across words: e.g. 'music theory' matches category Music OR title with Theory."""
-    if not text:
-        return Q()
-    tokens = [t.strip() for t in text.split() if t.strip()]
-    if not tokens:
-        return Q()
-    if len(tokens) == 1:
-        return _single_keyword_course_q(tokens[0])
-    q = Q()
-    any_token = False
-    for token in tokens:
-        q |= _single_keyword_course_q(token)
-        any_token = True
-    if not any_token:
-        return _single_keyword_course_q(text.strip())
-    return q
-
-
-def _category_tokens_q(text):
-    """Categories whose name or description matches any word in text."""
-    if not text:
-        return Q(pk=0)
-    tokens = [t.strip() for t in text.split() if t.strip()]
-    if not tokens:
-        return Q(name__icontains=text) | Q(description__icontains=text)
-    q = Q()
-    for token in tokens:
-        q |= Q(name__icontains=token) | Q(description__icontains=token)
-    return q
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def search_suggest(request):
+    """Search-as-you-type: courses, instructors and categories whose name starts with q (any word)."""
+    query = request.GET.get('q', '').strip()
+    try:
+        limit = min(max(int(request.GET.get('limit', 8)), 1), 20)
+    except (ValueError, TypeError):
+        limit = 8
+
+    return Response({
+        'status': 'success',
+        'query': query,
+        'suggestions': suggest_index.suggest(query, limit) if query else []
+    })
 
 
 @api_view(['GET'])
@@ -894,8 +1144,8 @@ def global_search(request):
         courses_qs = Course.objects.filter(is_published=True).select_related(
             'instructor', 'category'
         ).annotate(
-            total_students=Count('enrollments', distinct=True),
-            avg_rating=Avg('reviews__rating')
+            total_students=stat_expression('student_count'),
+            avg_rating=average_rating_expression()
         )
 
         if category_id is not None:
@@ -903,10 +1153,10 @@ def global_search(request):
         if category_name_filter:
             courses_qs = courses_qs.filter(category__name__icontains=category_name_filter)
 
+        search_backend = get_search_backend()
         if query:
-            courses_qs = courses_qs.filter(_course_search_q(query))
-            courses_qs = courses_qs.annotate(_search_rank=_udemy_search_rank_case(query)).order_by(
-                '_search_rank', '-total_students', '-avg_rating'
+            courses_qs = search_backend.filter_courses(courses_qs, query).order_by(
+                '-search_score', '-total_students', '-avg_rating'
             )
         else:
             courses_qs = courses_qs.order_by('-total_students', '-avg_rating')
@@ -915,33 +1165,14 @@ def global_search(request):
 
         instructors_data = []
         if query:
-            query_tokens = [t for t in query.split() if t]
-            instructor_match_q = (
-                Q(first_name__icontains=query) |
-                Q(last_name__icontains=query) |
-                Q(expertise__icontains=query) |
-                Q(username__icontains=query) |
-                Q(headline__icontains=query) |
-                Q(bio__icontains=query)
-            )
-            # Better full-name support: "first last" or "last first"
-            if len(query_tokens) >= 2:
-                first_tok = query_tokens[0]
-                last_tok = query_tokens[-1]
-                instructor_match_q |= (
-                    Q(first_name__icontains=first_tok) & Q(last_name__icontains=last_tok)
-                ) | (
-                    Q(first_name__icontains=last_tok) & Q(last_name__icontains=first_tok)
-                )
-
-            instructors = CustomUser.objects.filter(
-                Q(role='instructor') & instructor_match_q
+            instructors = search_backend.filter_instructors(
+                CustomUser.objects.filter(role='instructor'), query
             ).annotate(
                 total_courses=Count('course', filter=Q(course__is_published=True), distinct=True),
-                total_students_count=Count(
-                    'course__enrollments', filter=Q(course__is_published=True), distinct=True
-                )
-            )[:10]
+                total_students_count=Coalesce(Sum(
+                    'course__stats__student_count', filter=Q(course__is_published=True)
+                ), 0)
+            ).order_by('-search_score')[:10]
 
             for instructor in instructors:
                 instructors_data.append({
@@ -962,13 +1193,13 @@ def global_search(request):
         matching_categories = []
         if query:
             cats = (
-                Category.objects.filter(_category_tokens_q(query))
+                search_backend.filter_categories(Category.objects.all(), query)
                 .annotate(
                     published_course_count=Count(
                         'courses', filter=Q(courses__is_published=True), distinct=True
                     )
                 )
-                .order_by('-published_course_count')[:15]
+                .order_by('-search_score', '-published_course_count')[:15]
             )
             for cat in cats:
                 matching_categories.append({
@@ -19,3 +19,23 @@ capture_output = True
 proc_name = "elearning_backend"
 max_requests = 1000
 max_requests_jitter = 50
+
+
+def post_worker_init(worker):
+    # Without Celery, encodes run in `manage.py run_video_queue`; web workers only join in
+    # when VIDEO_QUEUE_IN_WEB_WORKERS is set
+    from courses.tasks import start_local_video_workers
+    start_local_video_workers()
+
+    # Warm the in-memory search suggestion index before the first keystroke arrives
+    from courses.suggest import suggest_index
+    try:
+        suggest_index.load()
+    except Exception:
+        worker.log.exception("Could not preload the suggest index; it will load on first use")
+
+
+def worker_exit(server, worker):
+    # Write playback positions still waiting in the heartbeat buffer
+    from courses.progress import progress_buffer
+    progress_buffer.flush()